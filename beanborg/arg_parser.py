@@ -1,7 +1,11 @@
 import argparse
 
 
-def eval_args(help_message):
+def eval_args(help_message, extra=None):
+    """
+    Parse the command line options shared by all the commands, plus the
+    options added to the parser by the `extra` function of the command.
+    """
 
     parser = argparse.ArgumentParser(description=help_message)
 
@@ -16,6 +20,15 @@ def eval_args(help_message):
         "-v", "--debug", required=False, default=False, action="store_true"
     )
 
+    if extra is not None:
+        extra(parser)
+
+    args = parser.parse_args()
+    return args
+
+
+def import_args(parser):
+
     parser.add_argument(
         "--fix-only",
         required=False,
@@ -24,5 +37,86 @@ def eval_args(help_message):
         help="Only fix transactions without an account",
     )
 
-    args = parser.parse_args()
-    return args
+    parser.add_argument(
+        "--unattended",
+        required=False,
+        default=False,
+        action="store_true",
+        help="Never prompt: only the transactions that can be classified "
+        "automatically are classified (see auto_classify_threshold)",
+    )
+
+    parser.add_argument(
+        "--sequential",
+        required=False,
+        default=False,
+        action="store_true",
+        help="Load the ledger and the classifier after processing the csv "
+        "file, instead of concurrently (for debugging)",
+    )
+
+    parser.add_argument(
+        "--migrate-metadata",
+        required=False,
+        default=False,
+        action="store_true",
+        help="Rewrite the csv metadata of the ledger according to the "
+        "csv_metadata option",
+    )
+
+    parser.add_argument(
+        "--suggest-rules",
+        required=False,
+        default=False,
+        action="store_true",
+        help="Print account.rules entries for the descriptions of the "
+        "training data that always had the same category",
+    )
+
+    parser.add_argument(
+        "--remote",
+        required=False,
+        default=False,
+        action="store_true",
+        help="Submit the import to a running bb_server",
+    )
+
+    parser.add_argument(
+        "--socket",
+        required=False,
+        default=None,
+        help="Unix socket of the bb_server (default: $BEANBORG_SOCKET)",
+    )
+
+
+def mover_args(parser):
+
+    parser.add_argument(
+        "--watch",
+        required=False,
+        default=False,
+        action="store_true",
+        help="Watch the download folders and move, import and archive "
+        "new files as they land. The configuration file can also be a "
+        "folder containing multiple configuration files",
+    )
+
+
+def archive_args(parser):
+
+    parser.add_argument(
+        "--lookup",
+        required=False,
+        default=None,
+        help="Look up the archive catalog by row hash (md5) or by "
+        "date range (yyyy-mm-dd..yyyy-mm-dd)",
+    )
+
+    parser.add_argument(
+        "--compact",
+        required=False,
+        default=False,
+        action="store_true",
+        help="Compress (and deduplicate) the archived files, according "
+        "to the archive_compression and archive_dedup options",
+    )
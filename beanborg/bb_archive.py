@@ -6,20 +6,43 @@ __license__ = "GNU GPLv2"
 
 import csv
 import os
+import re
 import shutil
 import sys
 from datetime import datetime
 
 from rich import print as rprint
+from rich.table import Table
 
-from beanborg.arg_parser import eval_args
+from beanborg.arg_parser import archive_args, eval_args
 from beanborg.config import init_config
+from beanborg.utils.archive_catalog import ArchiveCatalog
+from beanborg.utils.archive_store import SUFFIXES, ArchiveStore, base_name
 
 
 def main():
 
-    args = eval_args("Archives imported CVS file")
+    args = eval_args("Archives imported CVS file", archive_args)
     config = init_config(args.file, args.debug)
+    if args.lookup:
+        lookup(config, args.lookup)
+        return
+    if args.compact:
+        compact(config)
+        return
+
+    archive(config)
+
+
+def archive(config, dates=None, content=None):
+    """
+    Move the imported CSV file of the given configuration to the archive
+    folder, renaming it with the first and last date of its transactions.
+    The (first, last) `dates` are detected from the file, if not provided.
+    The archived file is added to the archive catalog, using the file
+    `content` (bytes) if available.
+    Returns the path of the archived file.
+    """
 
     target_csv = os.path.join(config.csv.target, config.csv.ref + ".csv")
 
@@ -27,9 +50,42 @@ def main():
         rprint(f"[red]file: {target_csv}  does not exist![red]")
         sys.exit(-1)
 
+    check_compression(config)
+
     if not os.path.isdir(config.csv.archive):
         os.mkdir(config.csv.archive)
 
+    if dates is None:
+        dates = detect_dates(config, target_csv)
+
+    print("\u2713" + " moving file to archive...")
+    archived_csv = archive_name(config, dates)
+    catalog = ArchiveCatalog(config.csv.archive)
+    try:
+        if config.csv.archive_compression == "none":
+            os.rename(target_csv, archived_csv)
+        else:
+            if content is None:
+                with open(target_csv, "rb") as csv_file:
+                    content = csv_file.read()
+            store(catalog, config, archived_csv, content)
+            os.remove(target_csv)
+
+        print("\u2713" + " updating archive catalog...")
+        catalog.add(archived_csv, config, dates, content)
+    finally:
+        catalog.close()
+
+    print("\u2713" + " removing temp folder")
+    shutil.rmtree(config.csv.target)
+
+    return archived_csv
+
+
+def detect_dates(config, target_csv):
+    """
+    Returns the first and last date of the transactions in a CSV file.
+    """
     dates = []
     print("\u2713" + " detecting start and end date of transaction file...")
     with open(target_csv) as csv_file:
@@ -42,27 +98,173 @@ def main():
                 dates.append(
                     datetime.strptime(
                         row[config.indexes.date].strip(), config.csv.date_format
-                    )
+                    ).date()
                 )
             except Exception as ex:
                 print("error: " + str(ex))
 
-    print("\u2713" + " moving file to archive...")
-    os.rename(
-        target_csv,
+    return (min(dates), max(dates))
+
+
+def lookup(config, query):
+    """
+    Look up the archive catalog, by row hash (md5) or by date range
+    (yyyy-mm-dd or yyyy-mm-dd..yyyy-mm-dd).
+    """
+    if not os.path.isdir(config.csv.archive):
+        rprint(f"[red]folder: {config.csv.archive} does not exist![/red]")
+        sys.exit(-1)
+
+    catalog = ArchiveCatalog(config.csv.archive)
+    try:
+        catalog.sync(config)
+        if re.fullmatch(r"[0-9a-f]{32}", query):
+            table = Table(title=f"Archived rows with hash {query}")
+            table.add_column("File", style="magenta")
+            table.add_column("Offset", justify="right")
+            table.add_column("Row", style="green")
+            for name, offset, line in catalog.lookup_md5(query):
+                table.add_row(name, str(offset), line)
+        else:
+            try:
+                start, _, end = query.partition("..")
+                start = datetime.strptime(start, "%Y-%m-%d").date()
+                end = datetime.strptime(end, "%Y-%m-%d").date() if end else start
+            except ValueError:
+                rprint(
+                    "[red]invalid lookup: expected an md5 hash or a date range "
+                    "(yyyy-mm-dd..yyyy-mm-dd)[/red]"
+                )
+                sys.exit(-1)
+            table = Table(title=f"Archived files from {start} to {end}")
+            table.add_column("File", style="magenta")
+            table.add_column("Start")
+            table.add_column("End")
+            table.add_column("Rows", justify="right", style="green")
+            for name, first, last, rows in catalog.lookup_dates(start, end):
+                table.add_row(name, first, last, str(rows))
+    finally:
+        catalog.close()
+
+    rprint(table)
+
+
+def check_compression(config):
+
+    if config.csv.archive_compression not in SUFFIXES:
+        rprint(
+            f"[red]invalid archive_compression: {config.csv.archive_compression} "
+            f"(expected one of: {', '.join(SUFFIXES)})[/red]"
+        )
+        sys.exit(-1)
+
+
+def store(catalog, config, archived_csv, content, compacted_only=False):
+    """
+    Write a compressed archive, replacing the rows already archived
+    with references when `archive_dedup` is enabled.
+    With `compacted_only`, only the rows of the files already stored
+    with the configured compression are referenced.
+    """
+    find_duplicates = None
+    if config.csv.archive_dedup:
+        find_duplicates = catalog.duplicates(content, config)
+        if compacted_only:
+            suffix = SUFFIXES[config.csv.archive_compression]
+            candidates = find_duplicates
+
+            def find_duplicates(offset):
+                return [c for c in candidates(offset) if c[0].endswith(suffix)]
+
+    catalog.store.write(
+        archived_csv, content, config.csv.archive_compression, find_duplicates
+    )
+
+
+def compact(config):
+    """
+    Convert the archived files of the bank to the configured compression
+    and deduplication, oldest first.
+    """
+    check_compression(config)
+    if config.csv.archive_compression == "none":
+        rprint("[red]archive_compression is not set: nothing to compact[/red]")
+        sys.exit(-1)
+    if not os.path.isdir(config.csv.archive):
+        rprint(f"[red]folder: {config.csv.archive} does not exist![/red]")
+        sys.exit(-1)
+
+    suffix = SUFFIXES[config.csv.archive_compression]
+    before = after = 0
+    # compacted file -> original content
+    rewritten = dict()
+    catalog = ArchiveCatalog(config.csv.archive)
+    try:
+        catalog.sync(config)
+        for name, start, end in catalog.files_of(config.csv.ref):
+            compacted = base_name(name) + suffix
+            if name == compacted and catalog.store.deduplicated(name) == bool(
+                config.csv.archive_dedup
+            ):
+                continue
+            print("\u2713" + f" compacting {name}...")
+            path = os.path.join(config.csv.archive, name)
+            compacted_path = os.path.join(config.csv.archive, compacted)
+            content = catalog.store.read(name)
+            before += os.path.getsize(path)
+            # reference the older files, already compacted
+            store(catalog, config, compacted_path, content, compacted_only=True)
+            if path != compacted_path:
+                os.remove(path)
+            if not verify(ArchiveStore(config.csv.archive), compacted, content):
+                # the references can not be resolved from the files on
+                # disk (e.g. two files referencing each other)
+                catalog.store.write(
+                    compacted_path, content, config.csv.archive_compression
+                )
+            after += os.path.getsize(compacted_path)
+            rewritten[compacted] = content
+            catalog.remove(name)
+            catalog.add(compacted_path, config, (start, end), content)
+    finally:
+        catalog.close()
+
+    # every rewritten file is read back from the disk, without the
+    # contents cached while compacting
+    archived = ArchiveStore(config.csv.archive)
+    for name, content in rewritten.items():
+        if not verify(archived, name, content):
+            rprint(f"[red]compacted file: {name} does not match the original![/red]")
+            sys.exit(-1)
+
+    print(f"Done :) {before} bytes -> {after} bytes")
+
+
+def verify(archived, name, content):
+    """
+    Returns True if the archived file, read from the ArchiveStore with
+    its references, matches the content.
+    """
+    try:
+        return archived.read(name) == content
+    except (OSError, ValueError):
+        return False
+
+
+def archive_name(config, dates):
+
+    return (
         config.csv.archive
         + "/"
         + config.csv.ref
         + "_"
-        + str(min(dates).date())
+        + str(dates[0])
         + "_"
-        + str(max(dates).date())
-        + ".csv",
+        + str(dates[1])
+        + ".csv"
+        + SUFFIXES.get(config.csv.archive_compression, "")
     )
 
-    print("\u2713" + " removing temp folder")
-    shutil.rmtree(config.csv.target)
-
 
 if __name__ == "__main__":
     main()
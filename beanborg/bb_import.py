@@ -4,11 +4,20 @@
 __copyright__ = "Copyright (C) 2024  Luciano Fiandesio"
 __license__ = "GNU GPLv2"
 
-
-from beanborg.importer import Importer
+from beanborg.arg_parser import eval_args, import_args
+from beanborg.server.protocol import import_remote
 
 
 def main():
+    options = eval_args("Parse bank csv file and import into beancount", import_args)
+    if options.remote:
+        import_remote(options)
+        return
+
+    # the importer loads the whole classification stack,
+    # which is not needed by the remote client
+    from beanborg.importer import Importer
+
     imp = Importer()
     imp.import_transactions()
 
@@ -12,13 +12,21 @@ from subprocess import CalledProcessError, check_call
 
 from rich import print as rprint
 
-from beanborg.arg_parser import eval_args
+from beanborg.arg_parser import eval_args, mover_args
 from beanborg.config import init_config
 
 
 def main():
 
-    args = eval_args("Move bank csv file to processing folder")
+    args = eval_args("Move bank csv file to processing folder", mover_args)
+    if args.watch:
+        # the watcher runs the whole import pipeline:
+        # only load it when needed
+        from beanborg.watcher import watch
+
+        watch(args.file, args.debug)
+        return
+
     config = init_config(args.file, args.debug)
     current_dir = os.getcwd()
     # support path like ~/Downloads
@@ -54,28 +62,43 @@ def main():
 
     for f in os.listdir(path):
         if f.startswith(config.csv.name):
-            src = os.path.join(path, f)
-            moved_csv = os.path.join(config.csv.target, config.csv.ref + ".csv")
-            if config.csv.keep_original:
-                shutil.copy(src, moved_csv)
-            else:
-                os.rename(src, moved_csv)
-
-            if config.csv.post_script_path:
-                try:
-                    check_call(
-                        [
-                            config.csv.post_script_path,
-                            os.path.join(current_dir, moved_csv),
-                        ]
-                    )
-                except CalledProcessError as e:
-                    rprint(
-                        "[red]An error occurred executing: %s\n%s[/red]"
-                        % (config.csv.post_script_path, str(e))
-                    )
+            move(config, os.path.join(path, f), current_dir)
     print("Done :) ")
 
 
+def move(config, src, current_dir):
+    """
+    Move (or copy) a downloaded CSV file to the staging area and run
+    the post-move script, if any.
+    Returns the path of the moved file.
+    """
+    moved_csv = os.path.join(config.csv.target, config.csv.ref + ".csv")
+    if config.csv.keep_original:
+        shutil.copy(src, moved_csv)
+    else:
+        os.rename(src, moved_csv)
+
+    run_post_script(config, moved_csv, current_dir)
+
+    return moved_csv
+
+
+def run_post_script(config, moved_csv, current_dir):
+
+    if config.csv.post_script_path:
+        try:
+            check_call(
+                [
+                    config.csv.post_script_path,
+                    os.path.join(current_dir, moved_csv),
+                ]
+            )
+        except CalledProcessError as e:
+            rprint(
+                "[red]An error occurred executing: %s\n%s[/red]"
+                % (config.csv.post_script_path, str(e))
+            )
+
+
 if __name__ == "__main__":
     main()
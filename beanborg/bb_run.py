@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__copyright__ = "Copyright (C) 2024  Luciano Fiandesio"
+__license__ = "GNU GPLv2"
+
+import csv
+import io
+import os
+import sys
+
+from rich import print as rprint
+
+from beanborg.arg_parser import eval_args
+from beanborg.bb_archive import archive, archive_name
+from beanborg.bb_mover import run_post_script
+from beanborg.config import init_config
+from beanborg.importer import Importer
+from beanborg.utils.archive_catalog import ArchiveCatalog
+
+
+class Pipeline:
+    """
+    Runs the move -> import -> archive stages for a downloaded CSV file
+    in a single process.
+
+    The file is read once: the import stage works on the in-memory rows
+    and the archive stage reuses the dates parsed by the importer.
+    If any stage fails, the staging area, the ledger and the archive
+    folder are restored and the downloaded file is left untouched.
+    """
+
+    def __init__(self, config_file, config, cache=None):
+        self.config_file = config_file
+        self.config = config
+        self.cache = cache
+        self.current_dir = os.getcwd()
+
+    def run(self, src):
+        """
+        Process a downloaded file.
+        Returns the importer, holding the stats of the import.
+        """
+        self.created_target = False
+        self.moved_csv = None
+        self.archived_csv = None
+        self.importer = None
+        try:
+            rows = self.move(src)
+            self.import_rows(rows)
+            self.archive()
+        except BaseException:
+            self.rollback()
+            raise
+
+        if not self.config.csv.keep_original:
+            os.remove(src)
+
+        return self.importer
+
+    def move(self, src):
+        """
+        Copy the downloaded file to the staging area (the original is
+        removed only when the whole pipeline succeeds) and return its
+        rows, without the header lines.
+        """
+        moved_csv = os.path.join(self.config.csv.target, self.config.csv.ref + ".csv")
+        if os.path.isfile(moved_csv):
+            rprint(f"[red]file: {moved_csv} has not been archived yet![/red]")
+            sys.exit(-1)
+
+        with open(src, "rb") as csv_file:
+            content = csv_file.read()
+
+        if not os.path.isdir(self.config.csv.target):
+            os.mkdir(self.config.csv.target)
+            self.created_target = True
+
+        with open(moved_csv, "wb") as csv_file:
+            csv_file.write(content)
+        self.moved_csv = moved_csv
+
+        if self.config.csv.post_script_path:
+            # the script is free to rewrite the file
+            run_post_script(self.config, moved_csv, self.current_dir)
+            with open(moved_csv, "rb") as csv_file:
+                content = csv_file.read()
+        self.content = content
+
+        # same decoding and newline handling of `open(file)`
+        csv_reader = csv.reader(
+            io.TextIOWrapper(io.BytesIO(content)),
+            delimiter=self.config.csv.separator,
+        )
+        for _ in range(self.config.csv.skip):
+            next(csv_reader)  # skip the line
+        return list(csv_reader)
+
+    def import_rows(self, rows):
+
+        # recorded before the import: a failure after the ledger is
+        # written (e.g. while printing the summary) must roll it back
+        self.importer = Importer(cache=self.cache)
+        self.importer.config_file = self.config_file
+        self.importer.args = self.config
+        self.importer.import_csv(rows)
+
+    def archive(self):
+
+        dates = self.importer.csv_dates
+        if dates is None:
+            rprint("[red]unable to detect the dates of the transaction file[/red]")
+            sys.exit(-1)
+
+        archived_csv = archive_name(self.config, dates)
+        if os.path.exists(archived_csv):
+            rprint(f"[red]file: {archived_csv} already exists![/red]")
+            sys.exit(-1)
+
+        # recorded before the file is moved to the archive, which happens
+        # before the archive catalog is updated
+        self.archived_csv = archived_csv
+        archive(self.config, dates, self.content)
+
+    def rollback(self):
+
+        rprint("[red]rolling back...[/red]")
+        if self.importer is not None:
+            self.importer.rollback()
+        if self.archived_csv is not None and os.path.isfile(self.archived_csv):
+            os.remove(self.archived_csv)
+            catalog = ArchiveCatalog(self.config.csv.archive)
+            catalog.sync(self.config)
+            catalog.close()
+        if self.moved_csv is not None and os.path.isfile(self.moved_csv):
+            os.remove(self.moved_csv)
+        if self.created_target and os.path.isdir(self.config.csv.target):
+            if not os.listdir(self.config.csv.target):
+                os.rmdir(self.config.csv.target)
+
+
+def main():
+
+    args = eval_args("Move, import and archive bank csv files")
+    config = init_config(args.file, args.debug)
+
+    path = os.path.expanduser(config.csv.download_path)
+    if not os.path.isdir(path):
+        rprint(f"[red]folder: {config.csv.download_path} does not exist![/red]")
+        sys.exit(-1)
+
+    if config.csv.post_script_path and not os.path.isfile(config.csv.post_script_path):
+        print("No post-move script found: %s" % (config.csv.post_script_path))
+        sys.exit(-1)
+
+    files = sorted(
+        (
+            os.path.join(path, f)
+            for f in os.listdir(path)
+            if f.startswith(config.csv.name)
+        ),
+        key=os.path.getmtime,
+    )
+    if not files:
+        rprint(
+            f"[red]No file found in [bold]{config.csv.download_path}[/bold] "
+            f"with name starting with: [bold]{config.csv.name}[/bold][/red]"
+        )
+        sys.exit(-1)
+
+    pipeline = Pipeline(args.file, config)
+    for src in files:
+        rprint(f"processing [bold]{os.path.basename(src)}[/bold]")
+        try:
+            pipeline.run(src)
+        except SystemExit:
+            sys.exit(-1)
+
+    print("Done :) ")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__copyright__ = "Copyright (C) 2024  Luciano Fiandesio"
+__license__ = "GNU GPLv2"
+
+import argparse
+import io
+import os
+import socketserver
+import stat
+import sys
+import traceback
+from contextlib import redirect_stdout
+from dataclasses import asdict
+
+from rich import print as rprint
+
+from beanborg.config import init_config, resolve_paths
+from beanborg.importer import Importer
+from beanborg.rule_engine.rules import LookUpCache
+from beanborg.server.cache import WarmCache, file_signature
+from beanborg.server.protocol import (
+    default_socket_path,
+    is_listening,
+    read_message,
+    send_message,
+)
+from beanborg.utils.ledger_scanner import ParseCache
+
+
+class ImportJobHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        job = read_message(self.rfile)
+        if job is not None:
+            send_message(self.wfile, self.server.run_job(job))
+
+
+class ImportServer(socketserver.UnixStreamServer):
+    """
+    Runs import jobs submitted by `bb_import --remote`, one at a time.
+
+    The parsed ledger files, the configurations, the rule engines and the
+    classification models are kept in memory between jobs and are
+    rebuilt only when the files they are built from change.
+    Jobs are non-interactive: transactions with the same date and amount
+    of an existing transaction are skipped and transactions without a
+    category, unless they can be classified automatically (see
+    `auto_classify_threshold`), are left to `bb_import --fix-only`.
+    """
+
+    def __init__(self, socket_path, debug=False):
+        self.cache = WarmCache()
+        self.debug = debug
+        ParseCache.enabled = True
+        socketserver.UnixStreamServer.__init__(self, socket_path, ImportJobHandler)
+        os.chmod(socket_path, 0o600)
+
+    def get_config(self, config_file, cwd, debug):
+        """
+        Returns the configuration, with its relative paths resolved
+        against the working directory of the client: the server never
+        changes its own working directory.
+        """
+        config = self.cache.get(
+            ("config", config_file, cwd),
+            file_signature(config_file),
+            lambda: resolve_paths(init_config(config_file, debug), cwd),
+        )
+        config.debug = debug
+        return config
+
+    def run_job(self, job):
+        output = io.StringIO()
+        importer = Importer(interactive=False, cache=self.cache)
+        status = "ok"
+        try:
+            with redirect_stdout(output):
+                importer.config_file = job["config"]
+                importer.working_dir = job["cwd"]
+                importer.args = self.get_config(
+                    job["config"], job["cwd"], job.get("debug", False)
+                )
+                importer.import_csv()
+        except SystemExit:
+            status = "error"
+        except Exception:
+            status = "error"
+            output.write(traceback.format_exc())
+
+        if self.debug:
+            print(
+                f"{job['config']}: {status} "
+                f"(cache hits: {self.cache.hits}, misses: {self.cache.misses}, "
+                f"{LookUpCache.stats()})"
+            )
+
+        return {
+            "status": status,
+            "output": output.getvalue(),
+            "stats": asdict(importer.stats),
+        }
+
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description="Keep ledger, rules and models in memory and serve import jobs"
+    )
+    parser.add_argument(
+        "--socket",
+        required=False,
+        default=None,
+        help="Unix socket to listen on (default: $BEANBORG_SOCKET)",
+    )
+    parser.add_argument(
+        "-v", "--debug", required=False, default=False, action="store_true"
+    )
+    args = parser.parse_args()
+
+    socket_path = args.socket or default_socket_path()
+    if os.path.exists(socket_path):
+        if not stat.S_ISSOCK(os.stat(socket_path).st_mode):
+            rprint(f"[red]{socket_path} exists and is not a socket[/red]")
+            sys.exit(-1)
+        if is_listening(socket_path):
+            rprint(f"[red]bb_server is already running on {socket_path}[/red]")
+            sys.exit(-1)
+        # left behind by a server that did not shut down cleanly
+        os.remove(socket_path)
+
+    server = ImportServer(socket_path, args.debug)
+    rprint(f"bb_server listening on [bold]{socket_path}[/bold]")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(socket_path)
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
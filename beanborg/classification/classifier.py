@@ -1,5 +1,9 @@
 # -*- coding: utf-8 -*-
 
+import threading
+from dataclasses import dataclass
+from typing import List, Optional
+
 import pandas as pd
 from beancount.core.data import Posting
 from prompt_toolkit import prompt
@@ -9,35 +13,73 @@ from rich import print
 from rich.prompt import Confirm
 
 from beanborg.classification.custom_fuzzy_wordf_completer import (
+    AccountIndex,
     CustomFuzzyWordCompleter,
 )
 from beanborg.classification.data_loader import DataLoader
+from beanborg.classification.description_memo import DescriptionMemo
 from beanborg.classification.gpt_service import GPTService
+from beanborg.classification.prefetcher import Prefetcher
+from beanborg.classification.sparse_model import SparseTransactionModel
 from beanborg.classification.transaction_model import TransactionModel
 from beanborg.classification.ui_service import UIService
 from beanborg.utils.journal_utils import JournalUtils
 from beanborg.utils.string_utils import StringUtils
 
 
+@dataclass
+class PreparedTransaction:
+    """
+    Predictions and rendered panels of a transaction to classify.
+    """
+
+    text: str
+    day_of_month: int
+    day_of_week: int
+    top_labels: List[str]
+    top_probs: List[float]
+    chatgpt_prediction: Optional[str]
+    rendered: str
+
+
 class Classifier:
+    # number of transactions prepared in advance during the
+    # interactive classification
+    prefetch = 3
 
-    def __init__(self, data="training_data.csv", use_llm=False, bc_file=None):
+    def __init__(
+        self, data="training_data.csv", use_llm=False, bc_file=None, backend="knn"
+    ):
         self.trainingDataFile = data
         self.use_llm = use_llm
         self.bc_file = bc_file
         self.training_data = DataLoader.load_data(self.trainingDataFile)
+        self.memo = DescriptionMemo(self.training_data)
         try:
-            self.model = TransactionModel(self.training_data, data)
+            if backend == "sparse":
+                self.model = SparseTransactionModel(self.training_data, data)
+            else:
+                self.model = TransactionModel(self.training_data, data)
         except Exception as e:
             print(f"Error initializing TransactionModel: {e}")
             self.model = None
 
         self.gpt_service = GPTService(self.use_llm)
         self.ui_service = UIService()
+        # accounts of the ledger, loaded once per classification session
+        self.account_index = None
+        # the model and the memo are used by the prefetch thread: the
+        # version is increased every time they change
+        self.model_lock = threading.Lock()
+        self.model_version = 0
 
     def has_no_category(self, tx, args) -> bool:
         return tx.postings[1].account == args.rules.default_expense
 
+    def get_description(self, tx):
+        # transactions imported without a payee rule have no payee
+        return StringUtils.strip_digits((tx.payee or tx.narration or "").upper())
+
     def get_day_of_month(self, date):
         return pd.to_datetime(date).day
 
@@ -46,16 +88,104 @@ class Classifier:
 
     def get_predictions(self, text, day_of_month, day_of_week):
 
-        if self.model is None:
-            return [], [], self.get_llm_prediction(text)
-
-        # Use the TransactionModel for predictions
-        top_labels, top_probs = self.model.predict(text, day_of_month, day_of_week)
+        with self.model_lock:
+            # known payees with a single category do not need a prediction
+            category = self.memo.unanimous(text)
+            if category is not None:
+                return [category], [1.0], None
+
+            if self.model is None:
+                top_labels, top_probs = [], []
+            else:
+                # Use the TransactionModel for predictions
+                top_labels, top_probs = self.model.predict(
+                    text, day_of_month, day_of_week
+                )
 
         alternative_label = self.get_llm_prediction(text)
 
         return top_labels, top_probs, alternative_label
 
+    def prepare_transaction(self, tx):
+        """
+        Compute the predictions of a transaction and render it.
+        Returns the model version used and the PreparedTransaction.
+        """
+        version = self.model_version
+        text = self.get_description(tx)
+        day_of_month = self.get_day_of_month(tx.date)
+        day_of_week = self.get_day_of_week(tx.date)
+        top_labels, top_probs, chatgpt_prediction = self.get_predictions(
+            text, day_of_month, day_of_week
+        )
+        rendered = self.ui_service.render_transaction(
+            tx, top_labels, top_probs, chatgpt_prediction
+        )
+        return version, PreparedTransaction(
+            text,
+            day_of_month,
+            day_of_week,
+            top_labels,
+            top_probs,
+            chatgpt_prediction,
+            rendered,
+        )
+
+    def get_auto_category(self, tx, args):
+        """
+        Returns the predicted category of the transaction, if its
+        probability reaches `auto_classify_threshold` and the category is
+        in `auto_classify_categories` (when set), otherwise None.
+        The memo is trusted only for descriptions with at least
+        `auto_classify_min_samples` samples, the model is used otherwise.
+        The LLM is never queried.
+        """
+        text = self.get_description(tx)
+        category = self.memo.unanimous(text)
+        probability = 1.0
+        if (
+            category is None
+            or self.memo.samples(text) < args.rules.auto_classify_min_samples
+        ):
+            if self.model is None:
+                return None
+            labels, probs = self.model.predict(
+                text, self.get_day_of_month(tx.date), self.get_day_of_week(tx.date)
+            )
+            if len(labels) == 0:
+                return None
+            category, probability = labels[0], probs[0]
+
+        allowed = args.rules.auto_classify_categories
+        if probability >= args.rules.auto_classify_threshold and (
+            not allowed or category in allowed
+        ):
+            return category
+        return None
+
+    def auto_classify(self, txs, args):
+        """
+        Assign the predicted category to the transactions without category
+        when the prediction is confident enough (see `get_auto_category`).
+        Auto-classified transactions are tagged with the `classified: "auto"`
+        metadata and are not added to the training data.
+        Returns the number of auto-classified transactions.
+        """
+        if args.rules.auto_classify_threshold is None:
+            return 0
+
+        count = 0
+        for i, tx in enumerate(txs.getTransactions()):
+            if self.has_no_category(tx, args):
+                category = self.get_auto_category(tx, args)
+                if category is not None:
+                    self.update_transaction(tx, i, txs, category, auto=True)
+                    count += 1
+
+        if count > 0:
+            print(f"[green]{count} transactions classified automatically[/green]")
+        return count
+
     def confirm_classification(self, txs, args):
         return Confirm.ask(
             f"\n[red]You have [bold]{txs.count_no_category(args.rules.default_expense)}[/bold] "
@@ -68,23 +198,28 @@ class Classifier:
             # This function queries the GPT service for a label prediction based on the provided text.
             # It uses the available accounts from the journal to help the GPT service make a more informed prediction.
             # If the GPT service is not available, it returns None.
-            accounts = JournalUtils().get_accounts(self.bc_file)
+            accounts = self.get_account_index().accounts
             alternative_label = self.gpt_service.query_gpt_for_label(text, accounts)
         else:
             alternative_label = None
 
         return alternative_label
 
-    def process_transaction(self, tx, index, txs, args):
-        stripped_text = StringUtils.strip_digits(tx.payee.upper())
-        day_of_month = self.get_day_of_month(tx.date)
-        day_of_week = self.get_day_of_week(tx.date)
+    def process_transaction(self, tx, index, txs, args, prepared=None):
+        if prepared is None:
+            prepared = self.prepare_transaction(tx)[1]
+        stripped_text = prepared.text
+        day_of_month = prepared.day_of_month
+        day_of_week = prepared.day_of_week
+        top_labels = prepared.top_labels
+        chatgpt_prediction = prepared.chatgpt_prediction
 
-        top_labels, top_probs, chatgpt_prediction = self.get_predictions(
-            stripped_text, day_of_month, day_of_week
-        )
         self.ui_service.display_transaction(
-            tx, top_labels, top_probs, chatgpt_prediction
+            tx,
+            top_labels,
+            prepared.top_probs,
+            chatgpt_prediction,
+            prepared.rendered,
         )
 
         selected_category = self.get_user_selection(
@@ -97,8 +232,9 @@ class Classifier:
             self.update_transaction(tx, index, txs, selected_category, narration)
             amount = tx.postings[0].units.number
             if selected_category != args.rules.default_expense:
-                if self.model is not None:
-                    self.model.update_training_data(
+                with self.model_lock:
+                    # without a model, the row is always added below
+                    updated = self.model is None or self.model.update_training_data(
                         tx.date,
                         stripped_text,
                         amount,
@@ -106,7 +242,10 @@ class Classifier:
                         day_of_month,
                         day_of_week,
                     )
-                else:
+                    if updated:
+                        self.memo.add(stripped_text, selected_category)
+                    self.model_version += 1
+                if self.model is None:
                     row = pd.DataFrame(
                         {
                             "date": [tx.date],
@@ -149,23 +288,31 @@ class Classifier:
             return top_labels[selected_number - 1]
         return None
 
+    def get_account_index(self, args=None):
+        if self.account_index is None:
+            journal_utils = JournalUtils(args.rules.validate_ledger if args else False)
+            self.account_index = AccountIndex(
+                journal_utils.get_accounts(args.rules.bc_file if args else self.bc_file)
+            )
+        return self.account_index
+
     def handle_custom_input(self, args):
-        accounts = JournalUtils().get_accounts(args.rules.bc_file)
+        accounts = self.get_account_index(args)
         account_completer = CustomFuzzyWordCompleter(accounts)
         kb = self.create_key_bindings()
-        selected_category = prompt(
-            "Enter account: ",
-            completer=account_completer,
-            complete_while_typing=True,
-            key_bindings=kb,
-            default=args.rules.default_expense,
-        )
-        if selected_category not in accounts:
+        while True:
+            selected_category = prompt(
+                "Enter account: ",
+                completer=account_completer,
+                complete_while_typing=True,
+                key_bindings=kb,
+                default=args.rules.default_expense,
+            )
+            if selected_category in accounts:
+                return selected_category
             print(
                 "[bold red]Invalid account. Please select a valid account.[/bold red]"
             )
-            return self.handle_custom_input(args)
-        return selected_category
 
     def create_key_bindings(self):
         kb = KeyBindings()
@@ -177,20 +324,56 @@ class Classifier:
 
         return kb
 
-    def update_transaction(self, tx, index, txs, category, narration=None):
+    def update_transaction(self, tx, index, txs, category, narration=None, auto=False):
         posting = Posting(category, None, None, None, None, None)
         new_postings = [tx.postings[0]] + [posting]
         new_tx = tx._replace(postings=new_postings)
         if narration:
             new_tx = new_tx._replace(narration=narration)
+        if auto:
+            new_tx = new_tx._replace(meta={**tx.meta, "classified": "auto"})
         txs.getTransactions()[index] = new_tx
 
-    def classify(self, txs, args):
-        if not self.confirm_classification(txs, args):
-            return
-
-        for i, tx in enumerate(txs.getTransactions()):
-            if self.has_no_category(tx, args):
-                result = self.process_transaction(tx, i, txs, args)
+    def classify(self, txs, args, interactive=True):
+        """
+        Classify the transactions without category: first the ones that
+        can be classified automatically, then, if `interactive`, the
+        remaining ones with the help of the user.
+        Returns the number of auto-classified transactions.
+        """
+        auto_classified = self.auto_classify(txs, args)
+        if (
+            not interactive
+            or txs.count_no_category(args.rules.default_expense) == 0
+            or not self.confirm_classification(txs, args)
+        ):
+            return auto_classified
+
+        # new accounts may have been opened since the last session
+        self.account_index = None
+
+        pending = [
+            (i, tx)
+            for i, tx in enumerate(txs.getTransactions())
+            if self.has_no_category(tx, args)
+        ]
+        # the next transactions are prepared while the user is typing
+        prefetcher = Prefetcher(
+            self.prepare_transaction, lambda: self.model_version, self.prefetch
+        )
+        try:
+            for position, (i, tx) in enumerate(pending):
+                prefetcher.schedule(pending[position + 1 :])
+                version = self.model_version
+                result = self.process_transaction(
+                    tx, i, txs, args, prefetcher.get(i, tx)
+                )
                 if result == "quit":
                     break
+                if self.model_version != version:
+                    # the model was retrained
+                    prefetcher.invalidate()
+        finally:
+            prefetcher.close()
+
+        return auto_classified
@@ -1,9 +1,99 @@
+from bisect import bisect_left
+
 from prompt_toolkit.completion import Completion, FuzzyWordCompleter
 
 
+class AccountIndex:
+    """
+    Lookup structure for a chart of accounts, built once per session.
+
+    Accounts are kept sorted by their lowercase name, so that the accounts
+    starting with a prefix are found with a binary search, and in a set,
+    for validity checks.
+    """
+
+    def __init__(self, accounts):
+        self.accounts = set(accounts)
+        self.keys = sorted((account.lower(), account) for account in self.accounts)
+        self.lower_keys = [key for key, _ in self.keys]
+
+    def __contains__(self, account):
+
+        return account in self.accounts
+
+    def __len__(self):
+
+        return len(self.accounts)
+
+    def starting_with(self, prefix):
+        """
+        Returns the accounts starting with the prefix (case insensitive),
+        in alphabetical order.
+        """
+        prefix = prefix.lower()
+        start = bisect_left(self.lower_keys, prefix)
+        matches = []
+        for key, account in self.keys[start:]:
+            if not key.startswith(prefix):
+                break
+            matches.append(account)
+        return matches
+
+    def fuzzy(self, text, candidates=None):
+        """
+        Returns the accounts containing the characters of `text` in the
+        same order (case insensitive), best matches first: shortest match,
+        then earliest match, then shortest account.
+        `candidates` restricts the search to a subset of the (key, account)
+        pairs.
+        """
+        text = text.lower()
+        ranked = []
+        for key, account in candidates if candidates is not None else self.keys:
+            start = key.find(text[:1])
+            if start < 0:
+                continue
+            position = start
+            for char in text[1:]:
+                position = key.find(char, position + 1)
+                if position < 0:
+                    break
+            else:
+                ranked.append((position - start, start, len(key), key, account))
+        ranked.sort()
+        return [(key, account) for _, _, _, key, account in ranked]
+
+
 class CustomFuzzyWordCompleter(FuzzyWordCompleter):
+    """
+    Completes the accounts starting with the text typed so far, followed
+    by the accounts matching the text fuzzily.
+    """
+
+    def __init__(self, words, **kwargs):
+        self.index = words if isinstance(words, AccountIndex) else AccountIndex(words)
+        super().__init__(sorted(self.index.accounts), **kwargs)
+        # (text, fuzzy matches) of the last completion: the matches of a
+        # longer text are a subset of them
+        self.last = ("", None)
+
+    def fuzzy_matches(self, text):
+
+        last_text, last_matches = self.last
+        candidates = last_matches if text.startswith(last_text) else None
+        matches = self.index.fuzzy(text, candidates)
+        self.last = (text, matches)
+        return matches
+
     def get_completions(self, document, complete_event):
         word_before_cursor = document.get_word_before_cursor(WORD=True)
-        for word in self.words:
-            if word.lower().startswith(word_before_cursor.lower()):
+        prefixed = self.index.starting_with(word_before_cursor)
+        for word in prefixed:
+            yield Completion(word, start_position=-len(word_before_cursor))
+
+        if not word_before_cursor:
+            return
+        prefixed = set(prefixed)
+        for _, word in self.fuzzy_matches(word_before_cursor):
+            if word not in prefixed:
                 yield Completion(word, start_position=-len(word_before_cursor))
@@ -0,0 +1,51 @@
+from collections import Counter
+
+
+class DescriptionMemo:
+    """
+    Categories assigned to each (normalized) description of the training
+    data.
+
+    Recurring payees are classified from the memo when all their samples
+    have the same category, without running the model or querying the
+    LLM.
+    """
+
+    def __init__(self, training_data=None):
+        self.categories = dict()
+        if training_data is not None:
+            for desc, cat in zip(training_data["desc"], training_data["cat"]):
+                self.add(desc, cat)
+
+    @staticmethod
+    def normalize(description):
+
+        return " ".join(str(description).split())
+
+    def add(self, description, category):
+
+        self.categories.setdefault(self.normalize(description), Counter())[
+            category
+        ] += 1
+
+    def distribution(self, description):
+        """
+        Returns the number of samples of each category for the description.
+        """
+        return self.categories.get(self.normalize(description), Counter())
+
+    def samples(self, description):
+        """
+        Returns the number of samples of the description.
+        """
+        return sum(self.distribution(description).values())
+
+    def unanimous(self, description):
+        """
+        Returns the category of the description, if all its samples have
+        the same category, otherwise None.
+        """
+        distribution = self.distribution(description)
+        if len(distribution) == 1:
+            return next(iter(distribution))
+        return None
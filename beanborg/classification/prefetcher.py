@@ -0,0 +1,53 @@
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Prefetcher:
+    """
+    Prepares the next items of a sequence on a background thread,
+    while the current one is being handled.
+
+    `prepare(item)` returns the prepared item along with the version of
+    the data it was prepared from; `version()` returns the current
+    version. Prepared items with an old version are prepared again.
+    """
+
+    def __init__(self, prepare, version, depth=3):
+        self.prepare = prepare
+        self.version = version
+        self.depth = depth
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        # key -> future
+        self.futures = dict()
+
+    def schedule(self, items):
+        """
+        Start preparing the next (key, item) pairs, up to `depth`.
+        """
+        for key, item in items[: self.depth]:
+            if key not in self.futures:
+                self.futures[key] = self.executor.submit(self.prepare, item)
+
+    def get(self, key, item):
+        """
+        Returns the prepared item, preparing it now if it was not
+        scheduled or if it is out of date.
+        """
+        future = self.futures.pop(key, None)
+        if future is not None:
+            version, prepared = future.result()
+            if version == self.version():
+                return prepared
+        return self.prepare(item)[1]
+
+    def invalidate(self):
+        """
+        Drop the prepared items (e.g. after retraining the model).
+        """
+        for future in self.futures.values():
+            future.cancel()
+        self.futures.clear()
+
+    def close(self):
+
+        self.invalidate()
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,184 @@
+from collections import defaultdict
+from dataclasses import dataclass
+
+from beanborg.classification.description_memo import DescriptionMemo
+from beanborg.rule_engine.decision_tables import matches
+
+# shorter values are matched exactly, to avoid matching unrelated payees
+MIN_CONTAINS_LENGTH = 4
+
+
+@dataclass
+class RuleCandidate:
+    value: str
+    check_type: str
+    account: str
+    samples: int
+
+    def to_rule(self):
+
+        return f"{self.value};{self.check_type};{self.account}"
+
+
+def common_prefix(descriptions):
+    """
+    Returns the words the descriptions start with.
+    """
+    words = [description.split() for description in descriptions]
+    prefix = []
+    for column in zip(*words):
+        if len(set(column)) > 1:
+            break
+        prefix.append(column[0])
+    return " ".join(prefix)
+
+
+class RuleMiner:
+    """
+    Suggests `account.rules` entries for the descriptions of the training
+    data that always had the same category, at least `min_count` times.
+
+    Training descriptions are derived from the payee of the transaction
+    (upper case, without digits and punctuation), while the rules match
+    the counterparty of the csv row: each description is checked against
+    the `counterparties` it was derived from (description -> csv
+    counterparties), and descriptions without known counterparties are
+    skipped. A suggested entry is the longest run of words of the
+    description found in all its counterparties (e.g. "REWE MARKT" for
+    "REWE MARKT BERLIN", from "REWE MARKT 1234 BERLIN"), matched with
+    `contains_ic`, or `equals_ic` for short values. The descriptions of a
+    category starting with the same words are merged into a single entry.
+
+    An entry is suggested only if it does not match the counterparty of a
+    description of the training data with a different category, and if it
+    does not match the value of an existing entry with a different account
+    (which it would shadow, if placed before it). Descriptions whose
+    counterparties are all handled by the existing entries are skipped.
+    """
+
+    def __init__(
+        self, training_data, table, counterparties, min_count=3, default_expense=None
+    ):
+        self.table = table
+        self.counterparties = counterparties
+        self.min_count = min_count
+        self.samples = DescriptionMemo(training_data).categories
+        # description -> (category, count) of the descriptions with a
+        # single category and not handled by the existing entries
+        self.stable = dict()
+        for description, distribution in self.samples.items():
+            if len(distribution) != 1 or not description:
+                continue
+            if not self.counterparties.get(description):
+                # no csv row to check the entry against
+                continue
+            category, count = next(iter(distribution.items()))
+            if category == default_expense:
+                continue
+            if self.covered(description):
+                continue
+            self.stable[description] = (category, count)
+
+    def candidates(self):
+        """
+        Returns the suggested entries, most frequent first.
+        """
+        groups = defaultdict(list)
+        for description, (category, _) in self.stable.items():
+            groups[(description.split()[0], category)].append(description)
+
+        candidates = []
+        for (_, category), descriptions in groups.items():
+            if len(descriptions) > 1:
+                candidate = self.candidate(
+                    common_prefix(descriptions), category, descriptions
+                )
+                if candidate is not None:
+                    candidates.append(candidate)
+                    continue
+
+            for description in descriptions:
+                candidate = self.candidate(description, category, [description])
+                if candidate is not None:
+                    candidates.append(candidate)
+
+        return sorted(candidates, key=lambda c: (-c.samples, c.value))
+
+    def candidate(self, value, category, descriptions):
+        """
+        Returns the entry assigning the category to the counterparties of
+        the descriptions, if it is frequent enough and safe, otherwise None.
+        """
+        samples = sum(self.stable[description][1] for description in descriptions)
+        if samples < self.min_count:
+            return None
+
+        originals = [
+            counterparty
+            for description in descriptions
+            for counterparty in self.counterparties[description]
+        ]
+        value = self.matching_words(value, originals)
+        if value is None or value in self.table:
+            return None
+
+        check_type = "contains_ic" if len(value) >= MIN_CONTAINS_LENGTH else "equals_ic"
+        if not all(matches(check_type, original, value) for original in originals):
+            return None
+        if self.conflicts(value, check_type, category) or self.shadows(
+            value, check_type, category
+        ):
+            return None
+
+        return RuleCandidate(value, check_type, category, samples)
+
+    def matching_words(self, value, originals):
+        """
+        Returns the longest run of words of the value contained (ignoring
+        the case) in all the original counterparties, or None.
+        """
+        originals = [original.casefold() for original in originals]
+        words = value.split()
+        for length in range(len(words), 0, -1):
+            for start in range(len(words) - length + 1):
+                run = " ".join(words[start : start + length])
+                if all(run.casefold() in original for original in originals):
+                    return run
+        return None
+
+    def covered(self, description):
+        """
+        Returns True if existing entries match all the counterparties of
+        the description.
+        """
+        return all(
+            any(
+                matches(check_type, counterparty, key)
+                for key, (check_type, _) in self.table.items()
+            )
+            for counterparty in self.counterparties[description]
+        )
+
+    def conflicts(self, value, check_type, category):
+        """
+        Returns True if the entry matches the counterparty of a training
+        description which had another category (or the description itself,
+        when its counterparties are not known).
+        """
+        for description, distribution in self.samples.items():
+            if all(other == category for other in distribution):
+                continue
+            for string in self.counterparties.get(description) or [description]:
+                if matches(check_type, string, value):
+                    return True
+        return False
+
+    def shadows(self, value, check_type, category):
+        """
+        Returns True if the entry matches the value of an existing entry
+        with another account.
+        """
+        for key, (_, account) in self.table.items():
+            if account != category and matches(check_type, key, value):
+                return True
+        return False
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+
+from beanborg.classification.transaction_model import TransactionModel
+
+N_FEATURES = 2**20
+# number of most similar descriptions used to rank the categories
+NEIGHBORS = 10
+
+
+class SparseTransactionModel(TransactionModel):
+    """
+    Scalable alternative to the KNN model of `TransactionModel`.
+
+    Descriptions are turned into hashed word and character n-gram
+    features (no vocabulary to store), and the training set is collapsed
+    to the distinct descriptions, each with the number of samples of every
+    category. Predictions look up the most similar descriptions (cosine
+    similarity) through an inverted index: the transposed feature matrix,
+    so that only the descriptions sharing a feature with the input text
+    are scored. Categories are weighted by the inverse of their frequency
+    instead of oversampling the rare ones.
+
+    The day of month and the day of week are not used: descriptions alone
+    identify recurring payees.
+    """
+
+    words = HashingVectorizer(
+        analyzer=str.split, n_features=N_FEATURES, alternate_sign=False, norm=None
+    )
+    chars = HashingVectorizer(
+        analyzer="char_wb",
+        ngram_range=(3, 3),
+        n_features=N_FEATURES,
+        alternate_sign=False,
+        norm=None,
+    )
+
+    def _features(self, descriptions):
+
+        return normalize(
+            sparse.hstack(
+                [self.words.transform(descriptions), self.chars.transform(descriptions)]
+            ).tocsr()
+        )
+
+    def _create_and_fit_model(self):
+
+        desc_codes, descriptions = pd.factorize(self.training_data["desc"])
+        cat_codes, self.classes = pd.factorize(self.training_data["cat"])
+        if len(self.classes) == 0:
+            raise ValueError("no training data")
+
+        # samples of each category, by distinct description
+        self.counts = sparse.csr_matrix(
+            (np.ones(len(desc_codes)), (desc_codes, cat_codes)),
+            shape=(len(descriptions), len(self.classes)),
+        )
+        class_counts = np.bincount(cat_codes, minlength=len(self.classes))
+        self.class_weights = len(cat_codes) / (len(self.classes) * class_counts)
+
+        # inverted index: feature -> descriptions
+        self.index = self._features(list(descriptions)).T.tocsr()
+
+    def predict(self, text, day_of_month, day_of_week, n=3):
+
+        self._refit()
+        query = self._features([text])
+        similarity = (query @ self.index).toarray().ravel()
+        candidates = np.flatnonzero(similarity)
+        if len(candidates) == 0:
+            return np.array([], dtype=object), np.array([])
+
+        if len(candidates) > NEIGHBORS:
+            nearest = np.argpartition(-similarity[candidates], NEIGHBORS)[:NEIGHBORS]
+            candidates = candidates[nearest]
+
+        # category distribution of each neighbor, weighted by similarity
+        counts = self.counts[candidates].toarray()
+        distributions = counts / counts.sum(axis=1, keepdims=True)
+        scores = similarity[candidates] @ distributions * self.class_weights
+        probs = scores / scores.sum()
+
+        top_indices = np.argsort(probs)[-n:][::-1]
+        top_indices = top_indices[probs[top_indices] > 0]
+        return np.asarray(self.classes)[top_indices], probs[top_indices]
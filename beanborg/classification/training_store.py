@@ -0,0 +1,164 @@
+import hashlib
+import io
+import json
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # pragma: no cover - optional dependency
+    feather = None
+
+SNAPSHOT_VERSION = 2
+COLUMNS = ["date", "desc", "amount", "cat"]
+# number of rows appended to the CSV file after which the snapshot
+# is rewritten
+COMPACT_ROWS = 200
+# number of bytes, at the end of the part of the CSV file covered by the
+# snapshot, hashed to detect rewrites of the file
+DIGEST_BYTES = 1 << 16
+
+
+def tail_digest(filepath, size):
+    """
+    Returns the md5 of the last `DIGEST_BYTES` bytes of the first `size`
+    bytes of a file.
+    """
+    start = max(size - DIGEST_BYTES, 0)
+    with open(filepath, "rb") as data_file:
+        data_file.seek(start)
+        return hashlib.md5(data_file.read(size - start)).hexdigest()
+
+
+def prepare(data):
+    """
+    Parse the dates of the training data and add the derived columns
+    (the last two columns of the data).
+    """
+    data["date"] = pd.to_datetime(data["date"], format="%Y-%m-%d")
+    data["day_of_month"] = data["date"].dt.day
+    data["day_of_week"] = data["date"].dt.dayofweek
+    data["desc"] = data["desc"].astype(str)
+    return data
+
+
+class TrainingStore:
+    """
+    Training data of the classifier.
+
+    The CSV file remains the reference format and is only ever appended
+    to. A snapshot of the parsed data (Feather, if pyarrow is available,
+    otherwise pickle) is kept next to the CSV file, along with the size
+    and the modification time of the CSV file it covers: loading the data
+    means reading the snapshot and parsing only the rows appended since.
+    When rows were appended, the last bytes covered by the snapshot are
+    hashed to tell an append from a rewrite, without reading the whole
+    file. The snapshot is rewritten when the CSV file is modified (not
+    only appended to) or when enough rows were appended.
+    """
+
+    def __init__(self, filepath):
+        self.filepath = os.path.expanduser(filepath)
+        folder, name = os.path.split(self.filepath)
+        extension = ".feather" if feather is not None else ".pkl"
+        self.snapshot_path = os.path.join(folder, "." + name + ".snapshot" + extension)
+        self.meta_path = os.path.join(folder, "." + name + ".snapshot.json")
+
+    def create(self):
+
+        folder = os.path.dirname(self.filepath)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(self.filepath, "w") as data_file:
+            data_file.write(",".join(COLUMNS) + "\n")
+
+    def load(self):
+
+        if not os.path.exists(self.filepath):
+            self.create()
+
+        stat = os.stat(self.filepath)
+        size, mtime = stat.st_size, stat.st_mtime_ns
+        snapshot = self.read_snapshot(size, mtime)
+        if snapshot is None:
+            data = prepare(pd.read_csv(self.filepath))
+            self.write_snapshot(data, size, mtime)
+            return data
+
+        data, covered = snapshot
+        if covered == size:
+            return data
+
+        with open(self.filepath, "rb") as data_file:
+            data_file.seek(covered)
+            tail = data_file.read()
+        appended = prepare(
+            pd.read_csv(io.BytesIO(tail), header=None, names=list(data.columns[:-2]))
+        )
+        data = pd.concat([data, appended], ignore_index=True)
+        if len(appended) >= COMPACT_ROWS:
+            self.write_snapshot(data, size, mtime)
+        return data
+
+    def read_snapshot(self, size, mtime):
+        """
+        Returns the snapshot and the number of bytes of the CSV file it
+        covers, or None if the snapshot is missing or out of date.
+        """
+        try:
+            with open(self.meta_path) as meta_file:
+                meta = json.load(meta_file)
+            if meta.get("version") != SNAPSHOT_VERSION or meta["csv_size"] > size:
+                return None
+            # an unchanged file needs no reading
+            if (meta["csv_size"], meta["csv_mtime"]) != (size, mtime) and (
+                tail_digest(self.filepath, meta["csv_size"]) != meta["csv_md5"]
+            ):
+                return None
+            if feather is not None:
+                data = feather.read_table(self.snapshot_path, memory_map=True)
+                data = data.to_pandas()
+            else:
+                data = pd.read_pickle(self.snapshot_path)
+        except (OSError, ValueError, KeyError):
+            return None
+        return data, meta["csv_size"]
+
+    def write_snapshot(self, data, size, mtime):
+
+        try:
+            if feather is not None:
+                feather.write_feather(data, self.snapshot_path)
+            else:
+                data.to_pickle(self.snapshot_path)
+            with open(self.meta_path, "w") as meta_file:
+                json.dump(
+                    {
+                        "version": SNAPSHOT_VERSION,
+                        "csv_size": size,
+                        "csv_mtime": mtime,
+                        "csv_md5": tail_digest(self.filepath, size),
+                    },
+                    meta_file,
+                )
+        except (OSError, ValueError):
+            # the snapshot is only a cache
+            pass
+
+    def append(self, rows):
+        """
+        Append rows (a DataFrame with the date, desc, amount and cat
+        columns) to the CSV file.
+        """
+        if not os.path.exists(self.filepath):
+            self.create()
+
+        with open(self.filepath, "rb+") as data_file:
+            data_file.seek(0, os.SEEK_END)
+            if data_file.tell() > 0:
+                data_file.seek(-1, os.SEEK_END)
+                if data_file.read(1) != b"\n":
+                    data_file.write(b"\n")
+
+        rows[COLUMNS].to_csv(self.filepath, mode="a", header=False, index=False)
@@ -1,5 +1,3 @@
-import os
-
 import numpy as np
 import pandas as pd
 from imblearn.over_sampling import SMOTE
@@ -10,13 +8,63 @@ from sklearn.feature_extraction.text import CountVectorizer
 from sklearn.neighbors import KNeighborsClassifier
 from sklearn.preprocessing import LabelEncoder, StandardScaler
 
+from beanborg.classification.training_store import TrainingStore
+
 
 class TransactionModel:
+    # the analyzer only depends on the configuration of the vectorizer
+    _analyzer = CountVectorizer(analyzer=str.split).build_analyzer()
+
     def __init__(self, training_data, data_file):
-        self.training_data = training_data
+        self._training_data = training_data.reset_index(drop=True)
+        # rows added since the training data was last compacted
+        self.pending = []
+        # True if the training data changed since the model was fitted
+        self.stale = False
         self.data_file = data_file
+        self.store = TrainingStore(data_file)
+        self._build_desc_index()
         self._create_and_fit_model()
 
+    @property
+    def training_data(self):
+        """
+        The training data, including the rows added since the last
+        compaction.
+        """
+        self._compact()
+        return self._training_data
+
+    def _compact(self):
+        """
+        Append the added rows to the training data, in a single concat,
+        and rebuild the description index.
+        """
+        if not self.pending:
+            return
+        self._training_data = pd.concat(
+            [self._training_data, pd.DataFrame(self.pending)], ignore_index=True
+        )
+        self.pending = []
+        self._build_desc_index()
+
+    def _build_desc_index(self):
+        """
+        Index the rows of the training data by description.
+        """
+        self.desc_index = dict()
+        for position, desc in enumerate(self._training_data["desc"]):
+            self.desc_index.setdefault(desc, []).append(position)
+
+    def _refit(self):
+        """
+        Fit the model again if the training data changed since the last
+        fit.
+        """
+        if self.stale:
+            self._create_and_fit_model()
+            self.stale = False
+
     def _remove_single_sample_classes(self, X, y):
         class_counts = y.value_counts()
         classes_to_keep = class_counts[class_counts >= 2].index
@@ -66,6 +114,8 @@ class TransactionModel:
         self.model.fit(X, y_encoded)
 
     def predict(self, text, day_of_month, day_of_week, n=3):
+        self._refit()
+
         # Create a DataFrame for the input text with the same structure as the training data
         data = {
             "desc": [text],
@@ -90,22 +140,22 @@ class TransactionModel:
         self, date, description, amount, category, day_of_month, day_of_week
     ):
         """
-        Updates the training data with a new or existing entry and retrains the model.
+        Updates the training data with a new or existing entry. The model
+        is fitted again, with all the updates, on the next prediction.
+        Returns True if the training data was updated.
         """
 
         tokenized_description = self._tokenize_description(description)
 
         # Check if the description already exists
-        existing_entry = self.training_data[
-            self.training_data["desc"] == tokenized_description
-        ]
+        existing_rows = self.desc_index.get(tokenized_description)
 
-        if not existing_entry.empty:
-            existing_category = existing_entry["cat"].iloc[0]
+        if existing_rows:
+            existing_category = self._category(existing_rows[0])
 
             if existing_category != category:
                 # Conflict found: Ask user how to handle the conflicting category
-                self._handle_existing_entry_conflict(
+                if not self._handle_existing_entry_conflict(
                     tokenized_description,
                     existing_category,
                     date,
@@ -113,13 +163,14 @@ class TransactionModel:
                     category,
                     day_of_month,
                     day_of_week,
-                )
+                ):
+                    return False
             else:
                 # Entry already exists with the same category, no update needed
                 print(
                     f"Entry already exists with category '{existing_category}'. Skipping update."
                 )
-                return
+                return False
         else:
             # Add a new entry
             self._add_new_entry(
@@ -132,14 +183,24 @@ class TransactionModel:
             date, tokenized_description, amount, category, day_of_month, day_of_week
         )
 
-        self._create_and_fit_model()
+        self.stale = True
+        return True
+
+    def _category(self, position):
+        """
+        Returns the category of a row of the training data, or of a row
+        added since the last compaction.
+        """
+        added = position - len(self._training_data)
+        if added >= 0:
+            return self.pending[added]["cat"]
+        return self._training_data["cat"].iat[position]
 
     def _append_to_csv(
         self, date, description, amount, category, day_of_month, day_of_week
     ):
         """
         Append the new entry to the CSV file without overwriting the whole file.
-        Ensures a newline is present before appending the new entry.
         """
         new_data = pd.DataFrame(
             {
@@ -149,20 +210,7 @@ class TransactionModel:
                 "cat": [category],
             }
         )
-
-        # Check if the file already exists
-        file_exists = os.path.isfile(self.data_file)
-
-        # Ensure there's a newline at the end of the file before appending new data
-        if file_exists:
-            with open(self.data_file, "rb+") as f:
-                f.seek(-1, os.SEEK_END)  # Move to the last byte
-                last_char = f.read(1)
-                if last_char != b"\n":  # Check if the last character is a newline
-                    f.write(b"\n")  # If not, add a newline
-
-        # Now append the new data
-        new_data.to_csv(self.data_file, mode="a", header=False, index=False)
+        self.store.append(new_data)
 
     def _handle_existing_entry_conflict(
         self,
@@ -177,6 +225,7 @@ class TransactionModel:
         """
         Handle the case where an entry with the same description exists but has a different category.
         Allows the user to choose between updating, adding a new entry, or skipping.
+        Returns False if the update is skipped.
         """
         print(
             f"Description '{description}' already exists with category '{existing_category}'."
@@ -191,9 +240,12 @@ class TransactionModel:
 
         if action == "1":
             # Update the existing entry with the new category
-            self.training_data.loc[self.training_data["desc"] == description, "cat"] = (
-                new_category
-            )
+            for position in self.desc_index[description]:
+                added = position - len(self._training_data)
+                if added >= 0:
+                    self.pending[added]["cat"] = new_category
+                else:
+                    self._training_data.at[position, "cat"] = new_category
             print(
                 f"Existing entry for '{description}' updated to category '{new_category}'."
             )
@@ -208,31 +260,32 @@ class TransactionModel:
         else:
             # Skip the update process
             print("Update skipped.")
+            return False
+        return True
 
     def _add_new_entry(
         self, date, description, amount, category, day_of_month, day_of_week
     ):
         """
-        Add a new entry to the training data.
+        Add a new entry to the training data. The entry is buffered
+        until the training data is compacted.
         """
-        new_data = pd.DataFrame(
+        self.pending.append(
             {
-                "date": [date],
-                "desc": [description],
-                "amount": [amount],
-                "cat": [category],
-                "day_of_month": [day_of_month],
-                "day_of_week": [day_of_week],
+                "date": date,
+                "desc": description,
+                "amount": amount,
+                "cat": category,
+                "day_of_month": day_of_month,
+                "day_of_week": day_of_week,
             }
         )
-        self.training_data = pd.concat(
-            [self.training_data, new_data], ignore_index=True
+        self.desc_index.setdefault(description, []).append(
+            len(self._training_data) + len(self.pending) - 1
         )
 
     def _tokenize_description(self, description):
         """
-        Tokenize the description using CountVectorizer.
+        Tokenize the description using the CountVectorizer analyzer.
         """
-        vectorizer = CountVectorizer(analyzer=str.split)
-        tokens = vectorizer.build_analyzer()(description)
-        return " ".join(tokens)
+        return " ".join(self._analyzer(description))
@@ -10,11 +10,48 @@ from rich.syntax import Syntax
 class UIService:
     @staticmethod
     def display_transaction(
-        tx, top_labels: List[str], top_probs: List[float], chatgpt_prediction: str
+        tx,
+        top_labels: List[str],
+        top_probs: List[float],
+        chatgpt_prediction: str,
+        rendered: str = None,
     ):
+        """
+        Display a transaction and its predictions, using the output of
+        `render_transaction` if already available.
+        """
         console = Console()
         console.clear()
+        if rendered is None:
+            rendered = UIService.render_transaction(
+                tx, top_labels, top_probs, chatgpt_prediction
+            )
+        console.file.write(rendered)
+        console.file.flush()
 
+    @staticmethod
+    def render_transaction(
+        tx, top_labels: List[str], top_probs: List[float], chatgpt_prediction: str
+    ) -> str:
+        """
+        Render the transaction and prediction panels to a string
+        (with the terminal control codes), without printing them.
+        """
+        console = Console()
+        with console.capture() as capture:
+            UIService.print_transaction(
+                console, tx, top_labels, top_probs, chatgpt_prediction
+            )
+        return capture.get()
+
+    @staticmethod
+    def print_transaction(
+        console,
+        tx,
+        top_labels: List[str],
+        top_probs: List[float],
+        chatgpt_prediction: str,
+    ):
         # Convert the transaction to a string and apply syntax highlighting
         tx_str = format_entry(tx)
         highlighted_tx = Syntax(tx_str, "python", theme="monokai", line_numbers=False)
@@ -19,6 +19,16 @@ class Rules:
         advanced_duplicate_detection=None,
         training_data=None,
         use_llm=None,
+        validate_ledger=None,
+        full_history_lookup=None,
+        csv_metadata=None,
+        csv_metadata_length=None,
+        bloom_filter=None,
+        classifier_backend=None,
+        auto_classify_threshold=None,
+        auto_classify_categories=[],
+        auto_classify_min_samples=None,
+        suggest_rules_min_count=None,
     ):
         self.bc_file = bc_file
         self.rules_folder = rules_folder
@@ -32,6 +42,16 @@ class Rules:
         self.advanced_duplicate_detection = advanced_duplicate_detection
         self.training_data = training_data
         self.use_llm = use_llm
+        self.validate_ledger = validate_ledger
+        self.full_history_lookup = full_history_lookup
+        self.csv_metadata = csv_metadata
+        self.csv_metadata_length = csv_metadata_length
+        self.bloom_filter = bloom_filter
+        self.classifier_backend = classifier_backend
+        self.auto_classify_threshold = auto_classify_threshold
+        self.auto_classify_categories = auto_classify_categories
+        self.auto_classify_min_samples = auto_classify_min_samples
+        self.suggest_rules_min_count = suggest_rules_min_count
 
 
 class Indexes:
@@ -69,6 +89,8 @@ class Csv:
         archive=None,
         post_script_path=None,
         keep_original=None,
+        archive_compression=None,
+        archive_dedup=None,
     ):
         self.download_path = download_path
         self.name = name
@@ -80,6 +102,8 @@ class Csv:
         self.archive = archive
         self.post_script_path = post_script_path
         self.keep_original = keep_original
+        self.archive_compression = archive_compression
+        self.archive_dedup = archive_dedup
 
 
 class Config:
@@ -105,6 +129,8 @@ class Config:
             csv_data.get("archive_path", "archive"),
             csv_data.get("post_move_script"),
             csv_data.get("keep_original", False),
+            csv_data.get("archive_compression", "none"),
+            csv_data.get("archive_dedup", False),
         )
 
         idx = values.get("indexes", dict())
@@ -135,11 +161,42 @@ class Config:
             rls.get("advanced_duplicate_detection", True),
             rls.get("training_data", "training_data.csv"),
             rls.get("use_llm", False),
+            rls.get("validate_ledger", False),
+            rls.get("full_history_lookup", False),
+            rls.get("csv_metadata", "full"),
+            rls.get("csv_metadata_length", 60),
+            rls.get("bloom_filter", False),
+            rls.get("classifier_backend", "knn"),
+            rls.get("auto_classify_threshold", None),
+            rls.get("auto_classify_categories", []),
+            rls.get("auto_classify_min_samples", 3),
+            rls.get("suggest_rules_min_count", 3),
         )
 
         return Config(csv, indexes, rules)
 
 
+def resolve_paths(config, base_dir):
+    """
+    Resolve the relative paths of the configuration against `base_dir`,
+    instead of the current directory.
+    """
+
+    def resolve(path):
+        if path is None:
+            return None
+        return os.path.join(base_dir, os.path.expanduser(path))
+
+    config.csv.download_path = resolve(config.csv.download_path)
+    config.csv.target = resolve(config.csv.target)
+    config.csv.archive = resolve(config.csv.archive)
+    config.csv.post_script_path = resolve(config.csv.post_script_path)
+    config.rules.bc_file = resolve(config.rules.bc_file)
+    config.rules.rules_folder = resolve(config.rules.rules_folder)
+    config.rules.training_data = resolve(config.rules.training_data)
+    return config
+
+
 def init_config(file, debug):
 
     yaml.add_constructor("!Config", Config.load)
@@ -4,22 +4,30 @@ import os
 import re
 import sys
 import traceback
+from collections import defaultdict
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from random import SystemRandom
 
-from beancount.core.data import Amount
+from beancount.core.data import Amount, Transaction
 from beancount.parser.printer import format_entry
 from rich import print as rprint
 from rich.table import Table
 
-from beanborg.arg_parser import eval_args
+from beanborg.arg_parser import eval_args, import_args
 from beanborg.classification.classifier import Classifier
+from beanborg.classification.description_memo import DescriptionMemo
+from beanborg.classification.rule_miner import RuleMiner
+from beanborg.classification.training_store import TrainingStore
 from beanborg.config import init_config
 from beanborg.handlers.amount_handler import AmountHandler
 from beanborg.model.transactions import Transactions
 from beanborg.rule_engine.Context import Context
+from beanborg.rule_engine.decision_tables import init_decision_table
+from beanborg.rule_engine.rules import LookUpCache
 from beanborg.rule_engine.rules_engine import RuleEngine
+from beanborg.server.cache import file_signature
+from beanborg.utils.archive_catalog import ArchiveCatalog, rows_with_offsets
 from beanborg.utils.duplicate_detector import (
     hash_tuple,
     init_duplication_store,
@@ -28,6 +36,10 @@ from beanborg.utils.duplicate_detector import (
 )
 from beanborg.utils.hash_utils import hash
 from beanborg.utils.journal_utils import JournalUtils
+from beanborg.utils.bloom_filter import LedgerHashFilter
+from beanborg.utils.ledger_metadata import CSV_METADATA, csv_metadata, migrate_ledger
+from beanborg.utils.stages import Stages
+from beanborg.utils.string_utils import StringUtils
 
 
 @dataclass
@@ -39,6 +51,7 @@ class ImportStats:
     hash_collision: int = 0
     ignored_by_rule: int = 0
     skipped_by_user: int = 0
+    auto_classified: int = 0
 
 
 class Importer:
@@ -60,11 +73,33 @@ class Importer:
         print(f'CSV: {",".join(row)}')
         rprint("-" * 80)
 
-    def __init__(self):
+    def __init__(self, interactive=True, cache=None):
         self.stats = ImportStats()
         self.args = None
         self.accounts = set()
         self.txs = Transactions({})
+        self.date_range = None
+        # first and last date of the imported csv file
+        self.csv_dates = None
+        # ledger file written by the import and its size before the import
+        # (None if the file did not exist), used to roll back the import
+        self.ledger_file = None
+        self.ledger_size = None
+        # when False, the import never prompts the user (see `bb_server`)
+        self.interactive = interactive
+        # optional WarmCache, used to reuse rule engines and models
+        # across imports
+        self.cache = cache
+        self.config_file = None
+        # optional Bloom filter of the ledger hashes (see `bloom_filter`)
+        self.hash_filter = None
+        self.tx_hashes = None
+        # when True, the ledger and the classifier are loaded after the
+        # csv rows are processed, instead of concurrently
+        self.sequential = False
+        # folder of the account ledger files written by the import
+        # (the current directory, if None)
+        self.working_dir = None
 
     def gen_datetime(self, min_year=1900, max_year=datetime.now().year):
         """generate a datetime in format yyyy-mm-dd hh:mm:ss.000000"""
@@ -94,6 +129,17 @@ class Importer:
             )
             sys.exit(-1)
 
+        if self.cache is not None:
+            return self.cache.get(
+                ("rule_engine", self.config_file),
+                file_signature(self.config_file, folder),
+                self.new_rule_engine,
+            )
+
+        return self.new_rule_engine()
+
+    def new_rule_engine(self):
+
         return RuleEngine(
             Context(
                 date_fomat=self.args.csv.date_format,
@@ -105,7 +151,7 @@ class Importer:
                 narration_pos=self.args.indexes.narration,
                 account=self.args.rules.account,
                 ruleset=self.args.rules.ruleset,
-                rules_dir=folder,
+                rules_dir=self.args.rules.rules_folder,
                 force_account=self.args.rules.origin_account,
                 debug=self.args.debug,
             )
@@ -126,6 +172,10 @@ class Importer:
         else:
             table.add_row("error", str(self.stats.error))
         table.add_row("tx without category", str(self.stats.no_category))
+        if self.stats.auto_classified > 0:
+            table.add_row(
+                "tx classified automatically", str(self.stats.auto_classified)
+            )
         print("\n")
         rprint(table)
 
@@ -160,12 +210,51 @@ class Importer:
 
         account_file = account + ".ldg"
         account_tx = (
-            init_duplication_store(account_file, self.args.rules.bc_file)
+            init_duplication_store(
+                account_file,
+                self.args.rules.bc_file,
+                self.args.rules.validate_ledger,
+                self.date_range,
+            )
             if self.args.rules.advanced_duplicate_detection
             else {}
         )
         return account_tx
 
+    def get_date_range(self, rows):
+        """
+        Returns the (min, max) date of the csv rows, used to restrict the
+        ledger lookups to the files overlapping the imported period.
+        Returns None if the whole ledger history must be searched.
+        """
+        self.csv_dates = self.get_csv_dates(rows)
+        if self.args.rules.full_history_lookup:
+            return None
+
+        return self.csv_dates
+
+    def get_csv_dates(self, rows):
+        """
+        Returns the (min, max) date of the csv rows, or None if no date
+        can be parsed.
+        """
+        dates = []
+        for row in rows:
+            try:
+                dates.append(
+                    datetime.strptime(
+                        row[self.args.indexes.date].strip(), self.args.csv.date_format
+                    ).date()
+                )
+            except (IndexError, ValueError):
+                # invalid rows are reported during processing
+                pass
+
+        if not dates:
+            return None
+
+        return (min(dates), max(dates))
+
     def verify_accounts_count(self):
         if len(self.accounts) > 1 and len(self.transactions) > 0:
             rprint(
@@ -173,9 +262,44 @@ class Importer:
                 f"file, found: {str(len(self.accounts))}[/red]"
             )
 
-    def verify_unique_transactions(self, account):
+    def get_csv_account(self, rows):
+        """
+        Returns the account of the csv rows, or None if the rows do not
+        have a single account.
+        """
+        if self.args.rules.account:
+            return self.args.rules.account
+
+        accounts = set()
+        for row in rows:
+            try:
+                accounts.add(row[self.args.indexes.account])
+            except IndexError:
+                # invalid rows are reported during processing
+                pass
+        return accounts.pop() if len(accounts) == 1 else None
+
+    def index_ledger(self, account):
+        """
+        Load the hashes of the ledger transactions and the transactions of
+        the given account (if known) used by the duplicate detection.
+        This stage runs while the csv rows go through the rules.
+        """
+        tx_hashes = None
+        if self.hash_filter is None:
+            # with a Bloom filter, the hashes are only loaded when needed
+            tx_hashes = self.load_tx_hashes()
+
+        account_txs = None
+        if account is not None:
+            account_txs = self.fetch_account_transactions(account)
 
-        account_txs = self.fetch_account_transactions(account)
+        return tx_hashes, account_txs
+
+    def verify_unique_transactions(self, account, account_txs=None):
+
+        if account_txs is None:
+            account_txs = self.fetch_account_transactions(account)
         pre_trans = []
         for key in sorted(self.txs.getTransactions()):
             # check if the transaction being imported matches another
@@ -183,8 +307,10 @@ class Importer:
             # in the current ledger file.
             tup = to_tuple(self.txs.getTransactions()[key])
             if hash_tuple(tup) in account_txs:
-                if print_duplication_warning(account_txs[hash_tuple(tup)]):
-                    pre_trans.append(self.txs[key])
+                if print_duplication_warning(
+                    account_txs[hash_tuple(tup)], self.interactive
+                ):
+                    pre_trans.append(self.txs.getTransactions()[key])
             else:
                 pre_trans.append(self.txs.getTransactions()[key])
 
@@ -195,10 +321,19 @@ class Importer:
 
     def write_to_ledger(self, account_file, transactions):
 
+        self.ledger_file = account_file
+        self.ledger_size = (
+            os.path.getsize(account_file) if os.path.isfile(account_file) else None
+        )
         with open(account_file, "a") as exc:
             for tx in transactions:
                 self.write_tx(exc, tx)
 
+        if self.hash_filter is not None:
+            self.hash_filter.update(
+                [tx.meta["md5"] for tx in transactions], account_file
+            )
+
     def fix_uncategorized_tx(self):
         """
         Fix uncategorized transactions in the ledger file.
@@ -206,9 +341,9 @@ class Importer:
 
         # Get target account
         account = self.args.rules.account
-        txs = JournalUtils().get_transactions_by_account_name(
-            self.args.rules.bc_file, account
-        )
+        txs = JournalUtils(
+            self.args.rules.validate_ledger
+        ).get_transactions_by_account_name(self.args.rules.bc_file, account)
         # Get the filename of the first transaction
         filename = txs[0].meta["filename"]
 
@@ -220,51 +355,361 @@ class Importer:
                 if tx.postings[1].account == self.args.rules.default_expense
             ]
         )
-        Classifier(
-            self.args.rules.training_data,
-            self.args.rules.use_llm,
-            self.args.rules.bc_file,
-        ).classify(txs, self.args)
+        self.stats.auto_classified = self.get_classifier().classify(
+            txs, self.args, self.interactive
+        )
 
         with open(filename, "r") as file:
             content = file.read()
-            for tx in txs.getTransactions():
-                self.update_transaction(
-                    content, filename, tx.meta["md5"], tx.postings[1].account
+        for tx in txs.getTransactions():
+            if tx.postings[1].account != self.args.rules.default_expense:
+                content = self.update_transaction(
+                    content, tx.meta["md5"], tx.postings[1].account, tx.meta
                 )
+        with open(filename, "w") as file:
+            file.write(content)
 
-    def update_transaction(self, ledger_content, ledger_file, md5, new_category):
+    def check_csv_metadata(self):
+        """
+        Exit if the `csv_metadata` policy is not a known policy.
+        """
+        policy = self.args.rules.csv_metadata
+        if policy not in CSV_METADATA:
+            rprint(f"[red]invalid csv_metadata: {policy}[/red]")
+            sys.exit(-1)
 
-        # Find the transaction block with the given md5
-        pattern = rf'(.*?md5: "{md5}".*?Expenses:Unknown.*?\n\n)'
-        match = re.search(pattern, ledger_content, re.DOTALL)
+    def migrate_metadata(self):
+        """
+        Rewrite the `csv` metadata of the ledger according to the
+        `csv_metadata` policy.
+        """
+        self.check_csv_metadata()
+        migrated = migrate_ledger(
+            self.args.rules.bc_file,
+            self.args.rules.csv_metadata,
+            self.args.rules.csv_metadata_length,
+        )
+        for filename, changed in migrated:
+            print("\u2713" + f" {filename}: {changed} lines rewritten")
+        print(f"Done :) {len(migrated)} files rewritten")
 
-        if match:
-            transaction_block = match.group(1)
+    def suggest_rules(self):
+        """
+        Print the `account.rules` entries mined from the training data,
+        ready to be reviewed and added to the rules file.
+        """
+        table = init_decision_table(
+            os.path.join(self.args.rules.rules_folder, "account.rules"),
+            self.debug(),
+        )
+        counterparties = self.archived_counterparties()
+        if not counterparties:
+            rprint(
+                "[red]no archived csv row of the ledger transactions found in "
+                f"{self.args.csv.archive}: the rules can not be checked "
+                "against the csv counterparties[/red]",
+                file=sys.stderr,
+            )
+        miner = RuleMiner(
+            TrainingStore(self.args.rules.training_data).load(),
+            table,
+            counterparties,
+            self.args.rules.suggest_rules_min_count,
+            self.args.rules.default_expense,
+        )
+        candidates = miner.candidates()
+        for candidate in candidates:
+            if self.debug():
+                print(f"# {candidate.samples} samples")
+            print(candidate.to_rule())
+        rprint(f"{len(candidates)} rules suggested", file=sys.stderr)
+
+    def archived_counterparties(self):
+        """
+        Returns the csv counterparties of the ledger transactions, by
+        training description (the description the classifier derives from
+        the payee of the transaction). The csv rows are read from the
+        archived files, and matched to the transactions by hash.
+        """
+        counterparties = defaultdict(list)
+        if not os.path.isdir(self.args.csv.archive):
+            return counterparties
+
+        index = self.args.indexes.counterparty
+        archived = dict()
+        catalog = ArchiveCatalog(self.args.csv.archive)
+        try:
+            catalog.sync(self.args)
+            for name, _, _ in catalog.files_of(self.args.csv.ref):
+                for _, row in rows_with_offsets(catalog.store.read(name), self.args):
+                    if len(row) > index:
+                        archived[hash(row)] = row[index]
+        finally:
+            catalog.close()
+
+        for entry in JournalUtils(self.args.rules.validate_ledger).get_entries(
+            self.args.rules.bc_file
+        ):
+            if isinstance(entry, Transaction) and entry.meta.get("md5") in archived:
+                description = StringUtils.strip_digits(
+                    (entry.payee or entry.narration or "").upper()
+                )
+                counterparties[DescriptionMemo.normalize(description)].append(
+                    archived[entry.meta["md5"]]
+                )
+        return counterparties
 
-            # Replace 'Expenses:Unknown' with the new category
-            updated_block = re.sub(
-                r"(  Expenses:Unknown)", f"  {new_category}", transaction_block
+    def get_classifier(self):
+        """
+        Returns the Classifier for the configured training data.
+        When a cache is available, the fitted model is reused as long as
+        the training data file does not change.
+        """
+        if self.cache is not None:
+            return self.cache.get(
+                ("classifier", self.args.rules.training_data),
+                file_signature(self.args.rules.training_data),
+                self.new_classifier,
             )
 
-            # Replace the old block with the updated one
-            updated_content = ledger_content.replace(transaction_block, updated_block)
+        return self.new_classifier()
 
-            # Write the updated content back to the file
-            with open(ledger_file, "w") as file:
-                file.write(updated_content)
-        else:
+    def new_classifier(self):
+
+        return Classifier(
+            self.args.rules.training_data,
+            self.args.rules.use_llm,
+            self.args.rules.bc_file,
+            self.args.rules.classifier_backend,
+        )
+
+    def update_transaction(self, ledger_content, md5, new_category, meta=None):
+        """
+        Returns the ledger content with the uncategorized transaction with
+        the given md5 assigned to the new category (and tagged as
+        auto-classified, if so marked in `meta`).
+        """
+        # Find the transaction block with the given md5: the header line
+        # and the indented lines following it
+        pattern = (
+            r'^\S[^\n]*\n(?:[ \t][^\n]*\n)*?[ \t]+md5: "%s"[^\n]*\n(?:[ \t][^\n]*(?:\n|$))*'
+            % re.escape(md5)
+        )
+        match = re.search(pattern, ledger_content, re.MULTILINE)
+        default_expense = re.escape(self.args.rules.default_expense)
+        if not match or not re.search(
+            rf"^[ \t]+{default_expense}\s*$", match.group(0), re.MULTILINE
+        ):
             print(f"Skipping transaction with md5 {md5} not found.")
+            return ledger_content
+
+        transaction_block = match.group(0)
+        # Replace the default expense with the new category
+        updated_block = re.sub(
+            rf"^([ \t]+){default_expense}(\s*)$",
+            lambda m: m.group(1) + new_category + m.group(2),
+            transaction_block,
+            count=1,
+            flags=re.MULTILINE,
+        )
+        if meta and meta.get("classified") == "auto":
+            updated_block = re.sub(
+                r'^([ \t]+)(md5: "[^"]*"\n)',
+                lambda m: m.group(1) + m.group(2) + m.group(1) + 'classified: "auto"\n',
+                updated_block,
+                count=1,
+                flags=re.MULTILINE,
+            )
+
+        return (
+            ledger_content[: match.start()]
+            + updated_block
+            + ledger_content[match.end() :]
+        )
 
     def import_transactions(self):
 
-        options = eval_args("Parse bank csv file and import into beancount")
+        options = eval_args(
+            "Parse bank csv file and import into beancount", import_args
+        )
+        self.config_file = options.file
         self.args = init_config(options.file, options.debug)
 
+        if options.unattended:
+            self.interactive = False
+
+        if options.sequential:
+            self.sequential = True
+
         if options.fix_only:
             self.fix_uncategorized_tx()
             return
 
+        if options.migrate_metadata:
+            self.migrate_metadata()
+            return
+
+        if options.suggest_rules:
+            self.suggest_rules()
+            return
+
+        self.import_csv()
+
+    def import_csv(self, rows=None):
+        """
+        Import the csv file from the staging area, or the given
+        csv rows (header lines already skipped).
+        """
+
+        self.check_csv_metadata()
+        if rows is None:
+            rows = self.read_csv()
+
+        # the rules files are checked once per import
+        LookUpCache.refresh()
+        rule_engine = self.init_rule_engine()
+
+        self.date_range = self.get_date_range(rows)
+        if self.debug():
+            print("ledger lookup date range: " + str(self.date_range))
+
+        self.tx_hashes = None
+        if self.args.rules.bloom_filter:
+            self.hash_filter = LedgerHashFilter(self.args.rules.bc_file)
+
+        # the ledger is loaded while the rows go through the rules, the
+        # classifier as soon as a new transaction needs it
+        stages = Stages(self.sequential)
+        try:
+            csv_account = self.get_csv_account(rows)
+            ledger = stages.start(self.index_ledger, csv_account)
+            classifier = None
+
+            results = []
+            for row in rows:
+                md5, entry, error = self.apply_rules(row, rule_engine)
+                results.append((row, md5, entry, error))
+
+            tx_hashes, account_txs = ledger.result()
+            if tx_hashes is not None:
+                self.tx_hashes = tx_hashes
+
+            for row, md5, entry, error in results:
+                self.stats.tx_in_file += 1
+                if md5 is not None and self.is_imported(md5):
+                    self.warn_hash_collision(row, md5)
+                elif error is not None:
+                    self.report_error(row, error)
+                elif entry is None:
+                    self.stats.ignored_by_rule += 1
+                else:
+                    self.add_tx(*entry)
+                    if classifier is None and self.needs_classifier(entry):
+                        classifier = stages.start(self.get_classifier)
+
+            self.verify_accounts_count()
+            working_account = self.accounts.pop()
+            filtered_txs = self.verify_unique_transactions(
+                working_account,
+                account_txs if working_account == csv_account else None,
+            )
+
+            self.stats.skipped_by_user = self.txs.count() - filtered_txs.count()
+            self.stats.processed = filtered_txs.count()
+
+            if filtered_txs.count_no_category(self.args.rules.default_expense) > 0:
+                # without a user, only the transactions that can be
+                # classified automatically are classified
+                if (
+                    self.interactive
+                    or self.args.rules.auto_classify_threshold is not None
+                ):
+                    if classifier is None:
+                        classifier = stages.start(self.get_classifier)
+                    self.stats.auto_classified = classifier.result().classify(
+                        filtered_txs, self.args, self.interactive
+                    )
+        finally:
+            stages.close()
+
+        # write transactions to file
+        account_file = os.path.join(self.working_dir or "", working_account + ".ldg")
+        try:
+            self.write_to_ledger(account_file, filtered_txs.getTransactions())
+        finally:
+            if self.hash_filter is not None:
+                self.hash_filter.close()
+                self.hash_filter = None
+        self.print_summary()
+        if self.debug():
+            print(LookUpCache.stats())
+
+    def apply_rules(self, row, rule_engine):
+        """
+        Run a csv row through the rules.
+        Returns the hash of the row, the (key, transaction) pair (None if
+        the row is ignored by a rule) and the error raised, if any.
+        """
+        try:
+            # calculate hash of csv row
+            md5 = hash(row)
+
+            # keep track of the accounts for each tx:
+            # the system expects one account per imported file
+            res_account = self.get_account(row)
+            if self.debug():
+                print("resolved account: " + str(res_account))
+            self.accounts.add(res_account)
+        except Exception as e:
+            return None, None, e
+
+        try:
+            return md5, self.process_tx(row, md5, rule_engine), None
+        except Exception as e:
+            return md5, None, e
+
+    def report_error(self, row, error):
+
+        print("error: " + str(error))
+        self.log_error(row)
+        self.stats.error += 1
+        if self.debug():
+            traceback.print_exception(type(error), error, error.__traceback__)
+
+    def needs_classifier(self, entry):
+        """
+        Returns True if the given (key, transaction) pair has to be
+        classified.
+        """
+        return (
+            entry is not None
+            and entry[1].postings[1].account == self.args.rules.default_expense
+            and (
+                self.interactive or self.args.rules.auto_classify_threshold is not None
+            )
+        )
+
+    def is_imported(self, md5):
+        """
+        Returns True if a transaction with the given hash is in the ledger.
+        The ledger is searched only if the Bloom filter (when enabled)
+        can not rule out the hash.
+        """
+        if self.hash_filter is not None and md5 not in self.hash_filter:
+            return False
+
+        if self.tx_hashes is None:
+            self.tx_hashes = self.load_tx_hashes()
+        return md5 in self.tx_hashes
+
+    def load_tx_hashes(self):
+
+        return JournalUtils(self.args.rules.validate_ledger).transaction_hashes(
+            self.args.rules.bc_file, self.date_range
+        )
+
+    def read_csv(self):
+
         # transactions csv file to import
         import_csv = os.path.join(self.args.csv.target, f"{self.args.csv.ref}.csv")
 
@@ -272,56 +717,24 @@ class Importer:
             rprint("[red]file: %s does not exist![red]" % (import_csv))
             sys.exit(-1)
 
-        rule_engine = self.init_rule_engine()
-        tx_hashes = JournalUtils().transaction_hashes(self.args.rules.bc_file)
-
         with open(import_csv) as csv_file:
             csv_reader = csv.reader(csv_file, delimiter=self.args.csv.separator)
             for _ in range(self.args.csv.skip):
                 next(csv_reader)  # skip the line
-            for row in csv_reader:
-                self.stats.tx_in_file += 1
-                try:
-                    # calculate hash of csv row
-                    md5 = hash(row)
-
-                    # keep track of the accounts for each tx:
-                    # the system expects one account per imported file
-                    res_account = self.get_account(row)
-                    if self.debug():
-                        print("resolved account: " + str(res_account))
-                    self.accounts.add(res_account)
-
-                    if md5 not in tx_hashes:
-                        self.process_tx(row, md5, rule_engine)
-                    else:
-                        self.warn_hash_collision(row, md5)
-
-                except Exception as e:
-                    print("error: " + str(e))
-                    self.log_error(row)
-                    self.stats.error += 1
-                    if self.debug():
-                        traceback.print_exc()
-
-        self.verify_accounts_count()
-        working_account = self.accounts.pop()
-        filtered_txs = self.verify_unique_transactions(working_account)
-
-        self.stats.skipped_by_user = self.txs.count() - filtered_txs.count()
-        self.stats.processed = filtered_txs.count()
-
-        if filtered_txs.count_no_category(self.args.rules.default_expense) > 0:
-            Classifier(
-                self.args.rules.training_data,
-                self.args.rules.use_llm,
-                self.args.rules.bc_file,
-            ).classify(filtered_txs, self.args)
+            return list(csv_reader)
 
-        # write transactions to file
-        account_file = working_account + ".ldg"
-        self.write_to_ledger(account_file, filtered_txs.getTransactions())
-        self.print_summary()
+    def rollback(self):
+        """
+        Remove the transactions written to the ledger by the import.
+        """
+        if self.ledger_file is None:
+            return
+        if self.ledger_size is None:
+            os.remove(self.ledger_file)
+        else:
+            with open(self.ledger_file, "r+") as ledger:
+                ledger.truncate(self.ledger_size)
+        self.ledger_file = None
 
     def validate(self, tx):
         """
@@ -342,7 +755,13 @@ class Importer:
 
     def enrich(self, row, tx, tx_date, md5):
 
-        tx_meta = {"csv": ",".join(row), "md5": md5}
+        tx_meta = dict()
+        csv_value = csv_metadata(
+            row, self.args.rules.csv_metadata, self.args.rules.csv_metadata_length
+        )
+        if csv_value is not None:
+            tx_meta["csv"] = csv_value
+        tx_meta["md5"] = md5
 
         # replace date """
         tx = tx._replace(date=str(tx_date.date()))
@@ -371,14 +790,14 @@ class Importer:
         return tx
 
     def process_tx(self, row, md5, rule_engine):
-
+        """
+        Build the transaction of a csv row.
+        Returns the key and the transaction, or None if the row is
+        ignored by a rule.
+        """
         tx = rule_engine.execute(row)
 
         if tx:
-            # check if the a category is assigned
-            if tx.postings[1].account == self.args.rules.default_expense:
-                self.stats.no_category += 1
-
             tx_date = datetime.strptime(
                 row[self.args.indexes.date].strip(), self.args.csv.date_format
             )
@@ -389,7 +808,14 @@ class Importer:
             # - the tx date
             # - a random time (tx time is not important, but date is!)
             key = str(tx_date) + str(self.gen_datetime().time())
-            self.txs.getTransactions()[key] = tx
+            return key, tx
 
-        else:
-            self.stats.ignored_by_rule += 1
+        return None
+
+    def add_tx(self, key, tx):
+
+        # check if the a category is assigned
+        if tx.postings[1].account == self.args.rules.default_expense:
+            self.stats.no_category += 1
+
+        self.txs.getTransactions()[key] = tx
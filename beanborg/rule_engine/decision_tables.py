@@ -2,10 +2,106 @@
 
 import csv
 import os
+import re
+
+REGEX_TYPES = ("regex", "regex_ic")
+# patterns which can not be combined with other patterns: backreferences
+# by number and global flags
+UNCOMBINABLE = re.compile(r"\\[1-9]|\(\?[aiLmsux]+\)")
+
+
+class DecisionTable(dict):
+    """
+    Entries of a decision table (value -> (check type, result)), in file
+    order. The regular expressions of the table are compiled once, the
+    first time the table is used.
+    """
+
+    automaton = None
+
+
+class RegexAutomaton:
+    """
+    Finds the first `regex` or `regex_ic` entry of a table matching a
+    string, given the (position in the table, expression, ignore case)
+    of the entries.
+
+    The expressions are combined into a single alternation of named
+    groups, in file order: the alternation is matched at the start of the
+    string, each expression being preceded by a lazy `.*?`, so that the
+    first matching alternative is the first matching entry (wherever it
+    matches in the string), with a single scan of the string.
+    Tables with expressions which can not be combined (backreferences by
+    number, global flags) are matched one expression at a time.
+    """
+
+    def __init__(self, entries):
+        # (position in the table, compiled expression) of the entries
+        self.patterns = []
+        # regex group -> position in the table
+        self.groups = dict()
+        self.combined = None
+
+        alternatives = []
+        for position, value, ignore_case in entries:
+            flags = re.IGNORECASE if ignore_case else 0
+            self.patterns.append((position, re.compile(value, flags)))
+            group = f"r{len(self.groups)}"
+            self.groups[group] = position
+            scope = "?i:" if ignore_case else "?:"
+            alternatives.append(f"(?P<{group}>(?s:.*?)({scope}{value}))")
+
+        if alternatives and not any(
+            UNCOMBINABLE.search(pattern.pattern) for _, pattern in self.patterns
+        ):
+            try:
+                self.combined = re.compile("|".join(alternatives))
+            except re.error:
+                self.combined = None
+
+    def first_match(self, string):
+        """
+        Returns the position of the first entry matching the string,
+        or None.
+        """
+        if self.combined is not None:
+            m = self.combined.match(string)
+            return None if m is None else self.groups[m.lastgroup]
+
+        for position, pattern in self.patterns:
+            if pattern.search(string):
+                return position
+        return None
+
+
+def regex_automaton(table):
+    """
+    Returns the RegexAutomaton of the table, or None if the table has
+    no regex entry.
+    """
+    if isinstance(table, DecisionTable):
+        if table.automaton is None:
+            table.automaton = RegexAutomaton(regex_entries(table))
+        automaton = table.automaton
+    else:
+        automaton = RegexAutomaton(regex_entries(table))
+    return automaton if automaton.patterns else None
+
+
+def regex_entries(table):
+    """
+    Returns the (position, expression, ignore case) of the `regex` and
+    `regex_ic` entries of a table.
+    """
+    return [
+        (position, value, check_type == "regex_ic")
+        for position, (value, (check_type, _)) in enumerate(table.items())
+        if check_type in REGEX_TYPES
+    ]
 
 
 def init_decision_table(file, debug=False):
-    table = {}
+    table = DecisionTable()
     tablefile = os.path.join(os.getcwd(), file)
     if not os.path.isfile(tablefile) or os.stat(file).st_size == 0:
         if debug:
@@ -16,7 +112,7 @@ def init_decision_table(file, debug=False):
             next(csv_reader)  # skip first line
             for row in csv_reader:
                 if any(row):
-                    if len(row) == 3:
+                    if len(row) == 3 and valid_value(row[0], row[1]):
                         table[row[0]] = (row[1], row[2])
                     else:
                         print("invalid rule: " + ", ".join(row))
@@ -30,30 +126,44 @@ def decomment(csvfile):
             yield row
 
 
+def valid_value(value, eq_check_type):
+
+    if eq_check_type in REGEX_TYPES:
+        try:
+            re.compile(value)
+        except re.error:
+            return False
+    return True
+
+
 def resolve_from_decision_table(table, string, default):
 
-    eq_check_func = {
-        "equals": _equals,
-        "equals_ic": _equals_ignore_case,
-        "startsWith": _startsWith,
-        "endsWith": _endsWith,
-        "contains": _contains,
-        "contains_ic": _contains_ignore_case,
-        "eq": _equals,
-        "sw": _startsWith,
-        "ew": _endsWith,
-        "co": _contains,
-    }
-    for k in table.keys():
+    # the regex entries are matched all at once
+    automaton = regex_automaton(table)
+    first_regex = automaton.first_match(string) if automaton else None
+
+    for position, k in enumerate(table.keys()):
         t = table[k]
         eq_check_type = t[0]
+        if position == first_regex:
+            return t[1]
+        if eq_check_type in REGEX_TYPES:
+            continue
         # TODO: do not fail if string (equals, contains, etc does not match)
-        if eq_check_func.get(eq_check_type)(string, k):
+        if matches(eq_check_type, string, k):
             return t[1]
 
     return default
 
 
+def matches(eq_check_type, string, value):
+    """
+    Returns True if the string matches the value of a decision table
+    entry, according to the check type of the entry (equals, contains...).
+    """
+    return EQ_CHECK_FUNC.get(eq_check_type)(string, value)
+
+
 def _equals(string_a, string_b):
     return string_a == string_b
 
@@ -76,3 +186,127 @@ def _contains(string_a, string_b):
 
 def _contains_ignore_case(string_a, string_b):
     return string_b.casefold() in string_a.casefold()
+
+
+def _regex(string_a, string_b):
+    return re.search(string_b, string_a) is not None
+
+
+def _regex_ignore_case(string_a, string_b):
+    return re.search(string_b, string_a, re.IGNORECASE) is not None
+
+
+EQ_CHECK_FUNC = {
+    "equals": _equals,
+    "equals_ic": _equals_ignore_case,
+    "startsWith": _startsWith,
+    "endsWith": _endsWith,
+    "contains": _contains,
+    "contains_ic": _contains_ignore_case,
+    "eq": _equals,
+    "sw": _startsWith,
+    "ew": _endsWith,
+    "co": _contains,
+    "regex": _regex,
+    "regex_ic": _regex_ignore_case,
+}
+
+
+class CombinedIndex:
+    """
+    Finds the first matching entry of each of several decision tables,
+    with a single lookup of a string (the tables of the rules reading
+    the same csv index).
+
+    The `equals`, `equals_ic`, `startsWith` and `endsWith` entries of all
+    the tables are stored in dictionaries, keyed by their value, so that
+    they are found with one dictionary lookup per distinct length of the
+    prefixes and suffixes. The `contains` and regular expression entries
+    of each table are combined into a RegexAutomaton, matched on the
+    string (and on the casefolded string, for the `contains_ic` entries).
+    Each table keeps its own matching modes and the first matching entry
+    of each table wins, as with `resolve_from_decision_table`.
+    """
+
+    def __init__(self, tables):
+        # table -> results of the entries, by position
+        self.results = []
+        # value -> {table: position of the first entry with the value}
+        self.exact = dict()
+        self.exact_ic = dict()
+        self.prefixes = dict()
+        self.suffixes = dict()
+        # table -> RegexAutomaton of the string, and of the casefolded
+        # string
+        self.automata = []
+        self.folded_automata = []
+
+        for table_index, table in enumerate(tables):
+            self.results.append([result for _, result in table.values()])
+            scanned = []
+            folded = []
+            for position, (value, (check_type, _)) in enumerate(table.items()):
+                if check_type not in EQ_CHECK_FUNC:
+                    raise ValueError("invalid check type: " + str(check_type))
+                if check_type in ("equals", "eq"):
+                    index, key = self.exact, value
+                elif check_type == "equals_ic":
+                    index, key = self.exact_ic, value.casefold()
+                elif check_type in ("startsWith", "sw"):
+                    index, key = self.prefixes, value
+                elif check_type in ("endsWith", "ew"):
+                    index, key = self.suffixes, value
+                elif check_type in ("contains", "co"):
+                    scanned.append((position, re.escape(value), False))
+                    continue
+                elif check_type == "contains_ic":
+                    folded.append((position, re.escape(value.casefold()), False))
+                    continue
+                else:
+                    scanned.append((position, value, check_type == "regex_ic"))
+                    continue
+                index.setdefault(key, dict()).setdefault(table_index, position)
+            self.automata.append(RegexAutomaton(scanned) if scanned else None)
+            self.folded_automata.append(RegexAutomaton(folded) if folded else None)
+
+        self.prefix_lengths = sorted({len(value) for value in self.prefixes})
+        self.suffix_lengths = sorted({len(value) for value in self.suffixes})
+
+    def resolve(self, string, default):
+        """
+        Returns the result of the first entry of each table matching the
+        string (`default` for the tables without a matching entry).
+        """
+        first = [None] * len(self.results)
+
+        def found(positions):
+            for table_index, position in positions.items():
+                if first[table_index] is None or position < first[table_index]:
+                    first[table_index] = position
+
+        folded = string.casefold()
+        found(self.exact.get(string, {}))
+        found(self.exact_ic.get(folded, {}))
+        for length in self.prefix_lengths:
+            if length > len(string):
+                break
+            found(self.prefixes.get(string[:length], {}))
+        for length in self.suffix_lengths:
+            if length > len(string):
+                break
+            found(self.suffixes.get(string[len(string) - length :], {}))
+        for table_index, automaton in enumerate(self.automata):
+            if automaton is not None:
+                position = automaton.first_match(string)
+                if position is not None:
+                    found({table_index: position})
+        for table_index, automaton in enumerate(self.folded_automata):
+            if automaton is not None:
+                position = automaton.first_match(folded)
+                if position is not None:
+                    found({table_index: position})
+
+        return tuple(
+            default if position is None else results[position]
+            for results, position in zip(self.results, first)
+        )
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+import math
+import re
+from collections import OrderedDict
+
+NGRAM = 3
+
+
+def normalize(string):
+    """
+    Lower case words, without digits and punctuation
+    (dots and apostrophes are dropped: "S.A." -> "sa").
+    """
+    string = re.sub(r"[.'’]", "", string.lower())
+    return " ".join(re.sub(r"[\W\d_]+", " ", string).split())
+
+
+def ngrams(string):
+
+    padded = f" {string} "
+    return {padded[i : i + NGRAM] for i in range(len(padded) - NGRAM + 1)}
+
+
+class FuzzyIndex:
+    """
+    Finds the entry whose text is the most similar to a string, among
+    a list of (text, result) entries.
+
+    The similarity is the Dice coefficient of the character trigrams of
+    the (normalized) strings. Entries are found through an inverted index
+    (trigram -> entries): as an entry must share a minimum number of
+    trigrams with the string to reach the threshold, only the entries
+    sharing one of the rarest trigrams of the string are compared.
+    The results are memoized by string.
+    """
+
+    # number of memoized results
+    max_results = 16384
+
+    def __init__(self, entries, threshold=0.8):
+        self.threshold = threshold
+        # trigrams and result of each entry
+        self.grams = []
+        self.results = []
+        # trigram -> positions of the entries
+        self.index = dict()
+        self.memo = OrderedDict()
+
+        seen = set()
+        for text, result in entries:
+            text = normalize(text)
+            if not text or text in seen:
+                continue
+            seen.add(text)
+            position = len(self.grams)
+            self.grams.append(ngrams(text))
+            self.results.append(result)
+            for gram in self.grams[position]:
+                self.index.setdefault(gram, []).append(position)
+
+    def best(self, string):
+        """
+        Returns the result of the most similar entry (the first one, in
+        case of ties), or None if no entry reaches the threshold.
+        """
+        if string in self.memo:
+            self.memo.move_to_end(string)
+            return self.memo[string]
+
+        result = self.search(string)
+        self.memo[string] = result
+        if len(self.memo) > self.max_results:
+            self.memo.popitem(last=False)
+        return result
+
+    def search(self, string):
+
+        text = normalize(string)
+        if not text:
+            return None
+        grams = ngrams(text)
+
+        # a similarity of at least `threshold` requires this many shared
+        # trigrams: entries must share one of the rarest trigrams
+        overlap = math.ceil(self.threshold * len(grams) / (2 - self.threshold))
+        rarest = sorted(grams, key=lambda gram: len(self.index.get(gram, ())))
+        candidates = set()
+        for gram in rarest[: max(len(grams) - overlap + 1, 1)]:
+            candidates.update(self.index.get(gram, ()))
+
+        best, best_score = None, self.threshold
+        for position in sorted(candidates):
+            shared = len(grams & self.grams[position])
+            score = 2 * shared / (len(grams) + len(self.grams[position]))
+            if score > best_score or (best is None and score >= best_score):
+                best, best_score = position, score
+
+        return None if best is None else self.results[best]
@@ -3,30 +3,226 @@
 import abc
 import fnmatch
 import os
+import re
 import sys
+from collections import OrderedDict
+from dataclasses import dataclass, field
 
 from beancount.core.data import Posting
 
 from .Context import Context
-from .decision_tables import init_decision_table, resolve_from_decision_table
+from .decision_tables import (
+    REGEX_TYPES,
+    CombinedIndex,
+    init_decision_table,
+    resolve_from_decision_table,
+)
+from .fuzzy_index import FuzzyIndex
+
+# returned by the lookups when no entry of the table matches
+NO_MATCH = object()
+
+
+@dataclass
+class CachedTable:
+    # (mtime, size) of the file the table was loaded from
+    signature: tuple
+    table: dict
+    # looked up string -> resolved value, least recently used first
+    results: OrderedDict = field(default_factory=OrderedDict)
+    # threshold -> FuzzyIndex of the table
+    fuzzy: dict = field(default_factory=dict)
+
+
+@dataclass
+class CombinedTables:
+    # signatures of the tables the index was built from
+    signatures: tuple
+    # CombinedIndex of the tables (None if it can not be built)
+    index: object
+    # looked up string -> resolved values, least recently used first
+    results: OrderedDict = field(default_factory=OrderedDict)
 
 
 class LookUpCache:
     """
-    Simple cache for lookup tables
+    Cache for lookup tables, keyed by the absolute path of their file.
+
+    A table is reloaded when the modification time or the size of its
+    file changes, so that long-lived processes (see `bb_server`) pick up
+    edited rules files, and the least recently used tables are evicted
+    beyond `max_tables`. The files are checked once after each
+    `refresh()` (called for each import and each rule engine), not on
+    every lookup.
+
+    The values resolved from each table are memoized (keyed by the
+    looked up string), as the same counterparties occur many times in a
+    csv file. So are the values resolved from several tables at once
+    (see `resolve_many`).
     """
 
-    cache = dict()
+    # absolute path -> CachedTable, least recently used first
+    tables = OrderedDict()
+    # path -> CachedTable of the tables checked since the last `refresh()`
+    checked = dict()
+    max_tables = 64
+    # number of memoized values per table
+    max_results = 4096
+    # absolute paths of several tables -> CombinedTables
+    combined = dict()
+    # tables loaded and evicted, memoized values used or computed
+    loads = 0
+    evictions = 0
+    hits = 0
+    misses = 0
 
     @staticmethod
-    def init_decision_table(key, path):
+    def refresh():
+        """
+        Check the files of the tables again, the next time they are used.
+        """
+        LookUpCache.checked.clear()
 
-        if key in LookUpCache.cache:
-            return LookUpCache.cache[key]
+    @staticmethod
+    def get(path):
+
+        cached = LookUpCache.checked.get(path)
+        if cached is not None:
+            return cached
+
+        abspath = os.path.abspath(path)
+        stat = os.stat(abspath)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = LookUpCache.tables.get(abspath)
+        if cached is None or cached.signature != signature:
+            cached = CachedTable(signature, init_decision_table(abspath))
+            LookUpCache.tables[abspath] = cached
+            LookUpCache.loads += 1
+
+        LookUpCache.tables.move_to_end(abspath)
+        while len(LookUpCache.tables) > LookUpCache.max_tables:
+            LookUpCache.tables.popitem(last=False)
+            LookUpCache.evictions += 1
+            LookUpCache.checked.clear()
+        LookUpCache.checked[path] = cached
+        return cached
+
+    @staticmethod
+    def exists(path):
+        """
+        Returns True if the file of the table exists (tables already
+        checked since the last `refresh()` are not checked again).
+        """
+        return path in LookUpCache.checked or os.path.isfile(path)
+
+    @staticmethod
+    def init_decision_table(path):
+
+        return LookUpCache.get(path).table
+
+    @staticmethod
+    def resolve(path, string, default):
+        """
+        Resolve the string from the decision table stored in the given
+        path, returning `default` if no entry matches.
+        """
+        cached = LookUpCache.get(path)
+        results = cached.results
+        if string in results:
+            LookUpCache.hits += 1
+            results.move_to_end(string)
+            value = results[string]
+        else:
+            LookUpCache.misses += 1
+            value = resolve_from_decision_table(cached.table, string, NO_MATCH)
+            results[string] = value
+            if len(results) > LookUpCache.max_results:
+                results.popitem(last=False)
+
+        return default if value is NO_MATCH else value
+
+    @staticmethod
+    def resolve_many(paths, string):
+        """
+        Resolve the string from the decision tables stored in the given
+        paths with a single lookup (see `CombinedIndex`), returning the
+        value resolved from each table (NO_MATCH if no entry matches).
+        """
+        tables = [LookUpCache.get(path) for path in paths]
+        key = tuple(os.path.abspath(path) for path in paths)
+        signatures = tuple(cached.signature for cached in tables)
+        combined = LookUpCache.combined.get(key)
+        if combined is None or combined.signatures != signatures:
+            try:
+                index = CombinedIndex([cached.table for cached in tables])
+            except ValueError:
+                # the tables are resolved one after the other, failing
+                # on the invalid entry as usual
+                index = None
+            combined = CombinedTables(signatures, index)
+            LookUpCache.combined[key] = combined
+
+        results = combined.results
+        if string in results:
+            LookUpCache.hits += 1
+            results.move_to_end(string)
+            return results[string]
+
+        LookUpCache.misses += 1
+        if combined.index is not None:
+            values = combined.index.resolve(string, NO_MATCH)
+        else:
+            values = tuple(
+                resolve_from_decision_table(cached.table, string, NO_MATCH)
+                for cached in tables
+            )
+        results[string] = values
+        if len(results) > LookUpCache.max_results:
+            results.popitem(last=False)
+        return values
 
-        data = init_decision_table(path)
-        LookUpCache.cache[key] = data
-        return data
+    @staticmethod
+    def fuzzy_index(path, threshold):
+        """
+        Returns the FuzzyIndex of the table stored in the given path,
+        indexing the value (unless it is a regular expression) and the
+        result of each entry.
+        """
+        cached = LookUpCache.get(path)
+        index = cached.fuzzy.get(threshold)
+        if index is None:
+            entries = []
+            for value, (check_type, result) in cached.table.items():
+                if check_type not in REGEX_TYPES:
+                    entries.append((value, result))
+                entries.append((result, result))
+            index = FuzzyIndex(entries, threshold)
+            cached.fuzzy[threshold] = index
+        return index
+
+    @staticmethod
+    def invalidate(path=None):
+        """
+        Drop the table stored in the given path, or all the tables.
+        """
+        LookUpCache.checked.clear()
+        if path is None:
+            LookUpCache.tables.clear()
+            LookUpCache.combined.clear()
+        else:
+            path = os.path.abspath(path)
+            LookUpCache.tables.pop(path, None)
+            for key in [key for key in LookUpCache.combined if path in key]:
+                del LookUpCache.combined[key]
+
+    @staticmethod
+    def stats():
+
+        return (
+            f"lookup tables: {len(LookUpCache.tables)} "
+            f"(loads: {LookUpCache.loads}, evictions: {LookUpCache.evictions}), "
+            f"lookup hits: {LookUpCache.hits}, misses: {LookUpCache.misses}"
+        )
 
 
 class Rule:
@@ -103,29 +299,150 @@ class Set_Accounts(Rule):
                 break
 
         if match:
-            newPosting = [
-                Posting(
-                    account=ruleDef.get("from"),
-                    units=None,
-                    cost=None,
-                    price=None,
-                    flag=None,
-                    meta=None,
-                ),
-                Posting(
-                    account=ruleDef.get("to"),
-                    units=None,
-                    cost=None,
-                    price=None,
-                    flag=None,
-                    meta=None,
-                ),
-            ]
-
-            return (True, tx._replace(postings=newPosting))
+            return (True, Set_Accounts.assign(tx, ruleDef))
 
         return (False, tx)
 
+    @staticmethod
+    def assign(tx, ruleDef):
+
+        newPosting = [
+            Posting(
+                account=ruleDef.get("from"),
+                units=None,
+                cost=None,
+                price=None,
+                flag=None,
+                meta=None,
+            ),
+            Posting(
+                account=ruleDef.get("to"),
+                units=None,
+                cost=None,
+                price=None,
+                flag=None,
+                meta=None,
+            ),
+        ]
+        return tx._replace(postings=newPosting)
+
+
+@dataclass
+class IndexedField:
+    # position of the first rule on the csv index
+    first: int
+    # value -> position of the first rule with the value
+    exact: dict = field(default_factory=dict)
+    # (position, value) of the values with wildcards
+    patterns: list = field(default_factory=list)
+    regex: re.Pattern = None
+    # regex group -> position of the rule
+    groups: dict = field(default_factory=dict)
+
+
+class SetAccountsIndex:
+    """
+    Finds the first `Set_Accounts` rule of a ruleset matching a csv row,
+    with a single lookup per csv index instead of evaluating the rules
+    one after the other.
+
+    For each csv index, the values without wildcards are stored in a map
+    and the other values are combined into a single regular expression,
+    in the order of the rules.
+    """
+
+    WILDCARDS = re.compile(r"[*?\[]")
+    # named groups generated by `fnmatch.translate`
+    GROUPS = re.compile(r"\(\?P([<=])(\w+)")
+
+    def __init__(self, rules):
+        # keys of the Set_Accounts rules, in declaration order
+        self.keys = []
+        # csv index -> IndexedField
+        self.fields = dict()
+
+        for key, ruleDef in rules.items():
+            if ruleDef.rule is not Set_Accounts:
+                continue
+            position = len(self.keys)
+            self.keys.append(key)
+            indexed = self.fields.setdefault(
+                ruleDef.get("csv_index"), IndexedField(position)
+            )
+            for val in ruleDef.get("csv_values").split(";"):
+                val = val.lower().strip()
+                if self.WILDCARDS.search(val):
+                    indexed.patterns.append((position, val))
+                else:
+                    indexed.exact.setdefault(val, position)
+
+        for indexed in self.fields.values():
+            self.combine(indexed)
+        self.positions = {key: position for position, key in enumerate(self.keys)}
+
+    @staticmethod
+    def build(rules):
+        """
+        Returns the index of the Set_Accounts rules, or None if there are
+        none or if a rule is invalid (the rules are then evaluated one
+        after the other, reporting the error).
+        """
+        try:
+            index = SetAccountsIndex(rules)
+        except (KeyError, TypeError, AttributeError, re.error):
+            return None
+        return index if index.keys else None
+
+    def combine(self, indexed):
+
+        alternatives = []
+        for position, val in indexed.patterns:
+            group = f"r{len(indexed.groups)}"
+            indexed.groups[group] = position
+            # the group names must be unique in the combined regex
+            translated = self.GROUPS.sub(
+                lambda m: f"(?P{m.group(1)}{group}_{m.group(2)}",
+                fnmatch.translate(val),
+            )
+            alternatives.append(f"(?P<{group}>{translated})")
+        if alternatives:
+            indexed.regex = re.compile("|".join(alternatives))
+
+    def __contains__(self, key):
+
+        return key in self.positions
+
+    def first_match(self, csv_line):
+        """
+        Returns the key of the first Set_Accounts rule matching the row
+        and the error raised evaluating it (if the row has no value at
+        the csv index of the rule), or (None, None).
+        """
+        first = None
+        error = None
+        for csv_index, indexed in self.fields.items():
+            try:
+                csv_field_val = csv_line[csv_index].lower().strip()
+            except IndexError as e:
+                # the first rule on the csv index fails
+                if first is None or indexed.first < first:
+                    first, error = indexed.first, e
+                continue
+
+            position = indexed.exact.get(csv_field_val)
+            if indexed.regex is not None:
+                m = indexed.regex.match(csv_field_val)
+                if m is not None:
+                    matched = indexed.groups[m.lastgroup]
+                    if position is None or matched < position:
+                        position = matched
+            if position is not None and (first is None or position < first):
+                first, error = position, None
+
+        if first is None:
+            return None, None
+        return self.keys[first], error
+
 
 class Replace_Payee(Rule):
     """
@@ -138,27 +455,74 @@ class Replace_Payee(Rule):
     def __init__(self, name, context):
         Rule.__init__(self, name, context)
 
-    def execute(self, csv_line, tx, ruleDef=None):
-        table = os.path.join(self.context.rules_dir, "payee.rules")
-        if not os.path.isfile(table):
+    # the rules file, and the attribute of the context with the csv
+    # index looked up in it
+    file = "payee.rules"
+    column = "payee_pos"
+
+    def table(self):
+        table = os.path.join(self.context.rules_dir, self.file)
+        if not LookUpCache.exists(table):
             print(
                 "file: %s does not exist! - The 'Replace_Payee' rules \
                     requires the payee.rules file."
                 % (table)
             )
             sys.exit(-1)
+        return table
 
-        return (
-            False,
-            tx._replace(
-                payee=resolve_from_decision_table(
-                    LookUpCache.init_decision_table("payee", table),
-                    csv_line[self.context.payee_pos],
-                    csv_line[self.context.payee_pos],
-                )
+    def execute(self, csv_line, tx, ruleDef=None):
+
+        return self.apply(
+            csv_line,
+            tx,
+            LookUpCache.resolve(
+                self.table(), csv_line[self.context.payee_pos], NO_MATCH
             ),
+            ruleDef,
         )
 
+    def apply(self, csv_line, tx, payee, ruleDef=None):
+        """
+        Apply the value resolved from the table (NO_MATCH, if none).
+        """
+        if payee is NO_MATCH:
+            payee = csv_line[self.context.payee_pos]
+        return (False, tx._replace(payee=payee))
+
+
+class Replace_Payee_Fuzzy(Replace_Payee):
+    """
+    Replaces the name of the transaction counterparty, like
+    `Replace_Payee`, using the "payee.rules" file.
+    If no entry of the file matches, the counterparty is replaced with
+    the result of the entry most similar to it (comparing it to the
+    value and to the result of each entry), if the similarity (between 0
+    and 1) is at least the rule threshold.
+
+    Rule attributes:
+        threshold: minimum similarity (default: 0.8)
+
+    Example:
+        -  name: Replace_Payee_Fuzzy
+           threshold: 0.7
+    """
+
+    DEFAULT_THRESHOLD = 0.8
+
+    def apply(self, csv_line, tx, payee, ruleDef=None):
+
+        if payee is NO_MATCH:
+            attributes = (ruleDef.attributes if ruleDef is not None else None) or {}
+            threshold = float(attributes.get("threshold", self.DEFAULT_THRESHOLD))
+            payee = LookUpCache.fuzzy_index(self.table(), threshold).best(
+                csv_line[self.context.payee_pos]
+            )
+            if payee is None:
+                payee = NO_MATCH
+
+        return super().apply(csv_line, tx, payee, ruleDef)
+
 
 class Replace_Asset(Rule):
     """
@@ -183,7 +547,7 @@ class Replace_Asset(Rule):
         if self.context.force_account:
             asset = self.context.force_account
         else:
-            if not os.path.isfile(table):
+            if not LookUpCache.exists(table):
                 print(
                     "file: %s does not exist! - \
                         The 'Replace_Asset' rules requires the asset.rules \
@@ -192,8 +556,8 @@ class Replace_Asset(Rule):
                 )
                 sys.exit(-1)
 
-            asset = resolve_from_decision_table(
-                LookUpCache.init_decision_table("asset", table),
+            asset = LookUpCache.resolve(
+                table,
                 (
                     self.context.account
                     if self.context.account is not None
@@ -222,22 +586,40 @@ class Replace_Expense(Rule):
     def __init__(self, name, context):
         Rule.__init__(self, name, context)
 
-    def execute(self, csv_line, tx=None, ruleDef=None):
-        table = os.path.join(self.context.rules_dir, "account.rules")
+    # the rules file, and the attribute of the context with the csv
+    # index looked up in it
+    file = "account.rules"
+    column = "payee_pos"
 
-        if not os.path.isfile(table):
+    def table(self):
+        table = os.path.join(self.context.rules_dir, self.file)
+
+        if not LookUpCache.exists(table):
             print(
                 "file: % s does not exist! - The 'Replace_Expense' rules \
                   requires the account.rules file."
                 % (table)
             )
             sys.exit(-1)
+        return table
 
-        expense = resolve_from_decision_table(
-            LookUpCache.init_decision_table("account", table),
-            csv_line[self.context.payee_pos],
-            self.context.default_expense,
+    def execute(self, csv_line, tx=None, ruleDef=None):
+
+        return self.apply(
+            csv_line,
+            tx,
+            LookUpCache.resolve(
+                self.table(), csv_line[self.context.payee_pos], NO_MATCH
+            ),
+            ruleDef,
         )
+
+    def apply(self, csv_line, tx, expense, ruleDef=None):
+        """
+        Apply the value resolved from the table (NO_MATCH, if none).
+        """
+        if expense is NO_MATCH:
+            expense = self.context.default_expense
         if expense:
             posting = Posting(expense, None, None, None, None, None)
             new_postings = [tx.postings[0]] + [posting]
@@ -337,3 +719,170 @@ class Ignore_By_ContainsStringAtPos(Rule):
             strToIgnore = ignorable.split(";")[0]
             if strToIgnore.lower() in csv_line[pos].lower():
                 return (True, None)
+
+        return (False, tx)
+
+
+class IgnorePrefilter:
+    """
+    Evaluates the ignore rules (`Ignore_By_Payee`, `Ignore_By_StringAtPos`
+    and `Ignore_By_ContainsStringAtPos`) of a ruleset at once, on the csv
+    row, before any transaction is built.
+
+    The values of the rules are lowercased in advance: the values to
+    compare with each csv index are stored in a set, and the values to
+    search in each csv index are combined into a single regular
+    expression.
+
+    Only the ignore rules which can not be preceded by a rule ending the
+    ruleset are merged: the prefilter stops at the first rule which is
+    neither an ignore rule nor a `Replace_*` rule.
+    """
+
+    # rules which never end the ruleset
+    TRANSPARENT = (Replace_Payee, Replace_Asset, Replace_Expense)
+
+    def __init__(self, rules, context):
+        # keys of the merged rules
+        self.keys = set()
+        # csv index -> values
+        exact = dict()
+        contains = dict()
+
+        for key, ruleDef in rules.items():
+            if ruleDef.rule in self.TRANSPARENT:
+                continue
+            if ruleDef.rule is Ignore_By_Payee and isinstance(context.payee_pos, int):
+                contains.setdefault(context.payee_pos, []).extend(
+                    value.lower() for value in ruleDef.get("ignore_payee")
+                )
+            elif ruleDef.rule is Ignore_By_StringAtPos:
+                for ignorable in ruleDef.get("ignore_string_at_pos"):
+                    value, pos = ignorable.split(";")[:2]
+                    exact.setdefault(int(pos), set()).add(value.lower().strip())
+            elif ruleDef.rule is Ignore_By_ContainsStringAtPos:
+                for ignorable in ruleDef.get("ignore_string_contains_at_pos"):
+                    value, pos = ignorable.split(";")[:2]
+                    contains.setdefault(int(pos), []).append(value.lower())
+            else:
+                break
+            self.keys.add(key)
+
+        # rules without values ignore nothing
+        self.exact = {pos: values for pos, values in exact.items() if values}
+        self.contains = {
+            pos: re.compile("|".join(re.escape(value) for value in values))
+            for pos, values in contains.items()
+            if values
+        }
+        # minimum length of the rows which can be checked
+        self.length = max(
+            (
+                pos + 1 if pos >= 0 else -pos
+                for pos in list(self.exact) + list(self.contains)
+            ),
+            default=0,
+        )
+
+    @staticmethod
+    def build(rules, context):
+        """
+        Returns the prefilter of the ignore rules, or None if there are
+        none or if a rule is invalid (the rules are then evaluated one
+        after the other, reporting the error).
+        """
+        try:
+            prefilter = IgnorePrefilter(rules, context)
+        except (KeyError, TypeError, AttributeError, ValueError):
+            return None
+        return prefilter if prefilter.keys else None
+
+    def ignored(self, csv_line):
+        """
+        Returns True if an ignore rule matches the row, False if none
+        does, or None if the row is too short to be checked (the rules
+        then report the missing index).
+        """
+        if len(csv_line) < self.length:
+            return None
+
+        for pos, values in self.exact.items():
+            if csv_line[pos].lower().strip() in values:
+                return True
+        for pos, regex in self.contains.items():
+            if regex.search(csv_line[pos].lower()):
+                return True
+        return False
+
+
+class SharedLookup:
+    """
+    Resolves the tables of the `Replace_Payee` and `Replace_Expense`
+    rules (and of the rules extending them) which look up the same csv
+    index with a single lookup: the first of these rules executed for a
+    row looks up the csv value in all their tables at once (see
+    `LookUpCache.resolve_many`), the others reuse the resolved values.
+
+    Each rule still applies its own value, in the order of the ruleset.
+    The rules whose table is missing are executed one by one, reporting
+    the missing file.
+    """
+
+    # rules resolving the table `file` from the csv index `column`
+    SHARED = (Replace_Payee, Replace_Expense)
+
+    def __init__(self, rules, context):
+        # key of the rule -> (csv index, position of its table)
+        self.keys = dict()
+        # csv index -> paths of the tables
+        self.tables = dict()
+
+        for key, ruleDef in rules.items():
+            rule = ruleDef.rule
+            if not (isinstance(rule, type) and issubclass(rule, self.SHARED)):
+                continue
+            pos = getattr(context, rule.column)
+            path = os.path.join(context.rules_dir, rule.file)
+            if not isinstance(pos, int) or not LookUpCache.exists(path):
+                continue
+            paths = self.tables.setdefault(pos, [])
+            if path not in paths:
+                paths.append(path)
+            self.keys[key] = (pos, paths.index(path))
+
+        # only the csv indexes looked up in several tables are shared
+        self.tables = {
+            pos: paths for pos, paths in self.tables.items() if len(paths) > 1
+        }
+        self.keys = {
+            key: value for key, value in self.keys.items() if value[0] in self.tables
+        }
+
+    @staticmethod
+    def build(rules, context):
+        """
+        Returns the SharedLookup of the rules, or None if no csv index
+        is looked up in several tables.
+        """
+        if context.rules_dir is None:
+            return None
+        lookup = SharedLookup(rules, context)
+        return lookup if lookup.keys else None
+
+    def __contains__(self, key):
+
+        return key in self.keys
+
+    def value(self, key, csv_line, resolved):
+        """
+        Returns the value resolved from the table of a rule (NO_MATCH if
+        no entry matches), looking up the csv index of the rule in all
+        its tables unless already in `resolved` (csv index -> values,
+        for the current row).
+        """
+        pos, table = self.keys[key]
+        values = resolved.get(pos)
+        if values is None:
+            values = LookUpCache.resolve_many(self.tables[pos], csv_line[pos])
+            resolved[pos] = values
+        return values[table]
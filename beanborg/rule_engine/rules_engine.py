@@ -72,6 +72,8 @@ class RuleEngine:
 
         self._ctx = ctx
         self.rules = {}
+        # the rules files are checked once per rule engine
+        LookUpCache.refresh()
 
         custom_rules = self.load_custom_rules()
 
@@ -102,6 +104,14 @@ class RuleEngine:
         if ctx.rules_dir and not self.is_rule_in_list("Replace_Asset"):
             self.rules["Replace_Asset"] = RuleDef(globals()["Replace_Asset"], None)
 
+        # the Set_Accounts rules are matched all at once
+        self.set_accounts = SetAccountsIndex.build(self.rules)
+        # and so are the ignore rules, before building the transaction
+        self.ignore_prefilter = IgnorePrefilter.build(self.rules, self._ctx)
+        # the tables of the rules looking up the same csv index are
+        # resolved together
+        self.shared_lookup = SharedLookup.build(self.rules, self._ctx)
+
     def is_rule_in_list(self, name):
         for rule_name in self.rules:
             if rule_name.startswith(name):
@@ -131,13 +141,39 @@ class RuleEngine:
 
     def execute(self, csv_line):
 
+        skipped = ()
+        if self.ignore_prefilter is not None:
+            ignored = self.ignore_prefilter.ignored(csv_line)
+            if ignored:
+                return None
+            if ignored is not None:
+                # the merged ignore rules do not match the row
+                skipped = self.ignore_prefilter.keys
+
         final, tx = Rule_Init("init", self._ctx).execute(csv_line)
+        # key of the first Set_Accounts rule matching the row
+        set_accounts = None
+        # csv index -> values resolved by the shared lookup
+        resolved = dict()
 
         for key in self.rules:
-            if not final:
+            if not final and key not in skipped:
                 if self._ctx.debug:
                     print("Executing rule: " + str(self.rules[key].rule))
+                if self.set_accounts is not None and key in self.set_accounts:
+                    if set_accounts is None:
+                        set_accounts = self.set_accounts.first_match(csv_line)
+                    match, error = set_accounts
+                    if key == match:
+                        if error is not None:
+                            raise error
+                        final, tx = True, Set_Accounts.assign(tx, self.rules[key])
+                    continue
                 rulez = self.rules[key].rule(key, self._ctx)
+                if self.shared_lookup is not None and key in self.shared_lookup:
+                    value = self.shared_lookup.value(key, csv_line, resolved)
+                    final, tx = rulez.apply(csv_line, tx, value, self.rules[key])
+                    continue
                 final, tx = rulez.execute(csv_line, tx, self.rules[key])
 
         return tx
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+import os
+
+
+def file_signature(*paths):
+    """
+    Returns a tuple identifying the current state of the given files
+    (or of the files contained in the given folders): any change to the
+    size or the modification time of a file changes the signature.
+    """
+    signature = []
+    for path in paths:
+        if path is None:
+            continue
+        if os.path.isdir(path):
+            files = sorted(os.path.join(path, f) for f in os.listdir(path))
+        else:
+            files = [path]
+        for f in files:
+            if os.path.isfile(f):
+                stat = os.stat(f)
+                signature.append((os.path.abspath(f), stat.st_mtime_ns, stat.st_size))
+            else:
+                signature.append((os.path.abspath(f), None, None))
+    return tuple(signature)
+
+
+class WarmCache:
+    """
+    Keeps expensive objects (configurations, rule engines, fitted models)
+    in memory across import jobs.
+    Each object is stored with the signature of the files it was built
+    from, and it is rebuilt as soon as the signature changes.
+    """
+
+    def __init__(self):
+        self.entries = dict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, signature, factory):
+        cached = self.entries.get(key)
+        if cached is not None and cached[0] == signature:
+            self.hits += 1
+            return cached[1]
+
+        self.misses += 1
+        value = factory()
+        self.entries[key] = (signature, value)
+        return value
+
+    def invalidate(self, key=None):
+        if key is None:
+            self.entries.clear()
+        else:
+            self.entries.pop(key, None)
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import socket
+import sys
+
+from rich import print as rprint
+
+
+def default_socket_path():
+    """
+    The Unix socket used by `bb_server`: $BEANBORG_SOCKET, or a socket in
+    the user's runtime directory.
+    """
+    if os.environ.get("BEANBORG_SOCKET"):
+        return os.environ["BEANBORG_SOCKET"]
+
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR", os.path.expanduser("~"))
+    return os.path.join(runtime_dir, ".beanborg.sock")
+
+
+def send_message(stream, message):
+    """messages are exchanged as single lines of JSON"""
+    stream.write((json.dumps(message) + "\n").encode("utf-8"))
+    stream.flush()
+
+
+def read_message(stream):
+    line = stream.readline()
+    if not line:
+        return None
+    return json.loads(line.decode("utf-8"))
+
+
+def is_listening(socket_path):
+    """
+    Returns True if a server accepts connections on the given socket.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(socket_path)
+        except OSError:
+            return False
+    return True
+
+
+def submit_job(config_file, debug=False, socket_path=None):
+    """
+    Submit an import job to a running `bb_server` and return its response:
+    a dict with the `status` of the job, the console `output` and the
+    import `stats`.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(socket_path or default_socket_path())
+        with client.makefile("rwb") as stream:
+            send_message(
+                stream,
+                {
+                    "config": os.path.abspath(config_file),
+                    "cwd": os.getcwd(),
+                    "debug": debug,
+                },
+            )
+            return read_message(stream)
+
+
+def import_remote(options):
+    """
+    Submit the import described by the command line `options` to a
+    running `bb_server` and print its output.
+    """
+    if options.fix_only:
+        rprint("[red]--fix-only can not be used with --remote[/red]")
+        sys.exit(-1)
+
+    try:
+        response = submit_job(options.file, options.debug, options.socket)
+    except OSError as e:
+        rprint(f"[red]Unable to connect to bb_server: {e}[/red]")
+        sys.exit(-1)
+
+    print(response["output"], end="")
+    if response["status"] != "ok":
+        sys.exit(-1)
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+import csv
+import fnmatch
+import io
+import locale
+import os
+import re
+import sqlite3
+
+from beanborg.utils.archive_store import ArchiveStore
+from beanborg.utils.hash_utils import hash
+
+CATALOG_FILE = "catalog.sqlite"
+
+
+def rows_with_offsets(content, config):
+    """
+    Parse the content (bytes) of a CSV file, yielding each row along with
+    the byte offset of the line on which the row starts.
+    The header lines (`csv.skip`) are not returned.
+    """
+    encoding = locale.getpreferredencoding(False)
+    tracker = {"start": None}
+
+    def lines():
+        position = 0
+        for line in io.BytesIO(content):
+            if tracker["start"] is None:
+                tracker["start"] = position
+            position += len(line)
+            # same newline translation of `open(file)`, used by the importer
+            yield line.decode(encoding).replace("\r\n", "\n")
+
+    csv_reader = csv.reader(lines(), delimiter=config.csv.separator)
+    for index, row in enumerate(csv_reader):
+        start, tracker["start"] = tracker["start"], None
+        if index >= config.csv.skip:
+            yield start, row
+
+
+class ArchiveCatalog:
+    """
+    Index of the archived CSV files, stored in the archive folder.
+
+    For each archived file, the catalog records the period and the number
+    of rows of the file; for each row, the md5 hash (the same stored in
+    the ledger metadata) and the offset of the row in the file.
+    """
+
+    def __init__(self, archive_folder):
+        self.archive_folder = archive_folder
+        self.path = os.path.join(archive_folder, CATALOG_FILE)
+        self.store = ArchiveStore(archive_folder)
+        self.db = sqlite3.connect(self.path)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                name TEXT PRIMARY KEY,
+                ref TEXT,
+                start_date TEXT,
+                end_date TEXT,
+                row_count INTEGER,
+                mtime INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS rows (
+                md5 TEXT,
+                name TEXT,
+                offset INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS rows_md5 ON rows (md5);
+            CREATE INDEX IF NOT EXISTS rows_name ON rows (name);
+            """)
+
+    def close(self):
+        self.db.close()
+
+    def add(self, archived_csv, config, dates, content=None):
+        """
+        Add (or replace) an archived file in the catalog.
+        """
+        name = os.path.basename(archived_csv)
+        if content is None:
+            content = self.store.read(name)
+
+        rows = [
+            (hash(row), name, offset)
+            for offset, row in rows_with_offsets(content, config)
+        ]
+        with self.db:
+            self.db.execute("DELETE FROM rows WHERE name = ?", (name,))
+            self.db.executemany("INSERT INTO rows VALUES (?, ?, ?)", rows)
+            self.db.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    name,
+                    config.csv.ref,
+                    str(dates[0]),
+                    str(dates[1]),
+                    len(rows),
+                    os.stat(archived_csv).st_mtime_ns,
+                ),
+            )
+
+    def sync(self, config):
+        """
+        Catalog the archived files of the bank that are missing from the
+        catalog (e.g. archived before the catalog existed) and drop the
+        entries of the files that no longer exist.
+        """
+        pattern = re.compile(
+            re.escape(config.csv.ref)
+            + r"_(\d{4}-\d{2}-\d{2})_(\d{4}-\d{2}-\d{2})\.csv(\.gz|\.xz)?$"
+        )
+        known = {
+            name: mtime
+            for name, mtime in self.db.execute(
+                "SELECT name, mtime FROM files WHERE ref = ?", (config.csv.ref,)
+            )
+        }
+        present = set()
+        for name in fnmatch.filter(os.listdir(self.archive_folder), "*.csv*"):
+            match = pattern.match(name)
+            if not match:
+                continue
+            present.add(name)
+            archived_csv = os.path.join(self.archive_folder, name)
+            if known.get(name) != os.stat(archived_csv).st_mtime_ns:
+                self.add(archived_csv, config, match.groups()[:2])
+
+        for name in set(known) - present:
+            self.remove(name)
+
+    def remove(self, name):
+
+        with self.db:
+            self.db.execute("DELETE FROM rows WHERE name = ?", (name,))
+            self.db.execute("DELETE FROM files WHERE name = ?", (name,))
+
+    def files_of(self, ref):
+        """
+        Returns the (file, start, end) tuples of the archived files of a
+        bank, oldest first.
+        """
+        return list(
+            self.db.execute(
+                "SELECT name, start_date, end_date FROM files "
+                "WHERE ref = ? ORDER BY start_date, name",
+                (ref,),
+            )
+        )
+
+    def duplicates(self, content, config):
+        """
+        Returns a function mapping the offset of a row of `content` to the
+        (file, offset) of the archived rows with the same hash.
+        """
+        hashes = {
+            offset: hash(row) for offset, row in rows_with_offsets(content, config)
+        }
+
+        def candidates(offset):
+            if offset not in hashes:
+                return []
+            return self.db.execute(
+                "SELECT name, offset FROM rows WHERE md5 = ? ORDER BY name",
+                (hashes[offset],),
+            ).fetchall()
+
+        return candidates
+
+    def lookup_md5(self, md5):
+        """
+        Returns the (file, offset, line) tuples of the archived rows with
+        the given hash.
+        """
+        found = []
+        for name, offset in self.db.execute(
+            "SELECT name, offset FROM rows WHERE md5 = ? ORDER BY name", (md5,)
+        ):
+            found.append((name, offset, self.read_line(name, offset)))
+        return found
+
+    def lookup_dates(self, start, end):
+        """
+        Returns the (file, start, end, row count) tuples of the archived
+        files overlapping the given period.
+        """
+        return list(
+            self.db.execute(
+                "SELECT name, start_date, end_date, row_count FROM files "
+                "WHERE start_date <= ? AND end_date >= ? ORDER BY start_date",
+                (str(end), str(start)),
+            )
+        )
+
+    def read_line(self, name, offset):
+
+        csv_file = io.BytesIO(self.store.read(name))
+        csv_file.seek(offset)
+        line = csv_file.readline()
+        return line.decode(locale.getpreferredencoding(False)).rstrip("\r\n")
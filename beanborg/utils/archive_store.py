@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+import gzip
+import io
+import lzma
+import os
+
+# file suffix of the archived CSV files, by compression
+SUFFIXES = {"none": "", "gzip": ".gz", "xz": ".xz"}
+
+# header of the deduplicated archives
+MAGIC = b"BBARCHIVE 1\n"
+
+
+def base_name(name):
+    """
+    Returns the name of an archived file without the compression suffix.
+    """
+    for suffix in SUFFIXES.values():
+        if suffix and name.endswith(suffix):
+            return name[: -len(suffix)]
+    return name
+
+
+def open_archive(path, mode="rb"):
+
+    if path.endswith(SUFFIXES["gzip"]):
+        return gzip.open(path, mode)
+    if path.endswith(SUFFIXES["xz"]):
+        return lzma.open(path, mode)
+    return open(path, mode)
+
+
+def split_lines(content):
+    """
+    Yields the (offset, line) pairs of the physical lines of a file,
+    line terminators included.
+    """
+    offset = 0
+    for line in io.BytesIO(content):
+        yield offset, line
+        offset += len(line)
+
+
+def encode(content, find_duplicate=None):
+    """
+    Encode the content of a CSV file as a sequence of records:
+
+        L<length>\\n<bytes>            literal bytes
+        R<file>\\t<offset>\\t<length>\\n  bytes stored in another archived file
+
+    `find_duplicate(offset, line)` returns the (file, offset) of an
+    identical line stored in another archived file, or None.
+    """
+    out = io.BytesIO()
+    out.write(MAGIC)
+    literal = bytearray()
+
+    def flush():
+        if literal:
+            out.write(b"L%d\n" % len(literal))
+            out.write(literal)
+            literal.clear()
+
+    for offset, line in split_lines(content):
+        duplicate = find_duplicate(offset, line) if find_duplicate else None
+        if duplicate is None:
+            literal.extend(line)
+            continue
+        flush()
+        name, source_offset = duplicate
+        out.write(b"R%s\t%d\t%d\n" % (name.encode("utf-8"), source_offset, len(line)))
+    flush()
+
+    return out.getvalue()
+
+
+def decode(data, resolve):
+    """
+    Rebuild the original content of a deduplicated archive.
+    `resolve(file, offset, length)` returns the bytes stored in another
+    archived file.
+    Returns the content and the offsets of the lines stored as references.
+    """
+    stream = io.BytesIO(data)
+    if stream.read(len(MAGIC)) != MAGIC:
+        raise ValueError("not a deduplicated archive")
+
+    content = bytearray()
+    references = set()
+    while True:
+        header = stream.readline()
+        if not header:
+            break
+        kind, value = header[:1], header[1:-1]
+        if kind == b"L":
+            content.extend(stream.read(int(value)))
+        elif kind == b"R":
+            name, offset, length = value.split(b"\t")
+            references.add(len(content))
+            content.extend(resolve(name.decode("utf-8"), int(offset), int(length)))
+        else:
+            raise ValueError("invalid archive record: %r" % header)
+
+    return bytes(content), references
+
+
+class ArchiveStore:
+    """
+    Reads and writes the archived CSV files of an archive folder.
+
+    Archived files are stored either as plain CSV files or compressed
+    (gzip, xz). Compressed files can also be deduplicated: lines already
+    stored in another archived file are replaced by a reference to that
+    file. References only point to lines stored as-is, so the original
+    file is always rebuilt byte for byte.
+    """
+
+    def __init__(self, archive_folder):
+        self.archive_folder = archive_folder
+        # name -> (content, offsets of the lines stored as references)
+        self.files = dict()
+        self.loading = set()
+
+    def path(self, name):
+        """
+        Returns the path of an archived file, looking for the compressed
+        variants of the file if the file does not exist.
+        """
+        path = os.path.join(self.archive_folder, name)
+        if os.path.isfile(path):
+            return path
+        for suffix in SUFFIXES.values():
+            candidate = os.path.join(self.archive_folder, base_name(name) + suffix)
+            if os.path.isfile(candidate):
+                return candidate
+        raise FileNotFoundError(path)
+
+    def load(self, name):
+
+        name = base_name(name)
+        if name in self.files:
+            return self.files[name]
+        if name in self.loading:
+            raise ValueError("circular reference in archive: " + name)
+
+        self.loading.add(name)
+        try:
+            with open_archive(self.path(name)) as archived:
+                data = archived.read()
+            if data.startswith(MAGIC):
+                loaded = decode(data, self.resolve)
+            else:
+                loaded = (data, set())
+        finally:
+            self.loading.discard(name)
+
+        self.files[name] = loaded
+        return loaded
+
+    def deduplicated(self, name):
+        """
+        Returns True if the archived file is stored as a deduplicated
+        archive.
+        """
+        with open_archive(self.path(name)) as archived:
+            return archived.read(len(MAGIC)) == MAGIC
+
+    def read(self, name):
+        """
+        Returns the original content (bytes) of an archived file.
+        """
+        return self.load(name)[0]
+
+    def resolve(self, name, offset, length):
+
+        content = self.read(name)
+        if offset + length > len(content):
+            raise ValueError(f"invalid reference to {name} at offset {offset}")
+        return content[offset : offset + length]
+
+    def find(self, candidates, line):
+        """
+        Returns the first (file, offset) of the candidates where `line` is
+        stored as-is, or None.
+        """
+        for name, offset in candidates:
+            try:
+                content, references = self.load(name)
+            except (OSError, ValueError):
+                continue
+            if (
+                offset not in references
+                and content[offset : offset + len(line)] == line
+            ):
+                return base_name(name), offset
+        return None
+
+    def write(self, path, content, compression="none", find_duplicates=None):
+        """
+        Store the content of a CSV file.
+        When `find_duplicates(offset)` is provided (compressed archives
+        only), it returns the (file, offset) candidates for the line
+        starting at `offset`, and identical lines are stored as
+        references.
+        """
+        if compression not in SUFFIXES:
+            raise ValueError("unknown archive compression: " + compression)
+
+        data = content
+        if compression != "none" and find_duplicates is not None:
+            name = base_name(os.path.basename(path))
+            data = encode(
+                content,
+                lambda offset, line: self.find(
+                    [c for c in find_duplicates(offset) if base_name(c[0]) != name],
+                    line,
+                ),
+            )
+            # never trade the original bytes for a smaller file
+            if decode(data, self.resolve)[0] != content:
+                data = content
+
+        with open_archive(path, "wb") as archived:
+            archived.write(data)
+        self.files.pop(base_name(os.path.basename(path)), None)
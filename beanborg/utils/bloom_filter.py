@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import math
+import mmap
+import os
+import struct
+
+from beancount.core.data import Transaction
+
+from beanborg.utils.ledger_scanner import LedgerManifest, ParseCache
+
+MAGIC = b"BBBLOOM1"
+# magic, number of bits, number of hash functions, number of hashes,
+# signature of the ledger files the filter was built from
+HEADER = struct.Struct("<8sQIQ32s")
+BITS_OFFSET = 64
+
+MIN_CAPACITY = 10000
+
+
+class BloomFilter:
+    """
+    Memory-mapped Bloom filter of md5 hashes.
+
+    The positions of a hash are derived from the hash itself (double
+    hashing on the two halves of the md5), so no other hash function
+    is computed.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, "r+b")
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        magic, self.bits, self.functions, self.count, self.signature = (
+            HEADER.unpack_from(self.map)
+        )
+        if magic != MAGIC or len(self.map) < BITS_OFFSET + (self.bits + 7) // 8:
+            self.close()
+            raise ValueError("invalid bloom filter: " + path)
+
+    @staticmethod
+    def create(path, capacity, error_rate=0.01):
+        """
+        Create an empty filter, sized for `capacity` hashes.
+        """
+        bits = int(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        functions = max(1, round(bits / capacity * math.log(2)))
+        with open(path, "wb") as bloom_file:
+            bloom_file.write(HEADER.pack(MAGIC, bits, functions, 0, b"0" * 32))
+            bloom_file.truncate(BITS_OFFSET + (bits + 7) // 8)
+        return BloomFilter(path)
+
+    def capacity(self):
+
+        return int(self.bits * (math.log(2) ** 2) / -math.log(0.01))
+
+    def positions(self, md5):
+
+        try:
+            value = int(md5, 16)
+        except ValueError:
+            # not an md5 (e.g. metadata added by hand)
+            value = int(hashlib.md5(md5.encode()).hexdigest(), 16)
+        first, second = value >> 64, value & 0xFFFFFFFFFFFFFFFF | 1
+        for i in range(self.functions):
+            yield (first + i * second) % self.bits
+
+    def add(self, md5):
+
+        for position in self.positions(md5):
+            self.map[BITS_OFFSET + position // 8] |= 1 << (position % 8)
+        self.count += 1
+
+    def __contains__(self, md5):
+
+        return all(
+            self.map[BITS_OFFSET + position // 8] & (1 << (position % 8))
+            for position in self.positions(md5)
+        )
+
+    def flush(self):
+
+        HEADER.pack_into(
+            self.map, 0, MAGIC, self.bits, self.functions, self.count, self.signature
+        )
+        self.map.flush()
+
+    def close(self):
+
+        self.map.close()
+        self.file.close()
+
+
+def files_signature(files):
+    """
+    Returns a digest of the path, size and modification time of the files.
+    """
+    digest = hashlib.md5()
+    for filename in sorted(files):
+        stat = os.stat(filename) if os.path.isfile(filename) else None
+        digest.update(
+            f"{filename}:{stat and stat.st_size}:{stat and stat.st_mtime_ns}\n".encode()
+        )
+    return digest.hexdigest().encode()
+
+
+class LedgerHashFilter:
+    """
+    Bloom filter of the md5 metadata of all the transactions of a ledger,
+    stored next to the main journal file.
+
+    A negative answer means that the hash is not in the ledger, so the
+    ledger has to be searched only for the (few) positive answers.
+    The filter is rebuilt when a ledger file is modified by something
+    else than the importer, which updates it after writing to the ledger.
+    """
+
+    def __init__(self, journal):
+        self.journal = os.path.normpath(os.path.abspath(journal))
+        self.path = os.path.join(
+            os.path.dirname(self.journal),
+            "." + os.path.basename(self.journal) + ".bloom",
+        )
+        manifest = LedgerManifest(self.journal)
+        self.files = [filename for filename, _ in manifest.walk()]
+        manifest.save()
+
+        self.bloom = None
+        if os.path.isfile(self.path):
+            try:
+                self.bloom = BloomFilter(self.path)
+            except (OSError, ValueError):
+                self.bloom = None
+        if self.bloom is None or self.bloom.signature != files_signature(self.files):
+            self.rebuild()
+
+    def rebuild(self):
+
+        if self.bloom is not None:
+            self.bloom.close()
+        hashes = set()
+        for filename in self.files:
+            for entry in ParseCache.parse(filename)[0]:
+                if isinstance(entry, Transaction) and "md5" in entry.meta:
+                    hashes.add(entry.meta["md5"])
+
+        self.bloom = BloomFilter.create(self.path, max(MIN_CAPACITY, 2 * len(hashes)))
+        for md5 in hashes:
+            self.bloom.add(md5)
+        self.bloom.signature = files_signature(self.files)
+        self.bloom.flush()
+
+    def __contains__(self, md5):
+
+        return md5 in self.bloom
+
+    def update(self, hashes, written_file):
+        """
+        Add the hashes of the transactions written to a ledger file.
+        """
+        for md5 in hashes:
+            self.bloom.add(md5)
+        written_file = os.path.normpath(os.path.abspath(written_file))
+        if written_file in self.files and self.bloom.count <= self.bloom.capacity():
+            self.bloom.signature = files_signature(self.files)
+        else:
+            # the file is not (yet) part of the ledger, or the filter is
+            # full: the filter is rebuilt on the next run
+            self.bloom.signature = b"0" * 32
+        self.bloom.flush()
+
+    def close(self):
+
+        self.bloom.close()
@@ -1,10 +1,11 @@
 import hashlib
 
-from beancount import loader
 from beancount.core.data import Transaction
 from rich import print as rprint
 from rich.prompt import Confirm
 
+from beanborg.utils.journal_utils import JournalUtils
+
 
 def hash_tuple(tuple):
 
@@ -19,16 +20,19 @@ def to_tuple(transaction):
     return (str(transaction.date), transaction.postings[0].units)
 
 
-def init_duplication_store(account, journal):
+def init_duplication_store(account, journal, validate=False, date_range=None):
     """
     Builds a map of existing transactions for the account being imported.
     Each map entry has an hash of the value as key and a tuple of
     transaction date and amount value.
     This map is used to report identical transactions being imported,
     should the standard hash based approach fail.
+    The journal is only parsed, unless `validate` is set.
+    If a (start, end) `date_range` is provided, only the transactions of
+    the ledger files overlapping the range are loaded.
     """
     transactions = {}
-    entries, _, _ = loader.load_file(journal)
+    entries = JournalUtils(validate).get_entries(journal, date_range)
     for entry in entries:
         if isinstance(entry, Transaction) and entry.meta["filename"].endswith(account):
             tup = to_tuple(entry)
@@ -37,11 +41,14 @@ def init_duplication_store(account, journal):
     return transactions
 
 
-def print_duplication_warning(tx):
+def print_duplication_warning(tx, ask=True):
 
     rprint(
         "[red]Warning[/red]: a transaction with identical date and"
         " amount already exists in the ledger. "
         f"\ndate: [bold]{tx[0]}[/bold]\namount [bold]{tx[1]}[/bold]"
     )
+    if not ask:
+        # without a user to confirm, the transaction is skipped
+        return False
     return Confirm.ask("Do you want to import it?")
@@ -3,29 +3,42 @@ from beancount import loader
 from beancount.core.data import Transaction
 from beancount.core.getters import get_accounts
 
+from beanborg.utils.ledger_scanner import scan_file
+
 
 class JournalUtils:
 
-    def get_entries(self, journal):
+    def __init__(self, validate=False):
+        # when True, the ledger is loaded through the full beancount pipeline
+        # (booking, plugins and validation), otherwise it is only parsed
+        self.validate = validate
+
+    def get_entries(self, journal, date_range=None):
         """
         Load in-memory all the entries of the provided ledger.
+        If a (start, end) `date_range` is provided, only the ledger files
+        with transactions in the range are parsed.
+        The range is ignored when the ledger is fully validated.
         """
-        entries, _, _ = loader.load_file(journal)
-        return entries
+        if self.validate:
+            entries, _, _ = loader.load_file(journal)
+            return entries
 
-    def transaction_hashes(self, journal):
+        return scan_file(journal, date_range)
+
+    def transaction_hashes(self, journal, date_range=None):
         """
         Load in-memory all the hashes (md5 property) of the provided ledger.
         This is required for the duplication detecting algo
         """
 
-        md5s = []
-        entries = self.get_entries(journal)
+        md5s = set()
+        entries = self.get_entries(journal, date_range)
         for entry in entries:
             if isinstance(entry, Transaction):
                 md5 = entry.meta.get("md5", "")
                 if md5:
-                    md5s.append(md5)
+                    md5s.add(md5)
         return md5s
 
     def get_accounts(self, journal):
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import tempfile
+
+from beanborg.utils.ledger_scanner import LedgerManifest
+
+# policies for the `csv` metadata of the imported transactions
+CSV_METADATA = ("full", "truncated", "hash")
+
+TRUNCATED = "..."
+
+# `csv` metadata line, as written by the beancount printer
+CSV_LINE = re.compile(r'^(\s+)csv: "((?:[^"\\]|\\.)*)"\s*$')
+
+
+def csv_metadata(row, policy, length):
+    """
+    Returns the value of the `csv` metadata for a CSV row, or None if
+    the metadata should not be stored at all (only the `md5` hash is kept,
+    which can be looked up in the archive catalog).
+    """
+    if policy == "hash":
+        return None
+    value = ",".join(row)
+    if policy == "truncated":
+        return truncate(value, length)
+    return value
+
+
+def truncate(value, length):
+    # values already truncated are left untouched
+    if len(value) > length + len(TRUNCATED):
+        return value[:length] + TRUNCATED
+    return value
+
+
+def unescape(value):
+
+    return re.sub(r"\\(.)", r"\1", value)
+
+
+def escape(value):
+
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def migrate_line(line, policy, length):
+    """
+    Apply the metadata policy to a ledger line.
+    Returns the new line, or None if the line must be removed.
+    """
+    match = CSV_LINE.match(line)
+    if not match or policy == "full":
+        return line
+    if policy == "hash":
+        return None
+    value = unescape(match.group(2))
+    if truncate(value, length) == value:
+        return line
+    return '%scsv: "%s"\n' % (match.group(1), escape(truncate(value, length)))
+
+
+def migrate_file(filename, policy, length):
+    """
+    Rewrite the `csv` metadata of a ledger file in a single streaming
+    pass. The file is replaced only if at least one line changed.
+    Returns the number of changed lines.
+    """
+    changed = 0
+    folder = os.path.dirname(os.path.abspath(filename))
+    with open(filename) as ledger, tempfile.NamedTemporaryFile(
+        "w", dir=folder, delete=False
+    ) as migrated:
+        for line in ledger:
+            new_line = migrate_line(line, policy, length)
+            if new_line != line:
+                changed += 1
+            if new_line is not None:
+                migrated.write(new_line)
+
+    if changed:
+        os.chmod(migrated.name, os.stat(filename).st_mode)
+        os.replace(migrated.name, filename)
+    else:
+        os.remove(migrated.name)
+    return changed
+
+
+def migrate_ledger(journal, policy, length):
+    """
+    Apply the metadata policy to all the files of a ledger.
+    Returns the (filename, changed lines) pairs of the rewritten files.
+    """
+    migrated = []
+    for filename, _ in LedgerManifest(journal).walk():
+        changed = migrate_file(filename, policy, length)
+        if changed:
+            migrated.append((filename, changed))
+    return migrated
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+import glob
+import json
+import os
+
+from beancount.core.data import Transaction
+from beancount.parser import parser
+
+MANIFEST_VERSION = 1
+
+
+class ParseCache:
+    """
+    In-process cache of parsed ledger files, keyed by path and validated
+    against the size and modification time of the file.
+    Disabled by default: it is meant for long-running processes that
+    look up the same ledger many times (see `bb_server`).
+    """
+
+    enabled = False
+    files = dict()
+
+    @staticmethod
+    def parse(filename):
+        if not ParseCache.enabled:
+            return parser.parse_file(filename)
+
+        stat = os.stat(filename)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = ParseCache.files.get(filename)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+        parsed = parser.parse_file(filename)
+        ParseCache.files[filename] = (signature, parsed)
+        return parsed
+
+
+def resolve_includes(filename, includes):
+    """
+    Expand the `include` directives of a ledger file into absolute paths,
+    using the same rules as the beancount loader (relative to the including
+    file, glob patterns allowed).
+    """
+    cwd = os.path.dirname(filename)
+    resolved = []
+    for include in includes:
+        pattern = include if os.path.isabs(include) else os.path.join(cwd, include)
+        for match in sorted(glob.glob(pattern, recursive=True)):
+            resolved.append(os.path.normpath(match))
+    return resolved
+
+
+def scan_file(journal, date_range=None):
+    """
+    Parse a ledger and all the files it includes, without running booking,
+    plugins or validation.
+
+    The returned entries are the raw directives produced by the beancount
+    parser: this is enough to access metadata (md5), dates, accounts and
+    the units of the postings that have an explicit amount.
+
+    If a (start, end) `date_range` is provided, only the files containing
+    transactions within the range are parsed (see `LedgerManifest`).
+    """
+    if date_range is not None:
+        manifest = LedgerManifest(journal)
+        entries = manifest.scan(*date_range)
+        manifest.save()
+        return entries
+
+    entries = []
+    seen = set()
+    stack = [os.path.normpath(os.path.abspath(journal))]
+    while stack:
+        filename = stack.pop(0)
+        if filename in seen or not os.path.isfile(filename):
+            continue
+        seen.add(filename)
+        file_entries, _, options_map = ParseCache.parse(filename)
+        entries.extend(file_entries)
+        stack.extend(resolve_includes(filename, options_map["include"]))
+
+    return entries
+
+
+class LedgerManifest:
+    """
+    Per-file index of a ledger, stored next to the main journal file.
+
+    For each file of the include tree, the manifest records the include
+    directives and the date range of the transactions it contains.
+    Entries are refreshed when the size or the modification time of a file
+    changes, so that ledgers split by year (or any other period) can be
+    searched by parsing only the files overlapping a given date range.
+    """
+
+    def __init__(self, journal):
+        self.journal = os.path.normpath(os.path.abspath(journal))
+        self.path = os.path.join(
+            os.path.dirname(self.journal),
+            "." + os.path.basename(self.journal) + ".manifest.json",
+        )
+        self.files = {}
+        self.dirty = False
+        # entries parsed while refreshing the manifest, reused by `scan`
+        self._parsed = {}
+        self._load()
+
+    def _load(self):
+        if not os.path.isfile(self.path):
+            return
+        try:
+            with open(self.path) as manifest_file:
+                data = json.load(manifest_file)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == MANIFEST_VERSION:
+            self.files = data.get("files", {})
+
+    def save(self):
+        if not self.dirty:
+            return
+        try:
+            with open(self.path, "w") as manifest_file:
+                json.dump(
+                    {"version": MANIFEST_VERSION, "files": self.files},
+                    manifest_file,
+                    indent=1,
+                )
+            self.dirty = False
+        except OSError:
+            # the manifest is only a cache: a read-only ledger folder
+            # simply means that it is rebuilt on every run
+            pass
+
+    def entry(self, filename):
+        """
+        Returns the manifest entry of a file, parsing the file only if it
+        changed since the manifest was written.
+        """
+        stat = os.stat(filename)
+        cached = self.files.get(filename)
+        if (
+            cached
+            and cached["mtime"] == stat.st_mtime_ns
+            and cached["size"] == stat.st_size
+        ):
+            return cached
+
+        entries, _, options_map = ParseCache.parse(filename)
+        dates = [str(e.date) for e in entries if isinstance(e, Transaction)]
+        cached = {
+            "mtime": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "min": min(dates) if dates else None,
+            "max": max(dates) if dates else None,
+            "includes": list(options_map["include"]),
+        }
+        self.files[filename] = cached
+        self._parsed[filename] = entries
+        self.dirty = True
+        return cached
+
+    def walk(self):
+        """
+        Returns the (filename, entry) pairs of the whole include tree.
+        """
+        seen = set()
+        stack = [self.journal]
+        while stack:
+            filename = stack.pop(0)
+            if filename in seen or not os.path.isfile(filename):
+                continue
+            seen.add(filename)
+            entry = self.entry(filename)
+            yield filename, entry
+            stack.extend(resolve_includes(filename, entry["includes"]))
+
+    def files_in_range(self, start, end):
+        """
+        Returns the files containing at least one transaction
+        between `start` and `end` (inclusive).
+        """
+        start, end = str(start), str(end)
+        return [
+            filename
+            for filename, entry in self.walk()
+            if entry["min"] is not None
+            and entry["min"] <= end
+            and entry["max"] >= start
+        ]
+
+    def scan(self, start, end):
+        """
+        Parse only the files overlapping the given date range.
+        """
+        entries = []
+        for filename in self.files_in_range(start, end):
+            if filename in self._parsed:
+                entries.extend(self._parsed[filename])
+            else:
+                entries.extend(ParseCache.parse(filename)[0])
+        return entries
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Deferred:
+    """
+    Stage run in the calling thread, the first time its result is needed.
+    """
+
+    def __init__(self, fn, args):
+        self.fn = fn
+        self.args = args
+        self.done = False
+        self.value = None
+
+    def result(self):
+        if not self.done:
+            self.value = self.fn(*self.args)
+            self.done = True
+        return self.value
+
+
+class Stages:
+    """
+    Runs independent stages of a job (e.g. loading the ledger) on
+    background threads, while the calling thread goes on with its work.
+    The result of a stage is joined with `result()`, which re-raises the
+    errors of the stage.
+
+    In sequential mode, no thread is started: each stage runs in the
+    calling thread when its result is first needed, which is easier
+    to debug.
+    """
+
+    def __init__(self, sequential=False, workers=2):
+        self.executor = None if sequential else ThreadPoolExecutor(max_workers=workers)
+
+    def start(self, fn, *args):
+
+        if self.executor is None:
+            return Deferred(fn, args)
+        return self.executor.submit(fn, *args)
+
+    def close(self):
+
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
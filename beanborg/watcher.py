@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+import glob
+import os
+import sys
+import time
+import traceback
+from collections import deque
+
+from rich import print as rprint
+
+from beanborg.bb_run import Pipeline
+from beanborg.config import init_config
+from beanborg.server.cache import WarmCache
+from beanborg.utils.ledger_scanner import ParseCache
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:  # pragma: no cover - optional dependency
+    INotify = None
+
+# suffixes used by browsers for downloads in progress
+PARTIAL_SUFFIXES = (".part", ".crdownload", ".download", ".tmp")
+
+
+def load_configs(path, debug):
+    """
+    Load a single configuration file or all the configuration files
+    (*.yaml, *.yml) of a folder.
+    Returns a list of (file, config) tuples.
+    """
+    if os.path.isdir(path):
+        files = sorted(
+            glob.glob(os.path.join(path, "*.yaml"))
+            + glob.glob(os.path.join(path, "*.yml"))
+        )
+    else:
+        files = [path]
+
+    return [(f, init_config(f, debug)) for f in files]
+
+
+class FolderWatcher:
+    """
+    Detects new files in a set of folders.
+
+    A file is reported only once its size and modification time did not
+    change for `settle` seconds, so that files still being written by a
+    browser are not picked up.
+    Uses inotify when the `inotify_simple` package is available,
+    otherwise the folders are polled every `interval` seconds.
+    """
+
+    def __init__(self, folders, settle=2.0, interval=1.0):
+        self.folders = sorted(set(folders))
+        self.settle = settle
+        self.interval = interval
+        # path -> (size, mtime, time of the last change)
+        self.pending = dict()
+        # (path, size, mtime) of the files already reported
+        self.reported = set()
+        self.inotify = None
+        if INotify is not None:
+            self.inotify = INotify()
+            mask = flags.CREATE | flags.CLOSE_WRITE | flags.MOVED_TO
+            for folder in self.folders:
+                self.inotify.add_watch(folder, mask)
+
+    def wait(self):
+        if self.inotify is not None:
+            # wake up on new events, or when pending files may have settled
+            timeout = self.settle if self.pending else None
+            self.inotify.read(timeout=None if timeout is None else int(timeout * 1000))
+        else:
+            time.sleep(self.interval)
+
+    def scan(self):
+        """
+        Returns the files that settled since the last call,
+        oldest first.
+        """
+        now = time.monotonic()
+        ready = []
+        for folder in self.folders:
+            for entry in os.scandir(folder):
+                if not entry.is_file() or entry.name.endswith(PARTIAL_SUFFIXES):
+                    continue
+                stat = entry.stat()
+                state = (stat.st_size, stat.st_mtime_ns)
+                if (entry.path,) + state in self.reported:
+                    continue
+                previous = self.pending.get(entry.path)
+                if previous is None or previous[:2] != state:
+                    self.pending[entry.path] = state + (now,)
+                elif now - previous[2] >= self.settle:
+                    del self.pending[entry.path]
+                    self.reported.add((entry.path,) + state)
+                    ready.append((stat.st_mtime_ns, entry.path))
+
+        # forget files that disappeared before settling
+        for path in [p for p in self.pending if not os.path.exists(p)]:
+            del self.pending[path]
+
+        return [path for _, path in sorted(ready)]
+
+
+class ImportPipeline:
+    """
+    Moves, imports and archives the files of all the configured banks,
+    one file at a time, without restarting the process.
+    Rule engines, models and parsed ledger files are kept in memory
+    between files.
+    """
+
+    def __init__(self, configs):
+        self.configs = configs
+        self.queue = deque()
+        self.cache = WarmCache()
+        ParseCache.enabled = True
+
+    def download_folders(self):
+        return [
+            os.path.normpath(os.path.expanduser(config.csv.download_path))
+            for _, config in self.configs
+        ]
+
+    def enqueue(self, path):
+        name = os.path.basename(path)
+        for config_file, config in self.configs:
+            folder = os.path.normpath(os.path.expanduser(config.csv.download_path))
+            if os.path.dirname(path) == folder and name.startswith(config.csv.name):
+                rprint(f"queued [bold]{name}[/bold] ({config.csv.ref})")
+                self.queue.append((config_file, config, path))
+                return
+
+    def process(self):
+        while self.queue:
+            config_file, config, path = self.queue.popleft()
+            self.run(config_file, config, path)
+
+    def run(self, config_file, config, path):
+        try:
+            Pipeline(config_file, config, self.cache).run(path)
+        except SystemExit:
+            rprint(f"[red]unable to process {path}[/red]")
+        except Exception:
+            rprint(f"[red]unable to process {path}[/red]")
+            traceback.print_exc()
+
+
+def watch(path, debug=False):
+    """
+    Watch the download folders of the given configuration file(s)
+    and run the move -> import -> archive pipeline for every new file.
+    """
+    configs = load_configs(path, debug)
+    if not configs:
+        rprint(f"[red]no configuration file found in {path}[/red]")
+        sys.exit(-1)
+
+    pipeline = ImportPipeline(configs)
+    for folder in pipeline.download_folders():
+        if not os.path.isdir(folder):
+            rprint(f"[red]folder: {folder} does not exist![/red]")
+            sys.exit(-1)
+
+    watcher = FolderWatcher(pipeline.download_folders())
+    rprint(
+        f"watching {', '.join(watcher.folders)} "
+        f"({'inotify' if watcher.inotify else 'polling'}), press Ctrl+C to stop"
+    )
+    try:
+        while True:
+            for new_file in watcher.scan():
+                pipeline.enqueue(new_file)
+            pipeline.process()
+            watcher.wait()
+    except KeyboardInterrupt:
+        print("Done :) ")
@@ -13,5 +13,5 @@ setup(
     packages=find_packages(),
     install_requires=required,
     include_package_data=True,
-    scripts=['bin/bb_import', 'bin/bb_mover', 'bin/bb_archive']
+    scripts=['bin/bb_import', 'bin/bb_mover', 'bin/bb_archive', 'bin/bb_server', 'bin/bb_run']
 )
\ No newline at end of file
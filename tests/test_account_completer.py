@@ -0,0 +1,45 @@
+from prompt_toolkit.document import Document
+
+from beanborg.classification.custom_fuzzy_wordf_completer import (
+    AccountIndex,
+    CustomFuzzyWordCompleter,
+)
+
+ACCOUNTS = [
+    "Expenses:Groceries",
+    "Expenses:Gifts",
+    "Expenses:Car:Gas",
+    "Assets:Bank1:Current",
+    "Income:Salary",
+]
+
+
+def completions(completer, text):
+
+    return [c.text for c in completer.get_completions(Document(text), None)]
+
+
+def test_account_index():
+
+    index = AccountIndex(ACCOUNTS)
+
+    assert "Expenses:Gifts" in index
+    assert "expenses:gifts" not in index
+    assert index.starting_with("expenses:g") == ["Expenses:Gifts", "Expenses:Groceries"]
+    assert index.starting_with("z") == []
+    assert [account for _, account in index.fuzzy("exgas")] == ["Expenses:Car:Gas"]
+
+
+def test_completer_prefix_first():
+
+    completer = CustomFuzzyWordCompleter(AccountIndex(ACCOUNTS))
+
+    assert completions(completer, "Exp") == [
+        "Expenses:Car:Gas",
+        "Expenses:Gifts",
+        "Expenses:Groceries",
+    ]
+    assert completions(completer, "gro") == ["Expenses:Groceries"]
+    # the next keystroke only searches the previous matches
+    assert completions(completer, "groc") == ["Expenses:Groceries"]
+    assert completions(completer, "sal") == ["Income:Salary"]
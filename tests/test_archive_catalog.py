@@ -0,0 +1,55 @@
+import shutil
+from datetime import date
+
+from beanborg.config import init_config
+from beanborg.utils.archive_catalog import ArchiveCatalog
+from beanborg.utils.hash_utils import hash
+
+ROW = (
+    '04.11.2020;04.11.2020;Direct Debit;"Fresh Food";-21,30;EUR;0000001;UK0000001444555'
+)
+FIELDS = ROW.replace('"', "").split(";")
+
+
+def make_catalog(tmp_path):
+
+    config = init_config("tests/files/bank1.yaml", False)
+    config.csv.ref = "eag"
+    config.csv.separator = ";"
+    config.csv.skip = 1
+    shutil.copy(
+        "tutorial/test-data/eagle-bank-statement.csv",
+        tmp_path / "eag_2020-11-01_2020-12-01.csv",
+    )
+    catalog = ArchiveCatalog(str(tmp_path))
+    catalog.sync(config)
+    return catalog, config
+
+
+def test_lookup_by_hash(tmp_path):
+
+    catalog, _ = make_catalog(tmp_path)
+
+    found = catalog.lookup_md5(hash(FIELDS))
+    assert found == [("eag_2020-11-01_2020-12-01.csv", 71, ROW)]
+    assert catalog.lookup_md5(hash(["not", "archived"])) == []
+
+
+def test_lookup_by_date(tmp_path):
+
+    catalog, _ = make_catalog(tmp_path)
+
+    assert catalog.lookup_dates(date(2020, 11, 15), date(2020, 11, 15)) == [
+        ("eag_2020-11-01_2020-12-01.csv", "2020-11-01", "2020-12-01", 4)
+    ]
+    assert catalog.lookup_dates(date(2021, 1, 1), date(2021, 2, 1)) == []
+
+
+def test_sync_drops_deleted_files(tmp_path):
+
+    catalog, config = make_catalog(tmp_path)
+    (tmp_path / "eag_2020-11-01_2020-12-01.csv").unlink()
+    catalog.sync(config)
+
+    assert catalog.lookup_dates(date(2020, 1, 1), date(2021, 1, 1)) == []
+    assert catalog.lookup_md5(hash(FIELDS)) == []
@@ -0,0 +1,157 @@
+import lzma
+import os
+import shutil
+
+from beanborg.bb_archive import compact
+from beanborg.config import init_config
+from beanborg.utils.archive_catalog import ArchiveCatalog
+from beanborg.utils.archive_store import MAGIC, ArchiveStore, decode, encode
+from beanborg.utils.hash_utils import hash
+
+STATEMENT = "tutorial/test-data/eagle-bank-statement.csv"
+
+
+def make_config(compression="xz", dedup=True):
+
+    config = init_config("tests/files/bank1.yaml", False)
+    config.csv.ref = "eag"
+    config.csv.separator = ";"
+    config.csv.skip = 1
+    config.csv.archive_compression = compression
+    config.csv.archive_dedup = dedup
+    return config
+
+
+def test_encode_decode():
+
+    content = b"header\r\nrow 1\r\nrow 2\r\nlast"
+    data = encode(
+        content, lambda offset, line: ("old.csv", 3) if line == b"row 2\r\n" else None
+    )
+
+    assert data.startswith(MAGIC)
+    assert b"Rold.csv\t3\t7\n" in data
+    rebuilt, references = decode(data, lambda name, offset, length: b"row 2\r\n")
+    assert rebuilt == content
+    assert references == {15}
+
+
+def test_deduplicated_archive(tmp_path):
+
+    config = make_config()
+    with open(STATEMENT, "rb") as csv_file:
+        content = csv_file.read()
+    # the second statement overlaps the first one
+    shutil.copy(STATEMENT, tmp_path / "eag_2020-11-01_2020-12-01.csv")
+    second = content + b"05.12.2020;05.12.2020;Direct Debit;New Row;-1,00;EUR;0;X\n"
+
+    catalog = ArchiveCatalog(str(tmp_path))
+    catalog.sync(config)
+    archived = str(tmp_path / "eag_2020-11-01_2020-12-05.csv.xz")
+    catalog.store.write(archived, second, "xz", catalog.duplicates(second, config))
+    catalog.add(archived, config, ("2020-11-01", "2020-12-05"), second)
+
+    with lzma.open(archived) as archived_file:
+        assert archived_file.read().count(b"\nReag_2020-11-01_2020-12-01.csv\t") == 4
+    assert ArchiveStore(str(tmp_path)).read(os.path.basename(archived)) == second
+    found = catalog.lookup_md5(
+        hash(
+            [
+                "05.12.2020",
+                "05.12.2020",
+                "Direct Debit",
+                "New Row",
+                "-1,00",
+                "EUR",
+                "0",
+                "X",
+            ]
+        )
+    )
+    assert found[0][0] == "eag_2020-11-01_2020-12-05.csv.xz"
+
+
+def test_compact(tmp_path):
+
+    config = make_config()
+    config.csv.archive = str(tmp_path)
+    with open(STATEMENT, "rb") as csv_file:
+        content = csv_file.read()
+    shutil.copy(STATEMENT, tmp_path / "eag_2020-11-01_2020-12-01.csv")
+    shutil.copy(STATEMENT, tmp_path / "eag_2020-11-01_2020-12-02.csv")
+
+    compact(config)
+
+    assert sorted(f for f in os.listdir(tmp_path) if f.startswith("eag")) == [
+        "eag_2020-11-01_2020-12-01.csv.xz",
+        "eag_2020-11-01_2020-12-02.csv.xz",
+    ]
+    store = ArchiveStore(str(tmp_path))
+    assert store.read("eag_2020-11-01_2020-12-01.csv.xz") == content
+    assert store.read("eag_2020-11-01_2020-12-02.csv.xz") == content
+    # the rows of the second file are stored as references to the first one
+    assert store.load("eag_2020-11-01_2020-12-02.csv")[1]
+    assert not store.load("eag_2020-11-01_2020-12-01.csv")[1]
+
+
+def test_compact_toggles_dedup(tmp_path):
+
+    config = make_config(dedup=False)
+    config.csv.archive = str(tmp_path)
+    with open(STATEMENT, "rb") as csv_file:
+        content = csv_file.read()
+    shutil.copy(STATEMENT, tmp_path / "eag_2020-11-01_2020-12-01.csv")
+    shutil.copy(STATEMENT, tmp_path / "eag_2020-11-01_2020-12-02.csv")
+    compact(config)
+    store = ArchiveStore(str(tmp_path))
+    assert not store.deduplicated("eag_2020-11-01_2020-12-02.csv.xz")
+
+    config.csv.archive_dedup = True
+    compact(config)
+
+    store = ArchiveStore(str(tmp_path))
+    assert store.read("eag_2020-11-01_2020-12-01.csv.xz") == content
+    assert store.read("eag_2020-11-01_2020-12-02.csv.xz") == content
+    # each row is stored once, the other file referencing it
+    references = [
+        store.load(name)[1]
+        for name in ["eag_2020-11-01_2020-12-01.csv", "eag_2020-11-01_2020-12-02.csv"]
+    ]
+    assert references[0] or references[1]
+    assert not (references[0] and references[1])
+
+    config.csv.archive_dedup = False
+    compact(config)
+
+    store = ArchiveStore(str(tmp_path))
+    for name in ["eag_2020-11-01_2020-12-01.csv.xz", "eag_2020-11-01_2020-12-02.csv.xz"]:
+        assert not store.deduplicated(name)
+        assert store.read(name) == content
+
+
+def test_compact_never_writes_circular_references(tmp_path):
+
+    config = make_config()
+    config.csv.archive = str(tmp_path)
+    with open(STATEMENT, "rb") as csv_file:
+        content = csv_file.read()
+    lines = content.splitlines(keepends=True)
+    older = "eag_2020-11-01_2020-12-01.csv"
+    newer = "eag_2020-11-02_2020-12-02.csv.xz"
+    shutil.copy(STATEMENT, tmp_path / older)
+    # the newer file references the first two rows of the older file, and
+    # stores the last two rows as-is
+    first_rows = {len(lines[0]), len(lines[0]) + len(lines[1])}
+    with lzma.open(tmp_path / newer, "wb") as archived:
+        archived.write(
+            encode(
+                content,
+                lambda offset, line: (older, offset) if offset in first_rows else None,
+            )
+        )
+
+    compact(config)
+
+    store = ArchiveStore(str(tmp_path))
+    assert store.read(older + ".xz") == content
+    assert store.read(newer) == content
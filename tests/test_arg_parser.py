@@ -0,0 +1,32 @@
+import sys
+
+import pytest
+
+from beanborg.arg_parser import archive_args, eval_args, import_args, mover_args
+
+
+def test_command_options(monkeypatch):
+
+    monkeypatch.setattr(sys, "argv", ["bb_mover", "-f", "bank.yaml", "--watch"])
+    assert eval_args("move", mover_args).watch
+
+    monkeypatch.setattr(sys, "argv", ["bb_import", "-f", "bank.yaml", "--remote"])
+    options = eval_args("import", import_args)
+    assert options.remote and not options.fix_only
+
+
+@pytest.mark.parametrize(
+    "extra, options",
+    [
+        (archive_args, ["--watch"]),
+        (import_args, ["--watch"]),
+        (mover_args, ["--remote"]),
+        (mover_args, ["--fix-only"]),
+        (None, ["--lookup", "2024-01-01"]),
+    ],
+)
+def test_options_of_other_commands_are_rejected(monkeypatch, extra, options):
+
+    monkeypatch.setattr(sys, "argv", ["bb", "-f", "bank.yaml"] + options)
+    with pytest.raises(SystemExit):
+        eval_args("test", extra)
@@ -0,0 +1,138 @@
+import datetime
+
+from beancount.core.data import Amount, Posting, Transaction
+from beancount.core.number import D
+
+from beanborg.classification.classifier import Classifier, PreparedTransaction
+from beanborg.config import init_config
+from beanborg.importer import Importer
+from beanborg.model.transactions import Transactions
+
+TRAINING_DATA = """date,desc,amount,cat
+2020-11-02,FRESH FOOD,-21.30,Expenses:Groceries
+2020-11-09,FRESH FOOD,-11.30,Expenses:Groceries
+2020-11-08,BEST COMPANY,-10.00,Expenses:Clothing
+2020-11-15,BEST COMPANY,-12.00,Expenses:Gifts
+"""
+
+LEDGER = """2020-11-02 * "FRESH FOOD" ""
+  csv: "02.11.2020,FRESH FOOD"
+  md5: "aaa"
+  Assets:Bank1:Bob:Current  -21.30 EUR
+  Expenses:Unknown
+
+2020-11-03 * "CORNER SHOP" ""
+  md5: "bbb"
+  Assets:Bank1:Bob:Current  -5.00 EUR
+  Expenses:Unknown
+
+"""
+
+
+def make_tx(payee, md5):
+
+    return Transaction(
+        {"md5": md5},
+        datetime.date(2020, 11, 30),
+        "*",
+        payee,
+        "",
+        frozenset(),
+        frozenset(),
+        [
+            Posting("Assets:Bank1", Amount(D("-1"), "EUR"), None, None, None, None),
+            Posting("Expenses:Unknown", None, None, None, None, None),
+        ],
+    )
+
+
+def make_args():
+
+    args = init_config("tests/files/bank1.yaml", False)
+    args.rules.default_expense = "Expenses:Unknown"
+    args.rules.auto_classify_threshold = 0.9
+    return args
+
+
+def make_classifier(tmp_path):
+
+    (tmp_path / "training_data.csv").write_text(TRAINING_DATA)
+    classifier = Classifier(str(tmp_path / "training_data.csv"))
+    classifier.model = None
+    return classifier
+
+
+def test_auto_classify(tmp_path):
+
+    args = make_args()
+    args.rules.auto_classify_min_samples = 2
+    txs = Transactions([make_tx("FRESH FOOD 123", "a"), make_tx("BEST COMPANY", "b")])
+
+    assert make_classifier(tmp_path).classify(txs, args, interactive=False) == 1
+
+    fresh_food, best_company = txs.getTransactions()
+    assert fresh_food.postings[1].account == "Expenses:Groceries"
+    assert fresh_food.meta == {"md5": "a", "classified": "auto"}
+    assert best_company.postings[1].account == "Expenses:Unknown"
+
+
+def test_auto_classify_allow_list(tmp_path):
+
+    args = make_args()
+    args.rules.auto_classify_categories = ["Expenses:Clothing"]
+    txs = Transactions([make_tx("FRESH FOOD", "a")])
+
+    assert make_classifier(tmp_path).auto_classify(txs, args) == 0
+
+
+def test_memo_needs_enough_samples(tmp_path):
+
+    args = make_args()
+    classifier = make_classifier(tmp_path)
+    classifier.memo.add("CORNER SHOP", "Expenses:Groceries")
+    txs = Transactions([make_tx("CORNER SHOP", "a"), make_tx("FRESH FOOD", "b")])
+
+    # one sample (and two for FRESH FOOD) are not enough by default
+    assert classifier.auto_classify(txs, args) == 0
+
+    args.rules.auto_classify_min_samples = 1
+    assert classifier.auto_classify(txs, args) == 2
+
+
+def test_fix_only_update(tmp_path):
+
+    importer = Importer()
+    importer.args = make_args()
+
+    content = importer.update_transaction(
+        LEDGER, "bbb", "Expenses:Groceries", {"classified": "auto"}
+    )
+
+    # only the matching transaction is updated
+    assert content == LEDGER.replace(
+        '  md5: "bbb"\n  Assets:Bank1:Bob:Current  -5.00 EUR\n  Expenses:Unknown\n',
+        '  md5: "bbb"\n  classified: "auto"\n'
+        "  Assets:Bank1:Bob:Current  -5.00 EUR\n  Expenses:Groceries\n",
+    )
+    assert importer.update_transaction(content, "ccc", "Expenses:Groceries") == content
+
+
+def test_memo_follows_the_training_data(tmp_path, monkeypatch):
+
+    class SkippingModel:
+        def update_training_data(self, *args):
+            return False
+
+    args = make_args()
+    classifier = make_classifier(tmp_path)
+    classifier.model = SkippingModel()
+    monkeypatch.setattr(classifier, "get_user_selection", lambda *_: "Expenses:Gifts")
+    monkeypatch.setattr(classifier, "get_user_narration", lambda: None)
+    monkeypatch.setattr(classifier.ui_service, "display_transaction", lambda *_: None)
+    txs = Transactions([make_tx("FRESH FOOD", "a")])
+    prepared = PreparedTransaction("FRESH FOOD", 2, 0, [], [], None, "")
+
+    classifier.process_transaction(txs.getTransactions()[0], 0, txs, args, prepared)
+
+    # the conflicting category was not added to the training data
+    assert classifier.memo.unanimous("FRESH FOOD") == "Expenses:Groceries"
@@ -0,0 +1,57 @@
+import os
+import shutil
+
+from beanborg.utils.bloom_filter import BloomFilter, LedgerHashFilter
+from beanborg.utils.hash_utils import hash
+
+LEDGER_HASHES = {
+    "2454abe7257b2b40dfa9e5d24b6e16e7",
+    "7c1c6b6a2d1f8e0b1f6b8e2e2d9b4c11",
+    "9a8f1e7fb3a8a0b5f3c0a1a0c6b2d4e5",
+}
+
+
+def test_bloom_filter(tmp_path):
+
+    bloom = BloomFilter.create(str(tmp_path / "bloom"), 1000)
+    hashes = [hash([str(i)]) for i in range(1000)]
+    for md5 in hashes[:500]:
+        bloom.add(md5)
+    bloom.flush()
+    bloom.close()
+
+    bloom = BloomFilter(str(tmp_path / "bloom"))
+    assert bloom.count == 500
+    assert all(md5 in bloom for md5 in hashes[:500])
+    # 1% false positive rate
+    assert sum(md5 in bloom for md5 in hashes[500:]) < 25
+
+
+def test_ledger_hash_filter(tmp_path):
+
+    shutil.copytree("tests/files/ledger", tmp_path / "ledger")
+    journal = str(tmp_path / "ledger" / "main.ldg")
+
+    hash_filter = LedgerHashFilter(journal)
+    assert all(md5 in hash_filter for md5 in LEDGER_HASHES)
+    assert os.path.isfile(tmp_path / "ledger" / ".main.ldg.bloom")
+
+    # the importer appends to a ledger file and updates the filter
+    ledger_file = str(tmp_path / "ledger" / "1234" / "2020.ldg")
+    with open(ledger_file, "a") as ledger:
+        ledger.write('\n2020-05-01 * "New"\n  md5: "%s"\n' % hash(["new"]))
+    hash_filter.update([hash(["new"])], ledger_file)
+    hash_filter.close()
+
+    hash_filter = LedgerHashFilter(journal)
+    assert hash(["new"]) in hash_filter
+    assert hash_filter.bloom.count == 4
+    hash_filter.close()
+
+    # a ledger file modified by hand triggers a rebuild
+    with open(ledger_file, "a") as ledger:
+        ledger.write('\n2020-05-02 * "Manual"\n  md5: "%s"\n' % hash(["manual"]))
+    hash_filter = LedgerHashFilter(journal)
+    assert hash(["manual"]) in hash_filter
+    assert hash_filter.bloom.count == 5
+    hash_filter.close()
@@ -46,4 +46,63 @@ def test_loadfile():
     assert table["ford"] != None
     assert table["ford"][0] == "contains"
     assert table["ford"][1] == "Ford Auto"
-    
\ No newline at end of file
+    
+def test_regex_value():
+    table = {}
+    table[r"^AMZN\s?MKTP"] = ("regex", "Expenses:Shopping")
+    table["rewe|aldi|lidl"] = ("regex_ic", "Expenses:Groceries")
+
+    assert "Expenses:Shopping" == resolve_from_decision_table(table, "AMZN MKTP DE 123", "x")
+    assert "x" == resolve_from_decision_table(table, "amzn mktp", "x")
+    assert "Expenses:Groceries" == resolve_from_decision_table(table, "LIDL BERLIN", "x")
+
+def test_first_matching_entry_wins():
+    table = DecisionTable()
+    table["ALDI"] = ("contains", "Expenses:Discount")
+    table["berlin$"] = ("regex_ic", "Expenses:Berlin")
+    table["lidl"] = ("regex_ic", "Expenses:Lidl")
+    table["LIDL"] = ("contains", "Expenses:Never")
+
+    # the regex entries are matched in file order, not by position in the string
+    assert "Expenses:Berlin" == resolve_from_decision_table(table, "LIDL BERLIN", "x")
+    assert "Expenses:Lidl" == resolve_from_decision_table(table, "LIDL MUNICH", "x")
+    assert "Expenses:Discount" == resolve_from_decision_table(table, "ALDI BERLIN", "x")
+    assert table.automaton.combined is not None
+
+def test_uncombinable_regex_values():
+    table = DecisionTable()
+    table[r"(\w)\1"] = ("regex", "double")
+    table["o"] = ("regex", "single")
+
+    assert "double" == resolve_from_decision_table(table, "foo", "x")
+    assert "single" == resolve_from_decision_table(table, "ox", "x")
+    assert table.automaton.combined is None
+
+def test_combined_index():
+    payees = DecisionTable()
+    payees["AMZN"] = ("sw", "Amazon")
+    payees["straße"] = ("contains_ic", "Street")
+    payees["shop"] = ("endsWith", "Shop")
+    payees["rewe"] = ("equals_ic", "REWE")
+    accounts = DecisionTable()
+    accounts["x"] = ("regex", "Expenses:X")
+    accounts["AMZN MKTP"] = ("startsWith", "Expenses:Shopping")
+    accounts["rewe"] = ("co", "Expenses:Groceries")
+    accounts["REWE"] = ("eq", "Expenses:Never")
+    accounts[r"\d{4}$"] = ("regex_ic", "Expenses:Numbered")
+    index = CombinedIndex([payees, accounts])
+
+    for string in [
+        "AMZN MKTP DE",
+        "AMZN mktp",
+        "REWE",
+        "rewe 1234",
+        "my Strasse shop",
+        "STRASSE 1234",
+        "box",
+        "",
+    ]:
+        assert index.resolve(string, "x") == (
+            resolve_from_decision_table(payees, string, "x"),
+            resolve_from_decision_table(accounts, string, "x"),
+        )
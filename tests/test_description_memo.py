@@ -0,0 +1,49 @@
+import pandas as pd
+
+from beanborg.classification.classifier import Classifier
+from beanborg.classification.description_memo import DescriptionMemo
+
+TRAINING_DATA = """date,desc,amount,cat
+2020-11-02,FRESH FOOD,-21.30,Expenses:Groceries
+2020-11-09,FRESH  FOOD,-11.30,Expenses:Groceries
+2020-11-08,BEST COMPANY,-10.00,Expenses:Clothing
+2020-11-15,BEST COMPANY,-12.00,Expenses:Gifts
+"""
+
+
+def test_memo():
+
+    memo = DescriptionMemo(
+        pd.DataFrame(
+            {
+                "desc": ["FRESH FOOD", "FRESH  FOOD", "BEST COMPANY", "BEST COMPANY"],
+                "cat": ["Groceries", "Groceries", "Clothing", "Gifts"],
+            }
+        )
+    )
+
+    assert memo.unanimous("FRESH FOOD ") == "Groceries"
+    assert memo.distribution("FRESH FOOD") == {"Groceries": 2}
+    assert memo.unanimous("BEST COMPANY") is None
+    assert memo.unanimous("NEW SHOP") is None
+
+    memo.add("NEW SHOP", "Groceries")
+    assert memo.unanimous("NEW SHOP") == "Groceries"
+
+
+def test_known_payee_skips_the_model(tmp_path):
+
+    (tmp_path / "training_data.csv").write_text(TRAINING_DATA)
+    classifier = Classifier(str(tmp_path / "training_data.csv"))
+
+    def fail(*args):
+        raise AssertionError("the model should not be used")
+
+    classifier.model = None
+    classifier.get_llm_prediction = fail
+
+    assert classifier.get_predictions("FRESH FOOD", 2, 0) == (
+        ["Expenses:Groceries"],
+        [1.0],
+        None,
+    )
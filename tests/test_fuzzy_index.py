@@ -0,0 +1,34 @@
+from beanborg.rule_engine.fuzzy_index import FuzzyIndex, normalize
+
+
+def test_normalize():
+
+    assert normalize("AMZN Mktp DE*2K4  ") == "amzn mktp de k"
+
+
+def test_most_similar_entry():
+
+    index = FuzzyIndex(
+        [
+            ("Amazon EU SARL", "Amazon"),
+            ("Amazon Prime", "Amazon Prime"),
+            ("Tesco Stores", "Tesco"),
+        ],
+        threshold=0.7,
+    )
+
+    assert index.best("AMAZON EU S.A.R.L.") == "Amazon"
+    assert index.best("AMAZON PRIME*123") == "Amazon Prime"
+    assert index.best("TESCO STORES 3154") == "Tesco"
+    assert index.best("Sainsbury's") is None
+    assert index.best("") is None
+
+
+def test_results_are_memoized():
+
+    index = FuzzyIndex([("Tesco Stores", "Tesco")], threshold=0.7)
+
+    assert index.best("TESCO STORES 1") == "Tesco"
+    index.results[0] = "Changed"
+    assert index.best("TESCO STORES 1") == "Tesco"
+    assert index.best("TESCO STORES 2") == "Changed"
@@ -0,0 +1,80 @@
+import os
+import shutil
+from datetime import date
+
+from beanborg.utils.journal_utils import JournalUtils
+from beanborg.utils.ledger_scanner import LedgerManifest
+
+
+def test_scan_follows_includes():
+
+    hashes = JournalUtils().transaction_hashes("tests/files/ledger/main.ldg")
+    assert hashes == {
+        "2454abe7257b2b40dfa9e5d24b6e16e7",
+        "7c1c6b6a2d1f8e0b1f6b8e2e2d9b4c11",
+        "9a8f1e7fb3a8a0b5f3c0a1a0c6b2d4e5",
+    }
+
+
+def test_scan_matches_full_load():
+
+    scanned = JournalUtils().transaction_hashes("tests/files/ledger/main.ldg")
+    loaded = JournalUtils(validate=True).transaction_hashes(
+        "tests/files/ledger/main.ldg"
+    )
+    assert scanned == loaded
+
+
+def test_accounts():
+
+    accounts = JournalUtils().get_accounts("tests/files/ledger/main.ldg")
+    assert accounts == {"Assets:MyBank:Savings", "Expenses:Groceries"}
+
+
+def test_transactions_by_account_name():
+
+    txs = JournalUtils().get_transactions_by_account_name(
+        "tests/files/ledger/main.ldg", "2020"
+    )
+    assert len(txs) == 1
+    assert str(txs[0].postings[0].units) == "-105.12 EUR"
+
+
+def test_date_range_only_parses_overlapping_files(tmp_path):
+
+    shutil.copytree("tests/files/ledger", tmp_path / "ledger")
+    journal = str(tmp_path / "ledger" / "main.ldg")
+
+    hashes = JournalUtils().transaction_hashes(
+        journal, (date(2020, 1, 1), date(2020, 3, 1))
+    )
+    assert hashes == {"9a8f1e7fb3a8a0b5f3c0a1a0c6b2d4e5"}
+
+    manifest = LedgerManifest(journal)
+    assert os.path.isfile(manifest.path)
+    assert manifest.files_in_range(date(2019, 12, 1), date(2020, 1, 31)) == [
+        str(tmp_path / "ledger" / "1234" / "2019.ldg")
+    ]
+
+
+def test_manifest_is_refreshed_on_change(tmp_path):
+
+    shutil.copytree("tests/files/ledger", tmp_path / "ledger")
+    journal = str(tmp_path / "ledger" / "main.ldg")
+    date_range = (date(2021, 1, 1), date(2021, 12, 31))
+
+    assert JournalUtils().transaction_hashes(journal, date_range) == set()
+
+    with open(tmp_path / "ledger" / "1234" / "2020.ldg", "a") as ledger:
+        ledger.write(
+            '\n2021-01-05 * "Dummy Supermarket" ""\n'
+            '  md5: "0b9d6f0e4e0c1b7f0c5a2d8e9f3a6b1c"\n'
+            "  Assets:MyBank:Savings  -1.00 EUR\n"
+            "  Expenses:Groceries\n"
+        )
+
+    # the whole file now overlaps the range
+    assert JournalUtils().transaction_hashes(journal, date_range) == {
+        "9a8f1e7fb3a8a0b5f3c0a1a0c6b2d4e5",
+        "0b9d6f0e4e0c1b7f0c5a2d8e9f3a6b1c",
+    }
@@ -0,0 +1,46 @@
+from beanborg.utils.ledger_metadata import csv_metadata, migrate_ledger
+
+ROW = ["04.11.2020", "Direct Debit", 'The "Fresh" Food', "-21,30", "EUR"]
+
+LEDGER = """2020-11-04 * "Fresh Food" ""
+  csv: "04.11.2020,Direct Debit,The \\"Fresh\\" Food,-21,30,EUR"
+  md5: "60a5b7d1a5e2f5f2e3e1d8d5b1a9b5c1"
+  Assets:Bank1:Bob:Current  -21.30 EUR
+  Expenses:Groceries
+
+"""
+
+
+def test_csv_metadata():
+
+    assert csv_metadata(ROW, "full", 10) == ",".join(ROW)
+    assert csv_metadata(ROW, "truncated", 10) == "04.11.2020..."
+    assert csv_metadata(ROW, "truncated", 100) == ",".join(ROW)
+    assert csv_metadata(ROW, "hash", 10) is None
+
+
+def test_migrate_truncated(tmp_path):
+
+    (tmp_path / "main.ldg").write_text('include "bank.ldg"\n')
+    (tmp_path / "bank.ldg").write_text(LEDGER)
+
+    migrated = migrate_ledger(str(tmp_path / "main.ldg"), "truncated", 30)
+
+    assert migrated == [(str(tmp_path / "bank.ldg"), 1)]
+    assert (
+        '  csv: "04.11.2020,Direct Debit,The \\"F..."\n'
+        in (tmp_path / "bank.ldg").read_text()
+    )
+    # already migrated
+    assert migrate_ledger(str(tmp_path / "main.ldg"), "truncated", 30) == []
+
+
+def test_migrate_hash(tmp_path):
+
+    (tmp_path / "main.ldg").write_text(LEDGER)
+
+    migrate_ledger(str(tmp_path / "main.ldg"), "hash", 0)
+
+    assert (tmp_path / "main.ldg").read_text() == LEDGER.replace(
+        LEDGER.splitlines(True)[1], ""
+    )
@@ -0,0 +1,202 @@
+import os
+import shutil
+
+import pytest
+
+import beanborg.bb_archive
+import beanborg.bb_run
+from beanborg.bb_run import Pipeline
+from beanborg.bb_server import ImportServer
+from beanborg.config import init_config
+from beanborg.server.protocol import is_listening
+
+CONFIG = """--- !Config
+csv:
+   download_path: downloads
+   name: eagle
+   bank_ref: eag
+   separator: ';'
+   date_format: "%d.%m.%Y"
+indexes:
+    date: 1
+    tx_type: 2
+    counterparty: 3
+    amount: 4
+    currency: 5
+    account: 7
+rules:
+  ruleset:
+    - name: Replace_Expense
+"""
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    os.makedirs(tmp_path / "downloads")
+    os.makedirs(tmp_path / "rules")
+    shutil.copy("tutorial/main.ldg", tmp_path)
+    shutil.copy("tutorial/accounts.ldg", tmp_path)
+    (tmp_path / "UK0000001444555.ldg").write_text("")
+    shutil.copy(
+        "tutorial/test-data/eagle-bank-statement.csv",
+        tmp_path / "downloads" / "eagle-statement.csv",
+    )
+    (tmp_path / "eagle.yaml").write_text(CONFIG)
+    (tmp_path / "rules" / "asset.rules").write_text(
+        "value;expression;result\nUK0000001444555;equals;Assets:Bank1:Bob:Current\n"
+    )
+    (tmp_path / "rules" / "account.rules").write_text(
+        "value;expression;result\n"
+        "Fresh Food;contains;Expenses:Groceries\n"
+        "Best Company;contains;Expenses:Clothing\n"
+        "Doctor Bill;eq;Expenses:Medical\n"
+        "Bank Of Mars;eq;Assets:Cash:Bob\n"
+    )
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def test_pipeline(workspace):
+
+    config = init_config("eagle.yaml", False)
+    importer = Pipeline("eagle.yaml", config).run("downloads/eagle-statement.csv")
+
+    assert importer.stats.tx_in_file == 4
+    assert importer.stats.processed == 4
+    assert os.listdir("downloads") == []
+    assert not os.path.exists("tmp")
+    assert sorted(os.listdir("archive")) == [
+        "catalog.sqlite",
+        "eag_2020-11-01_2020-11-04.csv",
+    ]
+    with open("UK0000001444555.ldg") as ledger:
+        assert ledger.read().count("md5:") == 4
+
+
+def test_pipeline_rollback(workspace, monkeypatch):
+
+    def failing_archive(config, dates, content):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(beanborg.bb_run, "archive", failing_archive)
+    config = init_config("eagle.yaml", False)
+
+    with pytest.raises(OSError):
+        Pipeline("eagle.yaml", config).run("downloads/eagle-statement.csv")
+
+    assert os.listdir("downloads") == ["eagle-statement.csv"]
+    assert not os.path.exists("tmp")
+    assert os.path.getsize("UK0000001444555.ldg") == 0
+
+
+def test_pipeline_rollback_after_ledger_write(workspace, monkeypatch):
+
+    def failing_summary(importer):
+        assert os.path.getsize("UK0000001444555.ldg") > 0
+        raise RuntimeError("broken terminal")
+
+    monkeypatch.setattr(beanborg.bb_run.Importer, "print_summary", failing_summary)
+    config = init_config("eagle.yaml", False)
+
+    with pytest.raises(RuntimeError):
+        Pipeline("eagle.yaml", config).run("downloads/eagle-statement.csv")
+
+    assert os.listdir("downloads") == ["eagle-statement.csv"]
+    assert os.path.getsize("UK0000001444555.ldg") == 0
+
+
+def test_pipeline_rollback_after_archive_move(workspace, monkeypatch):
+
+    def failing_add(catalog, *args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(beanborg.bb_archive.ArchiveCatalog, "add", failing_add)
+    config = init_config("eagle.yaml", False)
+
+    with pytest.raises(OSError):
+        Pipeline("eagle.yaml", config).run("downloads/eagle-statement.csv")
+
+    assert os.listdir("downloads") == ["eagle-statement.csv"]
+    assert os.listdir("archive") == ["catalog.sqlite"]
+    assert os.path.getsize("UK0000001444555.ldg") == 0
+
+
+def test_server_job_runs_in_client_dir(workspace, tmp_path_factory, monkeypatch):
+
+    os.makedirs("tmp")
+    shutil.copy("downloads/eagle-statement.csv", "tmp/eag.csv")
+    socket_path = str(tmp_path_factory.mktemp("server") / "bb.sock")
+    server = ImportServer(socket_path)
+    try:
+        assert is_listening(socket_path)
+        # the server runs from another directory
+        elsewhere = tmp_path_factory.mktemp("elsewhere")
+        monkeypatch.chdir(elsewhere)
+        response = server.run_job(
+            {"config": str(workspace / "eagle.yaml"), "cwd": str(workspace)}
+        )
+    finally:
+        server.server_close()
+        os.remove(socket_path)
+
+    assert response["status"] == "ok", response["output"]
+    assert os.getcwd() == str(elsewhere)
+    assert os.listdir(elsewhere) == []
+    with open(workspace / "UK0000001444555.ldg") as ledger:
+        assert ledger.read().count("md5:") == 4
+    assert not is_listening(socket_path)
+
+
+def test_archived_counterparties(workspace):
+
+    (workspace / "rules" / "payee.rules").write_text(
+        "value;expression;result\nDoctor;contains;Dr. Bill 24/7\n"
+    )
+    config = init_config("eagle.yaml", False)
+    config.rules.ruleset = [{"name": "Replace_Payee"}, {"name": "Replace_Expense"}]
+    importer = Pipeline("eagle.yaml", config).run("downloads/eagle-statement.csv")
+
+    # training description -> csv counterparties
+    assert importer.archived_counterparties() == {
+        "FRESH FOOD": ["Fresh Food"],
+        "BEST COMPANY": ["Best Company"],
+        "DR BILL": ["Doctor Bill"],
+        "BANK OF MARS": ["Bank Of Mars"],
+    }
+
+
+def test_invalid_csv_metadata_stops_the_import(workspace):
+
+    (workspace / "eagle.yaml").write_text(CONFIG + "  csv_metadata: compressed\n")
+    config = init_config("eagle.yaml", False)
+
+    with pytest.raises(SystemExit):
+        Pipeline("eagle.yaml", config).run("downloads/eagle-statement.csv")
+
+    assert os.listdir("downloads") == ["eagle-statement.csv"]
+    assert os.path.getsize("UK0000001444555.ldg") == 0
+
+
+def test_classifier_is_not_loaded_for_imported_rows(workspace, monkeypatch):
+
+    config = init_config("eagle.yaml", False)
+    Pipeline("eagle.yaml", config).run("downloads/eagle-statement.csv")
+
+    loaded = []
+
+    def get_classifier(importer):
+        loaded.append(importer)
+
+    # the same rows, without a category, are all in the ledger already
+    monkeypatch.setattr(beanborg.bb_run.Importer, "get_classifier", get_classifier)
+    (workspace / "rules" / "account.rules").write_text("value;expression;result\n")
+    (workspace / "eagle.yaml").write_text(CONFIG + "  auto_classify_threshold: 0.9\n")
+    shutil.move(
+        "archive/eag_2020-11-01_2020-11-04.csv", "downloads/eagle-statement.csv"
+    )
+    config = init_config("eagle.yaml", False)
+    importer = Pipeline("eagle.yaml", config).run("downloads/eagle-statement.csv")
+
+    assert importer.stats.tx_in_file == 4
+    assert importer.stats.processed == 0
+    assert loaded == []
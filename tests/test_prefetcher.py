@@ -0,0 +1,40 @@
+from beanborg.classification.prefetcher import Prefetcher
+
+
+def test_prepared_items_are_reused():
+
+    prepared = []
+    version = [0]
+
+    def prepare(item):
+        prepared.append(item)
+        return version[0], item.upper()
+
+    prefetcher = Prefetcher(prepare, lambda: version[0], depth=2)
+    items = [(0, "a"), (1, "b"), (2, "c")]
+
+    prefetcher.schedule(items[1:])
+    assert prefetcher.get(0, "a") == "A"
+    assert prefetcher.get(1, "b") == "B"
+    # "c" was not scheduled again
+    prefetcher.schedule(items[2:])
+    assert prefetcher.get(2, "c") == "C"
+    assert sorted(prepared) == ["a", "b", "c"]
+    prefetcher.close()
+
+
+def test_out_of_date_items_are_prepared_again():
+
+    version = [0]
+
+    def prepare(item):
+        return version[0], (item, version[0])
+
+    prefetcher = Prefetcher(prepare, lambda: version[0])
+    prefetcher.schedule([(1, "b")])
+    prefetcher.futures[1].result()
+
+    # the model changed after "b" was prepared
+    version[0] = 1
+    assert prefetcher.get(1, "b") == ("b", 1)
+    prefetcher.close()
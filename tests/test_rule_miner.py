@@ -0,0 +1,100 @@
+import pandas as pd
+
+from beanborg.classification.rule_miner import RuleMiner
+from beanborg.rule_engine.decision_tables import matches
+
+
+def training_data(rows):
+
+    return pd.DataFrame(rows, columns=["desc", "cat"])
+
+
+def same_counterparties(data):
+
+    return {desc: [desc.title()] for desc in data["desc"]}
+
+
+def test_stable_descriptions_are_suggested():
+
+    data = training_data(
+        [("FRESH FOOD", "Expenses:Groceries")] * 3
+        + [("BEST COMPANY", "Expenses:Clothing")] * 2
+        + [("DOCTOR BILL", "Expenses:Medical")] * 2
+        + [("DOCTOR BILL", "Expenses:Unknown")]
+    )
+
+    candidates = RuleMiner(data, {}, same_counterparties(data), 2).candidates()
+
+    assert [c.to_rule() for c in candidates] == [
+        "FRESH FOOD;contains_ic;Expenses:Groceries",
+        "BEST COMPANY;contains_ic;Expenses:Clothing",
+    ]
+    assert candidates[0].samples == 3
+
+
+def test_descriptions_with_common_words_are_merged():
+
+    data = training_data(
+        [("AMAZON MKTPLACE UK", "Expenses:Shopping")] * 2
+        + [("AMAZON MKTPLACE DE", "Expenses:Shopping")]
+        + [("AMAZON PRIME", "Expenses:Subscriptions")] * 2
+    )
+
+    candidates = RuleMiner(data, {}, same_counterparties(data), 2).candidates()
+
+    # "amazon" alone would match the subscriptions
+    assert [c.to_rule() for c in candidates] == [
+        "AMAZON MKTPLACE;contains_ic;Expenses:Shopping",
+        "AMAZON PRIME;contains_ic;Expenses:Subscriptions",
+    ]
+
+
+def test_suggested_rules_match_the_csv_counterparties():
+
+    counterparties = {
+        "AMAZONDEK MKTP": ["AMAZON.DE*2K4 Mktp", "AMAZON.DE*7Q1 Mktp"],
+        "REWE MARKT BERLIN": ["REWE MARKT 1234 BERLIN", "REWE MARKT 0815 BERLIN"],
+        "MCDONALDS": ["McDonald's 0042"],
+    }
+    data = training_data(
+        [("AMAZONDEK MKTP", "Expenses:Shopping")] * 3
+        + [("REWE MARKT BERLIN", "Expenses:Groceries")] * 3
+        + [("MCDONALDS", "Expenses:Food")] * 3
+        # not in the archive
+        + [("CORNER SHOP", "Expenses:Groceries")] * 3
+    )
+
+    candidates = RuleMiner(data, {}, counterparties).candidates()
+
+    # no run of words of "MCDONALDS" is found in "McDonald's 0042"
+    assert [c.to_rule() for c in candidates] == [
+        "MKTP;contains_ic;Expenses:Shopping",
+        "REWE MARKT;contains_ic;Expenses:Groceries",
+    ]
+    for candidate, desc in zip(candidates, ["AMAZONDEK MKTP", "REWE MARKT BERLIN"]):
+        for original in counterparties[desc]:
+            assert matches(candidate.check_type, original, candidate.value)
+
+
+def test_existing_rules_are_not_shadowed():
+
+    data = training_data(
+        [("FRESH FOOD", "Expenses:Groceries")] * 3
+        + [("SHELL", "Expenses:Car")] * 3
+        + [("BP", "Expenses:Car")] * 3
+    )
+    counterparties = {
+        "FRESH FOOD": ["Fresh Food 12"],
+        "SHELL": ["Shell"],
+        "BP": ["BP"],
+    }
+    table = {
+        "Fresh Food": ("contains", "Expenses:Groceries"),
+        "SHELL RECHARGE": ("equals", "Expenses:Electricity"),
+    }
+
+    candidates = RuleMiner(data, table, counterparties, 3).candidates()
+
+    # fresh food is already handled by the rules, and "shell" would
+    # match the existing entry of another account
+    assert [c.to_rule() for c in candidates] == ["BP;equals_ic;Expenses:Car"]
@@ -1,3 +1,8 @@
+import os
+
+import pytest
+
+from beanborg.rule_engine.rules import LookUpCache
 from beanborg.rule_engine.rules_engine import RuleEngine
 from beanborg.rule_engine.Context import *
 from beanborg.rule_engine.decision_tables import *
@@ -106,3 +111,261 @@ def make_rule_engine(config_file):
             debug=False
         )
     )
+
+def test_lookups_are_memoized(tmp_path):
+
+    table = tmp_path / "account.rules"
+    table.write_text("value;expression;result\nrewe;contains;Expenses:Groceries\n")
+    hits = LookUpCache.hits
+
+    for _ in range(3):
+        assert LookUpCache.resolve(str(table), "REWE rewe", "x") == "Expenses:Groceries"
+    assert LookUpCache.resolve(str(table), "aldi", "x") == "x"
+    assert LookUpCache.hits == hits + 2
+
+    # the file is checked once per import
+    table.write_text("value;expression;result\nrewe;contains;Expenses:Food\n")
+    os.utime(table, ns=(0, 0))
+    assert LookUpCache.resolve(str(table), "REWE rewe", "x") == "Expenses:Groceries"
+
+    # a modified rules file drops the memoized values
+    LookUpCache.refresh()
+    assert LookUpCache.resolve(str(table), "REWE rewe", "x") == "Expenses:Food"
+    LookUpCache.invalidate(str(table))
+
+
+def test_checked_tables_are_used_without_system_calls(tmp_path, monkeypatch):
+
+    table = str(tmp_path / "account.rules")
+    (tmp_path / "account.rules").write_text(
+        "value;expression;result\nrewe;contains;Expenses:Groceries\n"
+    )
+    LookUpCache.refresh()
+    assert LookUpCache.resolve(table, "rewe", "x") == "Expenses:Groceries"
+
+    def no_system_call(path):
+        raise AssertionError(path)
+
+    monkeypatch.setattr(os, "stat", no_system_call)
+    monkeypatch.setattr(os.path, "isfile", no_system_call)
+    assert LookUpCache.exists(table)
+    assert LookUpCache.resolve(table, "rewe", "x") == "Expenses:Groceries"
+    assert LookUpCache.resolve(table, "aldi", "x") == "x"
+    monkeypatch.undo()
+    LookUpCache.invalidate(table)
+
+
+def test_lookup_tables_are_keyed_by_path(tmp_path):
+
+    for name, account in (("a", "Expenses:A"), ("b", "Expenses:B")):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "account.rules").write_text(
+            f"value;expression;result\nrewe;contains;{account}\n"
+        )
+    LookUpCache.invalidate()
+    max_tables = LookUpCache.max_tables
+    LookUpCache.max_tables = 1
+    evictions = LookUpCache.evictions
+    try:
+        for name, account in (("a", "Expenses:A"), ("b", "Expenses:B")):
+            table = str(tmp_path / name / "account.rules")
+            assert LookUpCache.resolve(table, "rewe", "x") == account
+        assert LookUpCache.evictions == evictions + 1
+        assert list(LookUpCache.tables) == [str(tmp_path / "b" / "account.rules")]
+    finally:
+        LookUpCache.max_tables = max_tables
+
+
+def test_set_accounts_index():
+
+    ruleset = [
+        {"name": "Set_Accounts", "from": "Assets:A", "to": "Expenses:Exact",
+         "csv_index": 3, "csv_values": "rewe;aldi"},
+        {"name": "Set_Accounts", "from": "Assets:A", "to": "Expenses:Wildcard",
+         "csv_index": 3, "csv_values": "re*;lidl*"},
+        {"name": "Set_Accounts", "from": "Assets:A", "to": "Expenses:Type",
+         "csv_index": 2, "csv_values": "gutschrift"},
+        {"name": "Set_Accounts", "from": "Assets:A", "to": "Expenses:Late",
+         "csv_index": 7, "csv_values": "*"},
+    ]
+    rule_engine = make_ruleset_engine(ruleset)
+    assert rule_engine.set_accounts is not None
+
+    def account(payee, tx_type="auszahlung"):
+        row = f"31.10.2019,b,{tx_type}, {payee} ,x,ZZ03,y,z".split(",")
+        return rule_engine.execute(row).postings[1].account
+
+    # the first matching rule wins, as with the sequential evaluation
+    assert account("REWE") == "Expenses:Exact"
+    assert account("rewex") == "Expenses:Wildcard"
+    assert account("lidl berlin") == "Expenses:Wildcard"
+    assert account("edeka", "gutschrift") == "Expenses:Type"
+    assert account("rewe", "gutschrift") == "Expenses:Exact"
+    assert account("edeka") == "Expenses:Late"
+
+    # the row has no value at the index of the last rule
+    with pytest.raises(IndexError):
+        rule_engine.execute("31.10.2019,b,auszahlung,edeka".split(","))
+    tx = rule_engine.execute("31.10.2019,b,auszahlung,rewe".split(","))
+    assert tx.postings[1].account == "Expenses:Exact"
+
+
+def test_ignore_prefilter():
+
+    ruleset = [
+        {"name": "Ignore_By_Payee", "ignore_payee": ["Transfer"]},
+        {"name": "Ignore_By_StringAtPos", "ignore_string_at_pos": ["fee;2"]},
+        {"name": "Ignore_By_ContainsStringAtPos",
+         "ignore_string_contains_at_pos": ["internal;4"]},
+        {"name": "Set_Accounts", "from": "Assets:A", "to": "Assets:B",
+         "csv_index": 3, "csv_values": "savings"},
+        # evaluated after Set_Accounts, which ends the ruleset
+        {"name": "Ignore_By_Payee", "ignore_payee": ["savings"]},
+    ]
+    rule_engine = make_ruleset_engine(ruleset)
+    assert len(rule_engine.ignore_prefilter.keys) == 3
+
+    def execute(row):
+        return rule_engine.execute(row.split(","))
+
+    assert execute("31.10.2019,b,x,MONTHLY TRANSFER,y,ZZ03") is None
+    assert execute("31.10.2019,b, Fee ,rewe,y,ZZ03") is None
+    assert execute("31.10.2019,b,x,rewe,an INTERNAL move,ZZ03") is None
+    assert execute("31.10.2019,b,x,savings,y,ZZ03").postings[1].account == "Assets:B"
+    assert execute("31.10.2019,b,x,rewe,y,ZZ03").postings[1].account is None
+    # too short to be checked by the prefilter
+    with pytest.raises(IndexError):
+        execute("31.10.2019,b,x,rewe")
+
+
+def test_ignore_prefilter_without_values():
+
+    ruleset = [
+        {"name": "Ignore_By_Payee", "ignore_payee": []},
+        {"name": "Ignore_By_ContainsStringAtPos",
+         "ignore_string_contains_at_pos": ["internal;4"]},
+    ]
+    rule_engine = make_ruleset_engine(ruleset)
+    assert len(rule_engine.ignore_prefilter.keys) == 2
+
+    def execute(row):
+        return rule_engine.execute(row.split(","))
+
+    assert execute("31.10.2019,b,x,rewe,y,ZZ03").postings[1].account is None
+    assert execute("31.10.2019,b,x,rewe,an internal move,ZZ03") is None
+
+
+def make_ruleset_engine(ruleset, rules_dir=None):
+
+    return RuleEngine(
+        Context(
+            ruleset=ruleset,
+            rules_dir=rules_dir,
+            account=None,
+            date_fomat="%d.%m.%Y",
+            default_expense="Expenses:Unknown",
+            date_pos=0,
+            payee_pos=3,
+            tx_type_pos=2,
+            narration_pos=-1,
+            account_pos=5,
+            force_account=None,
+            debug=False
+        )
+    )
+
+
+def test_payee_and_expense_rules(tmp_path):
+
+    (tmp_path / "payee.rules").write_text(
+        "value;expression;result\nelectro ford;equals;Ford Auto\n"
+    )
+    (tmp_path / "account.rules").write_text(
+        "value;expression;result\nFORD;contains_ic;Expenses:Car\n"
+    )
+    (tmp_path / "asset.rules").write_text(
+        "value;expression;result\nZZ03;equals;Assets:Bank\n"
+    )
+    ruleset = [{"name": "Replace_Payee"}, {"name": "Replace_Expense"}]
+    rule_engine = make_ruleset_engine(ruleset, str(tmp_path))
+
+    misses = LookUpCache.misses
+    for payee in ("electro ford", "electro ford", "mega store"):
+        tx = rule_engine.execute(f"31.10.2019,b,x,{payee},y,ZZ03".split(","))
+    assert tx.payee == "mega store"
+    assert tx.postings[1].account == "Expenses:Unknown"
+    assert tx.postings[0].account == "Assets:Bank"
+    # one lookup per payee for both tables, and one for the asset
+    assert rule_engine.shared_lookup is not None
+    assert LookUpCache.misses == misses + 3
+
+    tx = rule_engine.execute("31.10.2019,b,x,electro ford,y,ZZ03".split(","))
+    assert tx.payee == "Ford Auto"
+    assert tx.postings[1].account == "Expenses:Car"
+
+
+def test_shared_lookup_keeps_the_rule_order(tmp_path):
+
+    (tmp_path / "payee.rules").write_text(
+        "value;expression;result\n"
+        "AMZN MKTP;startsWith;Amazon\n"
+        "rewe;contains_ic;REWE\n"
+    )
+    (tmp_path / "account.rules").write_text(
+        "value;expression;result\n"
+        "Amazon;equals;Expenses:Shopping\n"
+        "amzn;regex_ic;Expenses:Online\n"
+        "REWE;contains;Expenses:Groceries\n"
+    )
+    (tmp_path / "asset.rules").write_text("value;expression;result\n")
+    ruleset = [
+        {"name": "Replace_Expense"},
+        {"name": "Replace_Payee_Fuzzy", "threshold": 0.6},
+    ]
+    rule_engine = make_ruleset_engine(ruleset, str(tmp_path))
+    assert len(rule_engine.shared_lookup.keys) == 2
+
+    def execute(counterparty):
+        tx = rule_engine.execute(f"31.10.2019,b,x,{counterparty},y,ZZ03".split(","))
+        return tx.payee, tx.postings[1].account
+
+    # the expense is resolved from the counterparty, not from the payee
+    assert execute("AMZN MKTP DE*2K4") == ("Amazon", "Expenses:Online")
+    assert execute("Rewe Markt") == ("REWE", "Expenses:Unknown")
+    assert execute("REWE MARKT") == ("REWE", "Expenses:Groceries")
+    assert execute("AMZN MKTP FR") == ("Amazon", "Expenses:Online")
+    assert execute("AMZN MKT FR") == ("Amazon", "Expenses:Online")
+    assert execute("Doctor Bill") == ("Doctor Bill", "Expenses:Unknown")
+
+
+def test_shared_lookup_without_table(tmp_path, capsys):
+
+    (tmp_path / "payee.rules").write_text("value;expression;result\n")
+    ruleset = [{"name": "Replace_Payee"}, {"name": "Replace_Expense"}]
+    rule_engine = make_ruleset_engine(ruleset, str(tmp_path))
+    assert rule_engine.shared_lookup is None
+
+    with pytest.raises(SystemExit):
+        rule_engine.execute("31.10.2019,b,x,rewe,y,ZZ03".split(","))
+    assert "account.rules" in capsys.readouterr().out
+
+
+def test_replace_payee_fuzzy(tmp_path):
+
+    (tmp_path / "payee.rules").write_text(
+        "value;expression;result\n"
+        "AMZN MKTP DE;startsWith;Amazon\n"
+        "Fresh Food Inc.;equals;FRESH FOOD\n"
+    )
+    (tmp_path / "asset.rules").write_text("value;expression;result\n")
+    ruleset = [{"name": "Replace_Payee_Fuzzy", "threshold": 0.6}]
+    rule_engine = make_ruleset_engine(ruleset, str(tmp_path))
+
+    def payee(counterparty):
+        return rule_engine.execute(f"31.10.2019,b,x,{counterparty},y,ZZ03".split(",")).payee
+
+    assert payee("AMZN MKTP DE*2K4") == "Amazon"
+    assert payee("AMZN MKTP FR*7Q1") == "Amazon"
+    assert payee("FRESH FOOD GMBH") == "FRESH FOOD"
+    assert payee("Fresh Food Inc.") == "FRESH FOOD"
+    assert payee("Doctor Bill") == "Doctor Bill"
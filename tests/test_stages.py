@@ -0,0 +1,38 @@
+import threading
+
+import pytest
+
+from beanborg.utils.stages import Stages
+
+
+def test_stages_run_in_background():
+
+    stages = Stages()
+    stage = stages.start(threading.current_thread)
+    assert stage.result() is not threading.current_thread()
+    stages.close()
+
+
+def test_sequential_stages_run_when_needed():
+
+    calls = []
+    stages = Stages(sequential=True)
+    stage = stages.start(calls.append, "ledger")
+    assert calls == []
+
+    stage.result()
+    stage.result()
+    assert calls == ["ledger"]
+    stages.close()
+
+
+def test_stage_errors_are_raised_on_join():
+
+    def fail():
+        raise ValueError("invalid ledger")
+
+    stages = Stages()
+    stage = stages.start(fail)
+    with pytest.raises(ValueError):
+        stage.result()
+    stages.close()
@@ -0,0 +1,104 @@
+import datetime
+import os
+
+import pandas as pd
+
+from beanborg.classification import training_store
+from beanborg.classification.training_store import TrainingStore
+
+TRAINING_DATA = """date,desc,amount,cat
+2020-11-02,FRESH FOOD,-21.30,Expenses:Groceries
+2020-11-08,BEST COMPANY,-10.00,Expenses:Clothing
+"""
+
+
+def new_row(desc):
+
+    return pd.DataFrame(
+        {
+            "date": [datetime.date(2020, 12, 1)],
+            "desc": [desc],
+            "amount": [-5],
+            "cat": ["Expenses:Groceries"],
+        }
+    )
+
+
+def test_load_and_append(tmp_path):
+
+    (tmp_path / "training_data.csv").write_text(TRAINING_DATA)
+    store = TrainingStore(str(tmp_path / "training_data.csv"))
+
+    data = store.load()
+    assert list(data["desc"]) == ["FRESH FOOD", "BEST COMPANY"]
+    assert list(data["day_of_month"]) == [2, 8]
+    assert list(data["day_of_week"]) == [0, 6]
+    assert os.path.isfile(store.meta_path)
+
+    store.append(new_row("CORNER SHOP"))
+    assert (tmp_path / "training_data.csv").read_text().endswith(
+        "2020-12-01,CORNER SHOP,-5,Expenses:Groceries\n"
+    )
+
+    # the snapshot is combined with the appended rows
+    data = store.load()
+    assert list(data["desc"]) == ["FRESH FOOD", "BEST COMPANY", "CORNER SHOP"]
+    assert data["date"].iloc[2] == pd.Timestamp("2020-12-01")
+    assert data["day_of_week"].iloc[2] == 1
+
+
+def test_rewritten_csv_invalidates_snapshot(tmp_path):
+
+    (tmp_path / "training_data.csv").write_text(TRAINING_DATA)
+    store = TrainingStore(str(tmp_path / "training_data.csv"))
+    store.load()
+
+    (tmp_path / "training_data.csv").write_text(
+        TRAINING_DATA.replace("FRESH FOOD", "FRESH FISH")
+    )
+    assert list(store.load()["desc"]) == ["FRESH FISH", "BEST COMPANY"]
+
+
+def test_snapshot_is_checked_without_reading_the_whole_file(tmp_path, monkeypatch):
+
+    training_data = tmp_path / "training_data.csv"
+    training_data.write_text(TRAINING_DATA)
+    store = TrainingStore(str(training_data))
+    store.load()
+
+    reads = []
+    digest = training_store.tail_digest
+    monkeypatch.setattr(
+        training_store,
+        "tail_digest",
+        lambda filepath, size: reads.append(size) or digest(filepath, size),
+    )
+    # unchanged file: size and modification time are enough
+    store.load()
+    assert reads == []
+
+    store.append(new_row("CORNER SHOP"))
+    assert len(store.load()) == 3
+    assert reads == [len(TRAINING_DATA)]
+
+    # the last covered row is rewritten, then a row is appended
+    training_data.write_text(
+        TRAINING_DATA.replace("BEST COMPANY", "BEST SHOP")
+        + "2020-12-01,CORNER SHOP,-5,Expenses:Groceries\n"
+        + "2020-12-02,CORNER SHOP,-7,Expenses:Groceries\n"
+    )
+    assert list(store.load()["desc"]) == [
+        "FRESH FOOD",
+        "BEST SHOP",
+        "CORNER SHOP",
+        "CORNER SHOP",
+    ]
+
+
+def test_missing_file_is_created(tmp_path, monkeypatch):
+
+    monkeypatch.chdir(tmp_path)
+    data = TrainingStore("training_data.csv").load()
+
+    assert data.empty
+    assert (tmp_path / "training_data.csv").read_text() == "date,desc,amount,cat\n"
@@ -0,0 +1,121 @@
+import datetime
+
+import pytest
+
+from beanborg.classification.sparse_model import SparseTransactionModel
+from beanborg.classification.training_store import TrainingStore
+from beanborg.classification.transaction_model import TransactionModel
+
+TRAINING_DATA = """date,desc,amount,cat
+2020-11-02,FRESH FOOD,-21.30,Expenses:Groceries
+2020-11-09,FRESH FOOD,-11.30,Expenses:Groceries
+2020-11-16,CORNER SHOP,-5.00,Expenses:Groceries
+2020-11-23,CORNER SHOP,-7.00,Expenses:Groceries
+2020-11-08,BEST COMPANY,-10.00,Expenses:Clothing
+2020-11-15,BEST COMPANY,-12.00,Expenses:Clothing
+2020-11-22,SHOE SHOP,-50.00,Expenses:Clothing
+"""
+
+
+def make_model(tmp_path):
+
+    data_file = str(tmp_path / "training_data.csv")
+    (tmp_path / "training_data.csv").write_text(TRAINING_DATA)
+    return TransactionModel(TrainingStore(data_file).load(), data_file)
+
+
+def test_new_entry_is_indexed(tmp_path):
+
+    model = make_model(tmp_path)
+    assert model.desc_index["FRESH FOOD"] == [0, 1]
+
+    model.update_training_data(
+        datetime.date(2020, 12, 1), "NEW  SHOP", -3, "Expenses:Groceries", 1, 1
+    )
+
+    assert model.desc_index["NEW SHOP"] == [7]
+    assert model.training_data["desc"].iat[7] == "NEW SHOP"
+    assert (
+        (tmp_path / "training_data.csv")
+        .read_text()
+        .endswith("2020-12-01,NEW SHOP,-3,Expenses:Groceries\n")
+    )
+
+
+def test_conflicting_entry_is_updated(tmp_path, monkeypatch):
+
+    model = make_model(tmp_path)
+    monkeypatch.setattr("builtins.input", lambda _: "1")
+
+    model.update_training_data(
+        datetime.date(2020, 12, 1), "FRESH FOOD", -3, "Expenses:Clothing", 1, 1
+    )
+
+    assert list(model.training_data["cat"].iloc[[0, 1]]) == [
+        "Expenses:Clothing",
+        "Expenses:Clothing",
+    ]
+    assert model.desc_index["FRESH FOOD"] == [0, 1]
+
+
+def test_sparse_model(tmp_path):
+
+    data_file = str(tmp_path / "training_data.csv")
+    (tmp_path / "training_data.csv").write_text(TRAINING_DATA)
+    model = SparseTransactionModel(TrainingStore(data_file).load(), data_file)
+
+    labels, probs = model.predict("FRESH FOOD", 2, 0)
+    assert labels[0] == "Expenses:Groceries"
+    assert probs[0] > 0.5
+    assert sum(probs) == pytest.approx(1)
+
+    labels, probs = model.predict("XYZ", 2, 0)
+    assert len(labels) == 0
+
+    # the model is refitted with the new entry
+    model.update_training_data(
+        datetime.date(2020, 12, 1), "GARDEN CENTRE", -3, "Expenses:Garden", 1, 1
+    )
+    assert model.predict("GARDEN CENTRE", 1, 1)[0][0] == "Expenses:Garden"
+
+
+def test_new_entries_are_buffered(tmp_path, monkeypatch):
+
+    model = make_model(tmp_path)
+    for day, desc in [(1, "NEW SHOP"), (2, "GARDEN CENTRE"), (3, "GARDEN CENTRE")]:
+        model.update_training_data(
+            datetime.date(2020, 12, day), desc, -3, "Expenses:Garden", day, 1
+        )
+    monkeypatch.setattr("builtins.input", lambda _: "1")
+    model.update_training_data(
+        datetime.date(2020, 12, 4), "NEW SHOP", -3, "Expenses:Groceries", 4, 1
+    )
+
+    # the model is fitted again only when a prediction is needed
+    assert model.stale
+    assert len(model.pending) == 2
+    assert model.desc_index["GARDEN CENTRE"] == [8]
+
+    assert len(model.training_data) == 9
+    assert model.pending == []
+    assert model.desc_index["NEW SHOP"] == [7]
+    assert model.training_data["cat"].iat[7] == "Expenses:Groceries"
+
+    model.predict("GARDEN CENTRE", 1, 1)
+    assert not model.stale
+
+
+def test_skipped_conflict_is_not_recorded(tmp_path, monkeypatch):
+
+    model = make_model(tmp_path)
+    monkeypatch.setattr("builtins.input", lambda _: "3")
+
+    assert not model.update_training_data(
+        datetime.date(2020, 12, 1), "FRESH FOOD", -3, "Expenses:Clothing", 1, 1
+    )
+
+    assert not model.stale
+    assert (tmp_path / "training_data.csv").read_text() == TRAINING_DATA
+    assert model.update_training_data(
+        datetime.date(2020, 12, 1), "NEW SHOP", -3, "Expenses:Groceries", 1, 1
+    )
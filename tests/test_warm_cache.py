@@ -0,0 +1,33 @@
+import os
+
+from beanborg.server.cache import WarmCache, file_signature
+
+
+def test_cache_reuses_value_until_file_changes(tmp_path):
+
+    rules = tmp_path / "account.rules"
+    rules.write_text("value;expression;result\n")
+
+    cache = WarmCache()
+    builds = []
+
+    def build():
+        builds.append(1)
+        return object()
+
+    first = cache.get("engine", file_signature(str(tmp_path)), build)
+    second = cache.get("engine", file_signature(str(tmp_path)), build)
+    assert first is second
+    assert cache.hits == 1
+
+    rules.write_text("value;expression;result\nfood;contains;Expenses:Food\n")
+    os.utime(rules, ns=(0, 0))
+    third = cache.get("engine", file_signature(str(tmp_path)), build)
+    assert third is not first
+    assert len(builds) == 2
+
+
+def test_signature_of_missing_file(tmp_path):
+
+    missing = str(tmp_path / "training_data.csv")
+    assert file_signature(missing) == ((missing, None, None),)
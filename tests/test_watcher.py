@@ -0,0 +1,35 @@
+import time
+
+from beanborg.watcher import FolderWatcher
+
+
+def test_files_are_reported_once_settled(tmp_path):
+
+    watcher = FolderWatcher([str(tmp_path)], settle=0.1)
+    statement = tmp_path / "bank1-statement.csv"
+    statement.write_text("date,amount\n")
+    (tmp_path / "bank1-statement-2.csv.crdownload").write_text("date,")
+
+    # first seen: waiting for the file to settle
+    assert watcher.scan() == []
+    time.sleep(0.2)
+    assert watcher.scan() == [str(statement)]
+    # reported only once
+    time.sleep(0.2)
+    assert watcher.scan() == []
+
+
+def test_growing_file_is_not_reported(tmp_path):
+
+    watcher = FolderWatcher([str(tmp_path)], settle=0.2)
+    statement = tmp_path / "bank1-statement.csv"
+    statement.write_text("date,amount\n")
+    assert watcher.scan() == []
+
+    time.sleep(0.1)
+    statement.write_text("date,amount\n01.01.2020,10\n")
+    assert watcher.scan() == []
+    time.sleep(0.1)
+    assert watcher.scan() == []
+    time.sleep(0.15)
+    assert watcher.scan() == [str(statement)]